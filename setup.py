@@ -20,6 +20,11 @@ setup(
         'rich',
         'pika',
     ],
+    extras_require={
+        'msgpack': [
+            'msgpack',
+        ],
+    },
     entry_points={
         'console_scripts': [
             'zettabgp=src.main:cli',
@@ -10,14 +10,470 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
+from src.parsers.attribute_cache import AttributeCache
 from src.parsers.route_update import RouteUpdateParser
-from src.models.route_update import RouteUpdate
+from src.models.route_update import RouteUpdateRecord
 from src.models.route_update import ChangeType
-from pymongo import MongoClient
-from datetime import datetime
-from typing import Optional
-from bson import ObjectId
-import os
+from pymongo import MongoClient, IndexModel, InsertOne, UpdateOne, DeleteOne, ASCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.collection import Collection
+from pymongo.cursor import Cursor
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional, Union
+from bson import ObjectId, Binary
+import ipaddress, threading, weakref, atexit, os
+
+# Indexes of the storage collections, by database name
+# The state and statistics are filtered by the dotted NLRI fields and the log is loaded by timestamp
+# The _id orders the log messages with the same timestamp, so a replay loads them in a stable order
+MONGODB_INDEXES = {
+    'message_log': [
+        [('timestamp', ASCENDING), ('_id', ASCENDING)],
+    ],
+    'message_state': [
+        [('nlri.prefix', ASCENDING), ('nlri.length', ASCENDING)],
+    ],
+    'message_statistics': [
+        [('nlri.prefix', ASCENDING), ('nlri.length', ASCENDING)],
+    ],
+}
+
+# Indexes which only allow one document per key, the state and statistics hold one document per prefix with the object _id schema
+# Concurrent upserts of a new prefix then cannot insert it twice, the losing upsert is retried as an update by the server
+MONGODB_UNIQUE_INDEXES = [
+    [('nlri.prefix', ASCENDING), ('nlri.length', ASCENDING)],
+]
+
+# Optional indexes for querying the log and the state by peer, enabled by MONGO_DB_PEER_INDEX=1
+MONGODB_PEER_INDEXES = {
+    'message_log': [
+        [('peer_as', ASCENDING), ('peer_ip', ASCENDING), ('timestamp', ASCENDING)],
+    ],
+    'message_state': [
+        [('peer_as', ASCENDING), ('peer_ip', ASCENDING)],
+    ],
+}
+
+# Schemas of the _id of the state and statistics documents, selected by MONGO_DB_ID_SCHEMA
+# object: random ObjectId, the documents are found by their NLRI fields
+# prefix: packed prefix and length, the documents are found by _id
+# prefix-peer: like prefix, but the state is kept per peer by adding the packed peer address
+MONGODB_ID_SCHEMAS = ('object', 'prefix', 'prefix-peer')
+
+# Client shared by all adapters, loaders and services of the process, see get_mongodb_client
+_database_client: MongoClient = None
+_database_client_lock = threading.Lock()
+
+def get_mongodb_client() -> MongoClient:
+    '''
+    Returns the MongoDB client shared by the whole process, the client is created on first use.
+    The connection pool, timeouts and write concern are configured by environment variables.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Returns:
+        MongoClient: The shared client.
+    '''
+    global _database_client
+
+    with _database_client_lock:
+        if _database_client is None:
+            client_options = {
+                'maxPoolSize': int(os.getenv('MONGO_DB_POOL_SIZE', 100)),
+                'serverSelectionTimeoutMS': int(os.getenv('MONGO_DB_TIMEOUT', 30000)),
+                'connectTimeoutMS': int(os.getenv('MONGO_DB_TIMEOUT', 30000)),
+            }
+
+            # Numeric write concerns are the number of acknowledging members, otherwise e.g. majority
+            if write_concern := os.getenv('MONGO_DB_WRITE_CONCERN'):
+                client_options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+
+            # Connects to MongoDB-Container running with Docker
+            _database_client = MongoClient(
+                host=os.getenv('MONGO_DB_HOST', 'localhost'),
+                port=int(os.getenv('MONGO_DB_PORT', 27017)),
+                **client_options,
+            )
+
+        return _database_client
+
+def close_mongodb_client():
+    '''
+    Flushes the write-behind caches and closes the shared MongoDB client.
+    Called on shutdown of the WebApp and when the interpreter exits, a later get_mongodb_client creates a new client.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    global _database_client
+
+    _flush_state_caches()
+
+    with _database_client_lock:
+        if _database_client is not None:
+            _database_client.close()
+            _database_client = None
+
+def get_mongodb_id_schema() -> str:
+    '''
+    Returns the configured schema of the _id of the state and statistics documents.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Returns:
+        str: One of MONGODB_ID_SCHEMAS.
+    '''
+    id_schema = os.getenv('MONGO_DB_ID_SCHEMA', 'object')
+
+    if id_schema not in MONGODB_ID_SCHEMAS:
+        raise ValueError(f'Unknown MONGO_DB_ID_SCHEMA {id_schema}, expected one of {", ".join(MONGODB_ID_SCHEMAS)}')
+
+    return id_schema
+
+def prefix_id(prefix: str, length: int, peer_ip: str = None) -> Binary:
+    '''
+    Builds the compact _id of a prefix, optionally of a prefix of a peer.
+    The IP version, the packed prefix, the prefix length and the optional packed peer address are concatenated.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        prefix (str): The network address of the prefix.
+        length (int): The length of the prefix.
+        peer_ip (str): The IP address of the peer, None or empty for an _id of the prefix only.
+
+    Returns:
+        Binary: The _id.
+    '''
+    address = ipaddress.ip_address(prefix)
+    key = bytes([address.version]) + address.packed + bytes([length])
+
+    if peer_ip:
+        key += ipaddress.ip_address(peer_ip).packed
+
+    return Binary(key)
+
+def get_mongodb_document_filter(id_schema: str, prefix: str, length: int, peer_ip: str = None) -> dict:
+    '''
+    Returns the filter for the state or statistics document of a prefix.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        id_schema (str): One of MONGODB_ID_SCHEMAS.
+        prefix (str): The network address of the prefix.
+        length (int): The length of the prefix.
+        peer_ip (str): The IP address of the peer, only used by the prefix-peer schema.
+
+    Returns:
+        dict: The filter.
+    '''
+    if id_schema == 'object':
+        return {'nlri.prefix': prefix, 'nlri.length': length}
+
+    return {
+        '_id': prefix_id(
+            prefix=prefix,
+            length=length,
+            peer_ip=peer_ip if id_schema == 'prefix-peer' else None,
+        ),
+    }
+
+def get_mongodb_indexes(database: str, id_schema: str = None) -> list[list[tuple[str, int]]]:
+    '''
+    Returns the keys of the indexes a storage collection should have.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        database (str): Name of the database of the storage collection.
+        id_schema (str): Schema of the _id of the state and statistics documents, None for the configured one.
+
+    Returns:
+        list[list[tuple[str, int]]]: The keys of the indexes.
+    '''
+    indexes = MONGODB_INDEXES.get(database, [])
+
+    # With a prefix _id schema the state and statistics are found by _id, which is always indexed
+    if database != 'message_log' and (id_schema or get_mongodb_id_schema()) != 'object':
+        indexes = []
+
+    if os.getenv('MONGO_DB_PEER_INDEX', '0').lower() in ('1', 'true', 'yes'):
+        indexes = indexes + MONGODB_PEER_INDEXES.get(database, [])
+
+    return indexes
+
+def ensure_mongodb_indexes(collection: Collection, database: str, id_schema: str = None) -> list[str]:
+    '''
+    Checks the indexes of a storage collection and creates the missing ones.
+    Existing indexes, which should be unique but are not, are replaced by unique ones.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        collection (Collection): The storage collection.
+        database (str): Name of the database of the storage collection.
+        id_schema (str): Schema of the _id of the state and statistics documents, None for the configured one.
+
+    Returns:
+        list[str]: Names of the created indexes.
+    '''
+    existing_indexes = {
+        tuple(tuple(key) for key in index['key']): (name, index.get('unique', False))
+            for name, index in collection.index_information().items()
+    }
+    missing_indexes: list[IndexModel] = []
+
+    for keys in get_mongodb_indexes(database, id_schema):
+        unique = keys in MONGODB_UNIQUE_INDEXES
+        existing_index = existing_indexes.get(tuple(keys))
+
+        if existing_index is not None and existing_index[1] == unique:
+            continue
+
+        # An index with the same keys but other options can not be created next to the existing one
+        # Creating the unique index fails, if the collection already contains duplicates, see mongodb-migrate-ids
+        if existing_index is not None:
+            collection.drop_index(existing_index[0])
+
+        missing_indexes.append(IndexModel(keys, unique=unique))
+
+    if not missing_indexes:
+        return []
+
+    return collection.create_indexes(missing_indexes)
+
+# Number of prefixes per collection kept by the write-behind cache, set by MONGO_DB_CACHE_SIZE
+MONGODB_CACHE_SIZE = 100000
+
+# Live write-behind caches, which are flushed when the interpreter exits
+_state_caches = weakref.WeakSet()
+
+class MongoDBStateCache:
+    '''
+    This class is a write-behind cache in front of the state and statistics collections.
+    The last state operation and the accumulated statistics are kept per prefix, only these final values are written by flush.
+    The cache is flushed after the flush interval, by the flush of the parser and when the interpreter exits.
+    When the cache is full after a batch, the least recently updated quarter of the prefixes is written by evict.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def __init__(self, state_collection: Collection, statistics_collection: Collection, id_schema: str, max_size: int = MONGODB_CACHE_SIZE, flush_interval: float = None):
+        '''
+        Initializes the MongoDBStateCache.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+
+        Args:
+            state_collection (Collection): The state storage collection, None if disabled.
+            statistics_collection (Collection): The statistics storage collection, None if disabled.
+            id_schema (str): One of MONGODB_ID_SCHEMAS.
+            max_size (int): Maximum number of prefixes kept per collection.
+            flush_interval (float): Time in milliseconds after which the cache is flushed, None to only flush explicitly.
+        '''
+        self.state_collection = state_collection
+        self.statistics_collection = statistics_collection
+        self.id_schema = id_schema
+        self.max_size = max(max_size, 1)
+        self.flush_interval = flush_interval
+
+        # Ordered from the least to the most recently updated prefix
+        self._state: OrderedDict[tuple, Union[UpdateOne, DeleteOne]] = OrderedDict()
+        # Change count, current timestamp and last timestamp of the prefix, the last timestamp is None after one change
+        self._statistics: OrderedDict[tuple[str, int], list] = OrderedDict()
+
+        self._timer: threading.Timer = None
+        self._lock = threading.RLock()
+
+        _state_caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._state) + len(self._statistics)
+
+    def update_state(self, key: tuple, operation: Union[UpdateOne, DeleteOne]):
+        '''
+        Replaces the cached state operation of a prefix.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+
+        Args:
+            key (tuple): The prefix and length, followed by the peer IP with the prefix-peer schema.
+            operation (Union[UpdateOne, DeleteOne]): The operation writing the latest state of the prefix.
+        '''
+        with self._lock:
+            self._state.pop(key, None)
+            self._state[key] = operation
+
+            self._schedule()
+
+    def update_statistics(self, prefix: tuple[str, int], timestamp: datetime):
+        '''
+        Counts a change of a prefix in the cached statistics.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+
+        Args:
+            prefix (tuple[str, int]): The prefix and length.
+            timestamp (datetime): The timestamp of the change.
+        '''
+        with self._lock:
+            entry = self._statistics.pop(prefix, None)
+
+            if entry is None:
+                self._statistics[prefix] = [1, timestamp, None]
+            else:
+                self._statistics[prefix] = [entry[0] + 1, timestamp, entry[1]]
+
+            self._schedule()
+
+    def evict(self):
+        '''
+        Writes the least recently updated quarter of the prefixes of a full collection.
+        Called after every batch, so the cache holds at most one batch more than the maximum size.
+        Prefixes whose write failed are kept in the cache and the error is raised.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        with self._lock:
+            self._evict(
+                self._state if len(self._state) > self.max_size else OrderedDict(),
+                self._statistics if len(self._statistics) > self.max_size else OrderedDict(),
+            )
+
+    def flush(self):
+        '''
+        Writes all cached prefixes with one unordered bulk write per collection.
+        Prefixes whose write failed are kept in the cache and the error is raised.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            state, self._state = self._state, OrderedDict()
+            statistics, self._statistics = self._statistics, OrderedDict()
+
+            try:
+                self._write(state, statistics)
+            finally:
+                # Restored prefixes are retried after the next interval
+                self._schedule()
+
+    def _schedule(self):
+        # The interval starts with the first cached change after a flush
+        if self.flush_interval and self._timer is None and len(self):
+            self._timer = threading.Timer(
+                interval=self.flush_interval / 1000,
+                function=self.flush,
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _evict(self, state: OrderedDict, statistics: OrderedDict):
+        # Writes the least recently updated quarter, so a full cache is not written for every change
+        evicted_state = OrderedDict(state.popitem(last=False) for _ in range(len(state) - self.max_size * 3 // 4))
+        evicted_statistics = OrderedDict(statistics.popitem(last=False) for _ in range(len(statistics) - self.max_size * 3 // 4))
+
+        self._write(evicted_state, evicted_statistics)
+
+    def _write(self, state: OrderedDict, statistics: OrderedDict):
+        if state:
+            try:
+                self.state_collection.bulk_write(list(state.values()), ordered=False)
+            except BulkWriteError as error:
+                self._restore(state, {}, [write_error['index'] for write_error in error.details['writeErrors']])
+                self._restore({}, statistics)
+                raise
+            except PyMongoError:
+                self._restore(state, statistics)
+                raise
+
+        if statistics:
+            statistics_items = list(statistics.items())
+
+            try:
+                self.statistics_collection.bulk_write(
+                    [self._statistics_operation(prefix, *entry) for prefix, entry in statistics_items],
+                    ordered=False,
+                )
+            except BulkWriteError as error:
+                self._restore({}, statistics, [write_error['index'] for write_error in error.details['writeErrors']])
+                raise
+            except PyMongoError:
+                # Whether the writes were applied is unknown, retrying may count the changes twice but loses none
+                self._restore({}, statistics)
+                raise
+
+    def _restore(self, state: OrderedDict, statistics: OrderedDict, indexes: list[int] = None):
+        # Failed prefixes are put back as least recently updated, changes cached in the meantime are newer
+        # They are put back in reverse, so they keep their order in front of the cached prefixes
+        for index, (key, operation) in reversed(list(enumerate(state.items()))):
+            if (indexes is None or index in indexes) and key not in self._state:
+                self._state[key] = operation
+                self._state.move_to_end(key, last=False)
+
+        for index, (prefix, entry) in reversed(list(enumerate(statistics.items()))):
+            if indexes is not None and index not in indexes:
+                continue
+
+            cached_entry = self._statistics.get(prefix)
+
+            if cached_entry is None:
+                self._statistics[prefix] = entry
+                self._statistics.move_to_end(prefix, last=False)
+            else:
+                cached_entry[0] += entry[0]
+
+                if cached_entry[2] is None:
+                    cached_entry[2] = entry[1]
+
+    def _statistics_operation(self, prefix: tuple[str, int], change_count: int, current_timestamp: datetime, last_timestamp: Optional[datetime]) -> UpdateOne:
+        # Each prefix is updated atomically by the server with a single upsert, without reading the statistics first
+        # The pipeline references the stored values, missing values mean the statistics are inserted
+        statistics_filter = get_mongodb_document_filter(
+            id_schema=self.id_schema,
+            prefix=prefix[0],
+            length=prefix[1],
+        )
+        new_values = [
+            {
+                '$set': {
+                    # Same as $inc, which is not available in pipeline updates
+                    'change_count' : {'$add': [{'$ifNull': ['$change_count', 0]}, change_count]},
+                    'current_timestamp' : current_timestamp,
+                    # The previous current_timestamp is moved into last_timestamp
+                    'last_timestamp' : last_timestamp if last_timestamp is not None else {'$ifNull': ['$current_timestamp', current_timestamp]},
+                    # Same as $setOnInsert, which is not available in pipeline updates
+                    'nlri' : {'$ifNull': ['$nlri', {'$literal': {'prefix': prefix[0], 'length': prefix[1]}}]},
+                },
+            },
+        ]
+
+        return UpdateOne(statistics_filter, new_values, upsert=True)
+
+def _flush_state_caches():
+    for state_cache in list(_state_caches):
+        try:
+            state_cache.flush()
+        except PyMongoError as error:
+            print(f'Could not flush the state cache: {error}')
+
+atexit.register(close_mongodb_client)
 
 class MongoDBAdapter:
     '''
@@ -40,14 +496,9 @@ class MongoDBAdapter:
             no_mongodb_statistics (bool): Whether to disable the statistics storage.
             clear_mongodb (bool): Whether to clear the MongoDB databases.
         '''
-        try:
-            # Connects to MongoDB-Container running with Docker
-            database_client = MongoClient(
-                host=os.getenv('MONGO_DB_HOST', 'localhost'),
-                port=int(os.getenv('MONGO_DB_PORT', 27017)),
-            )
-        except:
-            print('Could not connect to the database')
+        database_client = get_mongodb_client()
+
+        id_schema = get_mongodb_id_schema()
 
         log_flag = no_mongodb_log
         state_flag = no_mongodb_state
@@ -59,6 +510,7 @@ class MongoDBAdapter:
             log_collection = log_db.storage
             if clear_mongodb:
                 log_collection.delete_many({})
+            ensure_mongodb_indexes(log_collection, 'message_log')
         
         # Creates database and collection for state storage
         if not state_flag:
@@ -66,6 +518,7 @@ class MongoDBAdapter:
             state_collection = state_db.storage
             if clear_mongodb:
                 state_collection.delete_many({})
+            ensure_mongodb_indexes(state_collection, 'message_state')
 
         # Creates database and collection for statistics storage
         if not statistics_flag:
@@ -73,15 +526,24 @@ class MongoDBAdapter:
             statistics_collection = statistics_db.storage
             if clear_mongodb:
                 statistics_collection.delete_many({})
+            ensure_mongodb_indexes(statistics_collection, 'message_statistics')
 
-        @parser.on_update
-        def on_update(message: RouteUpdate):
-            # # Saves optional, non-base-type attributes for later use; required to guarantee save use of mongodb
-            # if message.path_attributes.origin:
-            #     origins = message.path_attributes.origin.value
-            # else:
-            #     origins = None
-            
+        # The state and statistics are written behind, only the final values of the cached prefixes are written
+        # By default the cache is written with every batch, an interval keeps the changes of several batches in memory
+        # These are lost when the process is killed, as the statistics are incremented they can not be replayed from the log
+        state_cache = MongoDBStateCache(
+            state_collection=None if state_flag else state_collection,
+            statistics_collection=None if statistics_flag else statistics_collection,
+            id_schema=id_schema,
+            max_size=int(os.getenv('MONGO_DB_CACHE_SIZE', MONGODB_CACHE_SIZE)),
+            flush_interval=float(os.getenv('MONGO_DB_CACHE_INTERVAL', 0)),
+        )
+
+        # The path attributes are interned by the parsers, so their documents are built once per attribute set
+        # The same document is shared by the log and state operations of all route updates with the attribute set
+        path_attributes_cache = AttributeCache()
+
+        def _as_paths(message: RouteUpdateRecord) -> Optional[list[int, list[int]]]:
             as_paths: Optional[list[int, list[int]]] = None
             if message.path_attributes.as_path:
                 for as_pa in message.path_attributes.as_path:
@@ -89,7 +551,33 @@ class MongoDBAdapter:
                         as_paths = [[as_pa.type.value, as_pa.value]]
                     else:
                         as_paths.append([as_pa.type.value, as_pa.value])
-                 
+            return as_paths
+
+        def on_update(message: RouteUpdateRecord, log_operations: list[InsertOne]):
+            # # Saves optional, non-base-type attributes for later use; required to guarantee save use of mongodb
+            # if message.path_attributes.origin:
+            #     origins = message.path_attributes.origin.value
+            # else:
+            #     origins = None
+            
+            path_attributes = path_attributes_cache.get_by_identity(
+                obj=message.path_attributes,
+                factory=lambda: {
+                    # 'origin' : origins,
+                    'as_path' : _as_paths(message),
+                    # 'next_hop' : message.path_attributes.next_hop,
+                    # 'multi_exit_disc' : message.path_attributes.multi_exit_disc,
+                    # 'local_pref' : message.path_attributes.local_pref,
+                    # 'atomic_aggregate' : message.path_attributes.atomic_aggregate,
+                    # 'aggregator' : aggregator,
+                    # 'community' : message.path_attributes.community,
+                    # 'large_community' : message.path_attributes.large_community,
+                    # 'extended_community' : message.path_attributes.extended_community,
+                    # 'orginator_id' : message.path_attributes.orginator_id,
+                    # 'cluster_list' : message.path_attributes.cluster_list,
+                },
+            )
+
             # if message.path_attributes.aggregator:
             #     aggregator = {
             #         'router_id' : message.path_attributes.aggregator.router_id,
@@ -110,20 +598,7 @@ class MongoDBAdapter:
                     'prefix' : message.nlri.prefix,
                     'length' : message.nlri.length,
                 },
-                'path_attributes': {
-                    # 'origin' : origins,
-                    'as_path' : as_paths,
-                    # 'next_hop' : message.path_attributes.next_hop,
-                    # 'multi_exit_disc' : message.path_attributes.multi_exit_disc,
-                    # 'local_pref' : message.path_attributes.local_pref,
-                    # 'atomic_aggregate' : message.path_attributes.atomic_aggregate,
-                    # 'aggregator' : aggregator,
-                    # 'community' : message.path_attributes.community,
-                    # 'large_community' : message.path_attributes.large_community,
-                    # 'extended_community' : message.path_attributes.extended_community,
-                    # 'orginator_id' : message.path_attributes.orginator_id,
-                    # 'cluster_list' : message.path_attributes.cluster_list,
-                },
+                'path_attributes': path_attributes,
                 '_id' : ObjectId(),
             }
 
@@ -134,86 +609,142 @@ class MongoDBAdapter:
                     'peer_ip' : message.peer_ip,
                     'peer_as' : message.peer_as,
                     'change_type' : message.change_type.value,
-                    'path_attributes': {
-                    #    'origin' : origins,
-                        'as_path' : as_paths,
-                        # 'next_hop' : message.path_attributes.next_hop,
-                        # 'multi_exit_disc' : message.path_attributes.multi_exit_disc,
-                        # 'local_pref' : message.path_attributes.local_pref,
-                        # 'atomic_aggregate' : message.path_attributes.atomic_aggregate,
-                        # 'aggregator' : aggregator,
-                        # 'community' : message.path_attributes.community,
-                        # 'large_community' : message.path_attributes.large_community,
-                        # 'extended_community' : message.path_attributes.extended_community,
-                        # 'orginator_id' : message.path_attributes.orginator_id,
-                        # 'cluster_list' : message.path_attributes.cluster_list,
-                    },
+                    'path_attributes': path_attributes,
                 }
             }
 
+            # Operations of the same prefix overwrite each other in the state, so only the last one is written
+            # Otherwise the unordered bulk write could apply them in the wrong order, the cache keeps the last one
+            prefix = (message.nlri.prefix, message.nlri.length)
+            state_key = prefix + (message.peer_ip,) if id_schema == 'prefix-peer' else prefix
+
+            state_filter = get_mongodb_document_filter(
+                id_schema=id_schema,
+                prefix=message.nlri.prefix,
+                length=message.nlri.length,
+                peer_ip=message.peer_ip,
+            )
+
+            # The NLRI is only part of the filter with the object schema, otherwise it is set when the state is inserted
+            if id_schema != 'object':
+                set_message['$setOnInsert'] = {
+                    'nlri' : new_message_id['nlri'],
+                }
+
             # Route got withdrawn, db actions accordingly
             if message.change_type == ChangeType.WITHDRAW:
                 if not log_flag:
-                    log_announce = log_collection.insert_one(new_message_id)
+                    log_operations.append(InsertOne(new_message_id))
 
                 if not state_flag:
-                    state_filter = {'nlri': {'prefix': new_message_id['nlri']['prefix'], 'length': new_message_id['nlri']['length']}}
-                    state_announce = state_collection.delete_one(state_filter)
+                    state_cache.update_state(state_key, DeleteOne(state_filter))
 
                 if not statistics_flag:
-                    statistics_filter = {'nlri': {'prefix': new_message_id['nlri']['prefix'], 'length': new_message_id['nlri']['length']}}
-                    statistics_object = statistics_collection.find_one(statistics_filter)
-                    if statistics_object:
-                        new_values = {
-                            '$set': {
-                                'change_count' : statistics_object['change_count'] + 1,
-                                'current_timestamp' : message.timestamp,
-                                'last_timestamp' : statistics_object['current_timestamp'],
-                            }
-                        }
-                    else:
-                        new_values = {
-                            '$set': {
-                                'change_count' :1,
-                                'current_timestamp' : message.timestamp,
-                                'last_timestamp' : message.timestamp,
-                                'nlri' : new_message_id['nlri'],
-                                '_id' : ObjectId(),
-                            }
-                        }
-                    statistics_announce = statistics_collection.update_one(statistics_filter, new_values, upsert=True)
+                    state_cache.update_statistics(prefix, message.timestamp)
 
             # Route got announced, db actions accordingly
             if message.change_type == ChangeType.ANNOUNCE:
                 if not log_flag:
-                    log_announce = log_collection.insert_one(new_message_id)
+                    log_operations.append(InsertOne(new_message_id))
 
                 if not state_flag:
-                    state_filter = {'nlri': {'prefix': new_message_id['nlri']['prefix'], 'length': new_message_id['nlri']['length']}}
-                    state_announce = state_collection.update_one(state_filter, set_message, upsert=True)
-                
+                    state_cache.update_state(state_key, UpdateOne(state_filter, set_message, upsert=True))
+
                 if not statistics_flag:
-                    statistics_filter = {'nlri': {'prefix': new_message_id['nlri']['prefix'], 'length': new_message_id['nlri']['length']}}
-                    statistics_object = statistics_collection.find_one(statistics_filter)
-                    if statistics_object:
-                        new_values = {
-                            '$set': {
-                                'change_count' : statistics_object['change_count'] + 1,
-                                'current_timestamp' : message.timestamp,
-                                'last_timestamp' : statistics_object['current_timestamp'],
-                            }
-                        }
-                    else:
-                        new_values = {
-                            '$set': {
-                                'change_count' :1,
-                                'current_timestamp' : message.timestamp,
-                                'last_timestamp' : message.timestamp,
-                                'nlri' : new_message_id['nlri'],
-                                '_id' : ObjectId(),
-                            }
-                        }
-                    statistics_announce = statistics_collection.update_one(statistics_filter, new_values, upsert=True)
+                    state_cache.update_statistics(prefix, message.timestamp)
+
+        def on_update_batch(messages: list[RouteUpdateRecord]):
+            log_operations: list[InsertOne] = []
+
+            for message in messages:
+                on_update(message, log_operations)
+
+            # The log is append only, so it is written with every batch
+            # The cache is only written afterwards, so a failed write of the cache does not lose the log of the batch
+            if log_operations:
+                log_collection.bulk_write(log_operations, ordered=False)
+
+            # Without an interval the cache only coalesces the changes of one batch
+            if state_cache.flush_interval:
+                state_cache.evict()
+            else:
+                state_cache.flush()
+
+        # Route updates are buffered by the parser until the batch size or interval in milliseconds is reached
+        # Each batch is written to the log with one unordered bulk write
+        parser.on_update_batch(
+            fn=on_update_batch,
+            batch_size=int(os.getenv('MONGO_DB_BATCH_SIZE', 1000)),
+            batch_interval=float(os.getenv('MONGO_DB_BATCH_INTERVAL', 1000)),
+        )
+
+        # Cached state and statistics are written when the parser is flushed, e.g. at the end of a file
+        parser.on_flush(state_cache.flush)
+
+# Fields of the log documents read by the ReverseParser, all other fields are not transferred by the replay
+MONGODB_REPLAY_PROJECTION = {
+    '_id': False,
+    'timestamp': True,
+    'peer_ip': True,
+    'local_ip': True,
+    'peer_as': True,
+    'local_as': True,
+    'change_type': True,
+    'nlri': True,
+    'path_attributes.as_path': True,
+}
+
+# Order of the replayed log messages, same as the log index, the _id is sorted on although it is not transferred
+MONGODB_REPLAY_SORT = [('timestamp', ASCENDING), ('_id', ASCENDING)]
+
+# Prefix of the snapshot collections of the log, followed by an ObjectId holding the creation time of the snapshot
+MONGODB_SNAPSHOT_PREFIX = 'replay_snapshot_'
+
+# Age in hours after which a snapshot is dropped as left behind by a crashed replay, set by MONGO_DB_SNAPSHOT_EXPIRY
+MONGODB_SNAPSHOT_EXPIRY = 24
+
+def drop_stale_mongodb_snapshots(expiry: float = None) -> list[str]:
+    '''
+    Drops the snapshot collections of the log, which are older than the expiry.
+    Snapshots are dropped by the replay when it ends, older ones were left behind by a crashed replay.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        expiry (float): Age in hours after which a snapshot is dropped, None for MONGO_DB_SNAPSHOT_EXPIRY.
+
+    Returns:
+        list[str]: Names of the dropped snapshot collections.
+    '''
+    if expiry is None:
+        expiry = float(os.getenv('MONGO_DB_SNAPSHOT_EXPIRY', MONGODB_SNAPSHOT_EXPIRY))
+
+    log_db = get_mongodb_client().message_log
+    expired = datetime.now(timezone.utc) - timedelta(hours=expiry)
+    dropped_snapshots: list[str] = []
+
+    for name in log_db.list_collection_names(filter={'name': {'$regex': f'^{MONGODB_SNAPSHOT_PREFIX}'}}):
+        snapshot_id = name[len(MONGODB_SNAPSHOT_PREFIX):]
+
+        if ObjectId.is_valid(snapshot_id) and ObjectId(snapshot_id).generation_time < expired:
+            log_db.drop_collection(name)
+            dropped_snapshots.append(name)
+
+    return dropped_snapshots
+
+class _SnapshotMessages:
+    def __init__(self, cursor: Cursor, collection: Collection):
+        self.cursor = cursor
+        self.collection = collection
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.cursor)
+
+    def close(self):
+        # The snapshot is dropped even if the messages were never iterated
+        self.cursor.close()
+        self.collection.drop()
 
 class MongoDBLogLoader:
     '''
@@ -223,9 +754,12 @@ class MongoDBLogLoader:
         Sebastian Forstner <sef9869@thi.de>
     '''
     @staticmethod
-    def load_messages(timestamp_start: datetime, timestamp_end: datetime) -> list[dict]:
+    def load_messages(timestamp_start: datetime, timestamp_end: datetime, snapshot: bool = False) -> Iterator[dict]:
         '''
-        Loads messages from the MongoDB Log.
+        Loads messages from the MongoDB Log, ordered by timestamp and _id.
+        The messages are streamed in batches of MONGO_DB_REPLAY_BATCH_SIZE, so only one batch is held in memory.
+        With a snapshot the messages are copied into a temporary collection first, which is dropped when the messages are closed.
+        This is needed when the log is changed during loading, e.g. cleared or written by the replay.
 
         Author:
             Sebastian Forstner <sef9869@thi.de>
@@ -233,27 +767,100 @@ class MongoDBLogLoader:
         Args:
             timestamp_start (datetime): The start timestamp.
             timestamp_end (datetime): The end timestamp.
+            snapshot (bool): Whether to load the messages from a snapshot.
 
         Returns:
-            list[dict]: The loaded messages.
+            Iterator[dict]: The loaded messages, must be closed after loading.
         '''
-        try:
-            '''Connects to MongoDB-Container running with Docker'''
-            database_client = MongoClient(
-                host=os.getenv('MONGO_DB_HOST', 'localhost'),
-                port=int(os.getenv('MONGO_DB_PORT', 27017)),
-        )
-        except:
-            print('Could not connect to the database')
+        database_client = get_mongodb_client()
 
         log_db = database_client.message_log
         log_collection = log_db.storage
-        
-        
+
+        if timestamp_start and timestamp_end:
+            filter = {'timestamp': {'$gte': timestamp_start, '$lte': timestamp_end}}
+        else:
+            filter = {}
+
+        if snapshot:
+            # Snapshots of crashed replays are never dropped by them, so they are dropped by the next one
+            drop_stale_mongodb_snapshots()
+
+            # Copied by the server, the snapshot is taken before this method returns
+            snapshot_collection = log_db[f'{MONGODB_SNAPSHOT_PREFIX}{ObjectId()}']
+            log_collection.aggregate([
+                {'$match': filter},
+                {'$sort': {'timestamp': ASCENDING, '_id': ASCENDING}},
+                {'$out': snapshot_collection.name},
+            ])
+            snapshot_collection.create_index(MONGODB_REPLAY_SORT)
+
+            log_collection = snapshot_collection
+            filter = {}
+
+        # Sorted by the log index, messages with the same timestamp are ordered by their _id, which is created on insertion
+        all_messages = log_collection.find(
+            filter=filter,
+            projection=MONGODB_REPLAY_PROJECTION,
+            batch_size=int(os.getenv('MONGO_DB_REPLAY_BATCH_SIZE', 1000)),
+        ).sort(MONGODB_REPLAY_SORT).allow_disk_use(True)
+
+        if not snapshot:
+            return all_messages
+
+        return _SnapshotMessages(
+            cursor=all_messages,
+            collection=snapshot_collection,
+        )
+
+    @staticmethod
+    def count_messages(timestamp_start: datetime, timestamp_end: datetime, count_interval: int) -> dict:
+        '''
+        Counts the messages of the MongoDB Log by change type with one aggregation, no messages are transferred.
+        The counts are additionally grouped by peer and by time interval.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+
+        Args:
+            timestamp_start (datetime): The start timestamp.
+            timestamp_end (datetime): The end timestamp.
+            count_interval (int): Length of the time intervals in minutes.
+
+        Returns:
+            dict: The counts under change_type, peer and interval, each a list of groups with _id and count.
+        '''
+        database_client = get_mongodb_client()
+
+        log_collection = database_client.message_log.storage
+
         if timestamp_start and timestamp_end:
             filter = {'timestamp': {'$gte': timestamp_start, '$lte': timestamp_end}}
-            all_messages = log_collection.find(filter)
         else:
-            all_messages = log_collection.find()
+            filter = {}
 
-        return all_messages
+        # The change type is stored as list, like the value of ChangeType
+        change_type = {'$arrayElemAt': ['$change_type', 0]}
+        # Start of the interval of the timestamp, the intervals are aligned to the unix epoch
+        interval_timestamp = {'$subtract': ['$timestamp', {'$mod': [{'$subtract': ['$timestamp', datetime(1970, 1, 1)]}, count_interval * 60000]}]}
+
+        return next(
+            log_collection.aggregate([
+                {'$match': filter},
+                {
+                    '$facet': {
+                        'change_type': [
+                            {'$group': {'_id': change_type, 'count': {'$sum': 1}}},
+                        ],
+                        'peer': [
+                            {'$group': {'_id': {'peer_ip': '$peer_ip', 'peer_as': '$peer_as', 'change_type': change_type}, 'count': {'$sum': 1}}},
+                            {'$sort': {'_id.peer_as': ASCENDING, '_id.peer_ip': ASCENDING}},
+                        ],
+                        'interval': [
+                            {'$group': {'_id': {'timestamp': interval_timestamp, 'change_type': change_type}, 'count': {'$sum': 1}}},
+                            {'$sort': {'_id.timestamp': ASCENDING}},
+                        ],
+                    },
+                },
+            ]),
+        )
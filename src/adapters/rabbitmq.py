@@ -10,52 +10,443 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
+from src.parsers.attribute_cache import AttributeCache
 from src.parsers.route_update import RouteUpdateParser
-from src.models.route_update import RouteUpdate
+from src.models.route_update import RouteUpdateRecord, AsPathType
+from typing import Callable, Optional, Union
 from datetime import timedelta, datetime
-import pika, json, os
+from pydantic import BaseModel
+import pika, pika.exceptions
+import threading, tempfile, atexit, struct, queue, time, json, zlib, os
 
-class RabbitMQAdapter:
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Exchange of the direct and grouped route updates
+RABBITMQ_EXCHANGE = 'zettabgp'
+
+# Policies when the publisher queue is full, selected by RABBIT_MQ_OVERFLOW
+# block: the parser waits for free space
+# drop-oldest: the oldest queued message is dropped
+# spill: the messages are written to a temporary file and published when the queue is drained
+RABBITMQ_OVERFLOW_POLICIES = ('block', 'drop-oldest', 'spill')
+
+# Seconds to wait for the queued messages to be published on close
+RABBITMQ_CLOSE_TIMEOUT = 10
+
+# Seconds a flush of the parser waits for the queued messages to be published, set by RABBIT_MQ_FLUSH_TIMEOUT
+RABBITMQ_FLUSH_TIMEOUT = 30
+
+# Encodings of the published route updates by RABBIT_MQ_ENCODING and their content type
+# msgpack is optional, it is installed with the msgpack extra
+RABBITMQ_CONTENT_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+}
+
+# Type property of messages with a single route update and with a list of route updates
+RABBITMQ_MESSAGE_TYPE = 'route_update'
+RABBITMQ_BATCH_MESSAGE_TYPE = 'route_update_batch'
+
+def _msgpack_route_update(message: RouteUpdateRecord) -> bytes:
+    return msgpack.packb(message.to_dict(mode='json'))
+
+def _msgpack_array_header(length: int) -> bytes:
+    # Header of a msgpack array, the packed items follow it without separators
+    if length < 16:
+        return bytes((0x90 | length,))
+
+    if length < 1 << 16:
+        return b'\xdc' + struct.pack('!H', length)
+
+    return b'\xdd' + struct.pack('!I', length)
+
+def encode_route_update(message: RouteUpdateRecord, encoding: str = 'json') -> bytes:
     '''
-    This class is responsible for receiving the parsed messages and forwarding them to the RabbitMQ message broker.
+    Encodes a route update as the body of one message.
 
     Author:
         Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        message (RouteUpdateRecord): The route update.
+        encoding (str): One of RABBITMQ_CONTENT_TYPES.
+
+    Returns:
+        bytes: The serialized route update.
     '''
-    def __init__(self, parser: RouteUpdateParser, no_direct: bool, queue_interval: int):
+    if encoding == 'msgpack':
+        return _msgpack_route_update(message)
+
+    return message.to_json()
+
+def encode_route_updates(messages: list[RouteUpdateRecord], encoding: str = 'json', encoder: Callable[[RouteUpdateRecord], bytes] = None) -> bytes:
+    '''
+    Encodes route updates as the body of one message.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        messages (list[RouteUpdateRecord]): The route updates.
+        encoding (str): One of RABBITMQ_CONTENT_TYPES.
+        encoder (Callable[[RouteUpdateRecord], bytes]): Function encoding a single route update, None for encode_route_update.
+
+    Returns:
+        bytes: The list of serialized route updates.
+    '''
+    if encoder is None:
+        encoder = lambda message: encode_route_update(message, encoding)
+
+    # The serialized route updates are joined, without converting them to dicts first
+    if encoding == 'msgpack':
+        return _msgpack_array_header(len(messages)) + b''.join([encoder(message) for message in messages])
+
+    return b'[' + b','.join([encoder(message) for message in messages]) + b']'
+
+# Number of route updates whose encodings are kept by a RabbitMQAdapter, set by RABBIT_MQ_ENCODING_CACHE_SIZE
+RABBITMQ_ENCODING_CACHE_SIZE = 1 << 14
+
+class _EncodingCache:
+    def __init__(self, encoding: str, maxsize: int = RABBITMQ_ENCODING_CACHE_SIZE):
+        self.encoding = encoding
+
+        # The records are kept by the cache until they are evicted, so the records themselves stay slotted tuples
+        # Batches of the direct and topic queues are delivered by timer threads, so the cache is locked
+        self.cache = AttributeCache(maxsize=maxsize)
+        self.lock = threading.Lock()
+
+    def encode(self, message: RouteUpdateRecord) -> bytes:
+        with self.lock:
+            return self.cache.get_by_identity(
+                obj=message,
+                factory=lambda: encode_route_update(message, self.encoding),
+            )
+
+def decode_route_updates(body: bytes, properties: pika.BasicProperties = None) -> list[dict]:
+    '''
+    Decodes the body of a message published by ZettaBGP, for consumers of the direct and grouped queues.
+    The encoding is taken from the content type and content encoding, messages without content type are JSON.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        body (bytes): The body of the message.
+        properties (pika.BasicProperties): The properties of the message.
+
+    Returns:
+        list[dict]: The route updates, same as RouteUpdate.model_dump(mode='json').
+    '''
+    content_type = properties.content_type if properties else None
+
+    if properties and properties.content_encoding == 'deflate':
+        body = zlib.decompress(body)
+
+    if content_type == RABBITMQ_CONTENT_TYPES['msgpack']:
+        if msgpack is None:
+            raise ImportError('msgpack is required for decoding application/msgpack messages')
+
+        route_updates = msgpack.unpackb(body)
+    else:
+        route_updates = json.loads(body)
+
+    # Messages of the direct queue without batching hold a single route update
+    if isinstance(route_updates, dict):
+        return [route_updates]
+
+    return route_updates
+
+# Routing key of the route updates on the topic exchange, consumers bind e.g. update.ipv6.# or update.*.*.13335.announce
+RABBITMQ_TOPIC_ROUTING_KEY = 'update.{afi}.{peer_as}.{origin_as}.{change_type}'
+
+def get_topic_routing_key(message: RouteUpdateRecord) -> str:
+    '''
+    Returns the routing key of a route update on the topic exchange.
+    The origin AS is the last AS of the AS path, it is unknown for route updates without AS path or with an AS set at the end.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        message (RouteUpdateRecord): The route update.
+
+    Returns:
+        str: The routing key, e.g. update.ipv4.64496.13335.announce.
+    '''
+    origin_as = 'unknown'
+    as_path = message.path_attributes.as_path
+
+    if as_path and as_path[-1].type == AsPathType.AS_SEQUENCE and as_path[-1].value:
+        origin_as = as_path[-1].value[-1]
+
+    return RABBITMQ_TOPIC_ROUTING_KEY.format(
+        afi='ipv6' if ':' in message.nlri.prefix else 'ipv4',
+        peer_as=message.peer_as,
+        origin_as=origin_as,
+        change_type=message.change_type.name.lower(),
+    )
+
+class RabbitMQPublisherMetrics(BaseModel):
+    queue_depth: int
+    spilled: int
+    published: int
+    dropped: int
+    reconnects: int
+    latency_mean: float
+    latency_max: float
+
+class RabbitMQPublisher:
+    '''
+    This class publishes messages to the zettabgp exchange from a background thread.
+    The parser only hands the messages over by a bounded queue, so a stalled broker does not stall the parsing.
+    The thread owns the connection, it answers the heartbeats of the broker and reconnects after connection errors.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, queue_size: int = 10000, overflow: str = 'block', spill_path: str = None, topic_exchange: str = None):
         '''
-        Initializes the RabbitMQAdapter.
+        Initializes the RabbitMQPublisher and starts its thread.
 
         Author:
             Benedikt Schwering <bes9584@thi.de>
 
         Args:
-            parser (RouteUpdateParser): The parser to receive the parsed messages from.
-            no_direct (bool): Whether to disable the direct route updates.
-            queue_interval (int): The interval in minutes to group the route updates.
+            queue_size (int): Maximum number of queued messages.
+            overflow (str): One of RABBITMQ_OVERFLOW_POLICIES.
+            spill_path (str): Directory of the spill file, None for the default temporary directory.
+            topic_exchange (str): Name of the topic exchange declared next to the zettabgp exchange, None for no topic exchange.
+        '''
+        if overflow not in RABBITMQ_OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown RABBIT_MQ_OVERFLOW {overflow}, expected one of {", ".join(RABBITMQ_OVERFLOW_POLICIES)}')
+
+        if topic_exchange == RABBITMQ_EXCHANGE:
+            raise ValueError(f'RABBIT_MQ_TOPIC_EXCHANGE must not be the {RABBITMQ_EXCHANGE} exchange, it is a direct exchange')
+
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.topic_exchange = topic_exchange
+
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+
+        # Spilled messages are appended to the file and read from the offset
+        self._spill_file = None
+        self._spill_offset = 0
+        self._spill_count = 0
+        self._spill_lock = threading.Lock()
+
+        # Number of handed over messages that are neither published nor dropped
+        self._pending = 0
+        self._pending_condition = threading.Condition()
+
+        self._published = 0
+        self._dropped = 0
+        self._reconnects = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+        self._connection: pika.BlockingConnection = None
+        self._channel = None
+        self._closing = threading.Event()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name='rabbitmq-publisher',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def publish(self, routing_key: str, body: Union[bytes, str], properties: dict = None, exchange: str = RABBITMQ_EXCHANGE):
+        '''
+        Hands a message over to the publisher thread.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            routing_key (str): The routing key of the message.
+            body (Union[bytes, str]): The body of the message.
+            properties (dict): The keyword arguments of the pika.BasicProperties of the message.
+            exchange (str): The exchange of the message, the zettabgp exchange or the topic exchange.
+        '''
+        with self._pending_condition:
+            self._pending += 1
+
+        message = (exchange, routing_key, body, properties or {}, time.monotonic())
+
+        if self.overflow == 'block':
+            self._queue.put(message)
+        elif self.overflow == 'drop-oldest':
+            while True:
+                try:
+                    self._queue.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        continue
+
+                    self._dropped += 1
+                    self._done()
+        else:
+            with self._spill_lock:
+                # Once spilling, all messages are spilled until the file is read, so the order is kept
+                if not self._spill_count:
+                    try:
+                        self._queue.put_nowait(message)
+                        return
+                    except queue.Full:
+                        pass
+
+                self._spill(message)
+
+    def flush(self, timeout: float = None) -> bool:
+        '''
+        Waits until all handed over messages are published or dropped.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            timeout (float): Maximum time to wait in seconds, None to wait until published.
+
+        Returns:
+            bool: Whether all messages were published or dropped.
+        '''
+        with self._pending_condition:
+            return self._pending_condition.wait_for(
+                predicate=lambda: self._pending == 0,
+                timeout=timeout,
+            )
+
+    def close(self, timeout: float = RABBITMQ_CLOSE_TIMEOUT):
+        '''
+        Publishes the queued messages, closes the connection and stops the thread.
+        Messages that are not published within the timeout are lost.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            timeout (float): Maximum time to wait for the queued messages in seconds.
+        '''
+        if not self.flush(timeout):
+            print(f'Could not publish {self._pending} messages to RabbitMQ')
+
+        self._closing.set()
+        self._thread.join(timeout)
+
+    def metrics(self) -> RabbitMQPublisherMetrics:
+        '''
+        Returns the metrics of the publisher, e.g. for sizing the queue.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Returns:
+            RabbitMQPublisherMetrics: The current queue depth and the counters since the start, latencies are in seconds.
         '''
-        global channel
+        return RabbitMQPublisherMetrics(
+            queue_depth=self._queue.qsize(),
+            spilled=self._spill_count,
+            published=self._published,
+            dropped=self._dropped,
+            reconnects=self._reconnects,
+            latency_mean=self._latency_total / self._published if self._published else 0.0,
+            latency_max=self._latency_max,
+        )
+
+    def _done(self):
+        with self._pending_condition:
+            self._pending -= 1
+
+            if not self._pending:
+                self._pending_condition.notify_all()
+
+    def _spill(self, message: tuple[str, str, Union[bytes, str], dict, float]):
+        exchange, routing_key, body, properties, enqueued = message
+        fields = [
+            exchange.encode(),
+            routing_key.encode(),
+            body.encode() if isinstance(body, str) else body,
+            json.dumps(properties).encode(),
+        ]
+
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(dir=self.spill_path)
+
+        # Lengths of the fields and the time of the hand over, followed by the fields
+        self._spill_file.seek(0, os.SEEK_END)
+        self._spill_file.write(struct.pack('!IIIId', *[len(field) for field in fields], enqueued) + b''.join(fields))
+        self._spill_count += 1
+
+    def _unspill(self) -> Optional[tuple[str, str, bytes, dict, float]]:
+        with self._spill_lock:
+            if not self._spill_count:
+                return None
+
+            self._spill_file.seek(self._spill_offset)
+            *lengths, enqueued = struct.unpack('!IIIId', self._spill_file.read(24))
+            exchange, routing_key, body, properties = [self._spill_file.read(length) for length in lengths]
 
-        connection = pika.BlockingConnection(
+            self._spill_offset = self._spill_file.tell()
+            self._spill_count -= 1
+
+            # The file is emptied when all spilled messages are read
+            if not self._spill_count:
+                self._spill_file.truncate(0)
+                self._spill_offset = 0
+
+            return exchange.decode(), routing_key.decode(), body, json.loads(properties), enqueued
+
+    def _next_message(self) -> Optional[tuple[str, str, Union[bytes, str], dict, float]]:
+        # Queued messages are older than the spilled ones
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        if message := self._unspill():
+            return message
+
+        try:
+            return self._queue.get(timeout=1)
+        except queue.Empty:
+            return None
+
+    def _connect(self):
+        self._connection = pika.BlockingConnection(
             pika.ConnectionParameters(
                 host=os.getenv('RABBIT_MQ_HOST', 'localhost'),
+                heartbeat=int(os.getenv('RABBIT_MQ_HEARTBEAT', 60)),
             )
         )
 
         # Creates a channel for the connection and declares the zettabgp exchange
-        channel = connection.channel()
-        channel.exchange_declare(
-            exchange='zettabgp',
+        self._channel = self._connection.channel()
+        self._channel.exchange_declare(
+            exchange=RABBITMQ_EXCHANGE,
             exchange_type='direct',
         )
 
+        # Consumers bind their own queues to the topic exchange, so no queue is declared for it
+        if self.topic_exchange:
+            self._channel.exchange_declare(
+                exchange=self.topic_exchange,
+                exchange_type='topic',
+            )
+
         # Declares the test_bgp_updates queue and binds it to the zettabgp exchange
         def _declare_test_queue(queue_name: str, routing_key: str):
-            channel.queue_declare(
+            self._channel.queue_declare(
                 queue=queue_name,
             )
-            channel.queue_bind(
-                exchange='zettabgp',
+            self._channel.queue_bind(
+                exchange=RABBITMQ_EXCHANGE,
                 queue=queue_name,
                 routing_key=routing_key,
             )
@@ -69,48 +460,393 @@ class RabbitMQAdapter:
             routing_key='grouped',
         )
 
-        if not no_direct:
-            @parser.on_update
-            def direct(message: RouteUpdate):
-                global channel
-
-                # Check if channel is closed and create a new one
-                # Necessary when triggering multiple scenarios in a row
-                if channel.is_closed:
-                    channel = connection.channel()
-                
-                channel.basic_publish(
-                    exchange='zettabgp',
-                    body=message.model_dump_json(),
-                    routing_key='direct',
+    def _disconnect(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+
+        self._connection = None
+        self._channel = None
+
+    def _publish(self, exchange: str, routing_key: str, body: Union[bytes, str], properties: dict) -> bool:
+        reconnect_delay = 1
+
+        # The message is kept until it is published or the publisher is closed, the connection is retried with increasing delays
+        while not self._closing.is_set():
+            try:
+                if self._channel is None or self._channel.is_closed:
+                    self._disconnect()
+                    self._connect()
+
+                self._channel.basic_publish(
+                    exchange=exchange,
+                    body=body,
+                    routing_key=routing_key,
+                    properties=pika.BasicProperties(**properties),
                 )
+                return True
+            except (pika.exceptions.AMQPError, OSError) as error:
+                self._disconnect()
+                self._reconnects += 1
 
-        if queue_interval:
-            queue_interval_stop: datetime = None
-            queue_interval_messages: list[RouteUpdate] = []
-        
-            @parser.on_update
-            def grouped(message: RouteUpdate):
-                nonlocal queue_interval_stop
-
-                if queue_interval_stop:
-                    if message.timestamp >= queue_interval_stop:
-                        channel.basic_publish(
-                            exchange='zettabgp',
-                            body=json.dumps([
-                                message.model_dump(
-                                    mode='json',
-                                ) 
-                                    for message in queue_interval_messages
-                            ]),
-                            routing_key='grouped',
-                        )
+                print(f'Could not publish to RabbitMQ, reconnecting in {reconnect_delay}s: {error!r}')
+                # Returns early when the publisher is closed
+                self._closing.wait(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, 30)
+
+        return False
+
+    def _run(self):
+        while not self._closing.is_set():
+            message = self._next_message()
+
+            if message is None:
+                # Answers the heartbeats of the broker while idle
+                try:
+                    if self._connection is not None and self._connection.is_open:
+                        self._connection.process_data_events(time_limit=0)
+                except Exception:
+                    self._disconnect()
+
+                continue
+
+            *message, enqueued = message
+
+            # Any other error of a message, e.g. invalid properties, drops only this message and keeps the thread running
+            try:
+                published = self._publish(*message)
+            except Exception as error:
+                print(f'Could not publish to RabbitMQ, dropping the message: {error!r}')
+                published = False
+
+            if published:
+                latency = time.monotonic() - enqueued
+                self._published += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+            else:
+                self._dropped += 1
+
+            self._done()
+
+        self._disconnect()
+
+# Publisher shared by all adapters of the process, see get_rabbitmq_publisher
+_publisher: RabbitMQPublisher = None
+_publisher_lock = threading.Lock()
+
+def get_rabbitmq_publisher() -> RabbitMQPublisher:
+    '''
+    Returns the RabbitMQ publisher shared by the whole process, the publisher is started on first use.
+    The queue size and overflow policy are configured by environment variables.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
 
-                        queue_interval_stop = queue_interval_stop + timedelta(minutes=queue_interval)
-                        queue_interval_messages.clear()
-                else:
+    Returns:
+        RabbitMQPublisher: The shared publisher.
+    '''
+    global _publisher
+
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = RabbitMQPublisher(
+                queue_size=int(os.getenv('RABBIT_MQ_QUEUE_SIZE', 10000)),
+                overflow=os.getenv('RABBIT_MQ_OVERFLOW', 'block'),
+                spill_path=os.getenv('RABBIT_MQ_SPILL_PATH'),
+                topic_exchange=os.getenv('RABBIT_MQ_TOPIC_EXCHANGE') or None,
+            )
+
+        return _publisher
+
+def close_rabbitmq_publisher():
+    '''
+    Publishes the queued messages and stops the shared RabbitMQ publisher.
+    Called on shutdown of the WebApp and when the interpreter exits, a later get_rabbitmq_publisher starts a new publisher.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    global _publisher
+
+    with _publisher_lock:
+        if _publisher is not None:
+            _publisher.close()
+            _publisher = None
+
+atexit.register(close_rabbitmq_publisher)
+
+# Maximum size of a grouped message in bytes, larger intervals are published in parts, set by RABBIT_MQ_GROUPED_MAX_BYTES
+RABBITMQ_GROUPED_MAX_BYTES = 64 << 20
+
+class _GroupedWindow:
+    def __init__(self, publisher: RabbitMQPublisher, queue_interval: int, max_bytes: int = RABBITMQ_GROUPED_MAX_BYTES, encoder: Callable[[RouteUpdateRecord], bytes] = None, live_feed: bool = False):
+        self.publisher = publisher
+        self.queue_interval = queue_interval
+        self.max_bytes = max_bytes
+        self.encoder = encoder or RouteUpdateRecord.to_json
+        # Only the timestamps of a live feed advance in wall-clock time, playbacks are paused, slowed down or sped up
+        self.live_feed = live_feed
+
+        # The route updates are serialized when they are added, the list is closed when a part is published
+        self.buffer = bytearray()
+        self.count = 0
+        self.part = 0
+        self.stop: datetime = None
+
+        # Timestamp of the last added route update and the monotonic time it was added at
+        self.last_timestamp: datetime = None
+        self.last_added = 0.0
+
+        self.timer: threading.Timer = None
+        self.lock = threading.RLock()
+
+    def add(self, messages: list[RouteUpdateRecord]):
+        with self.lock:
+            for message in messages:
+                if self.stop is None:
                     # -1 seconds to avoid unpublished last interval when the next message is exactly at the stop time
                     # this occurs when simulating with mrt-simulation and same -o value
-                    queue_interval_stop = message.timestamp + timedelta(minutes=queue_interval, seconds=-1)
+                    self.stop = message.timestamp + timedelta(minutes=self.queue_interval, seconds=-1)
+
+                # The boundaries only depend on the timestamps, intervals without route updates are skipped
+                while message.timestamp >= self.stop:
+                    self.close()
+                    self.stop = self.stop + timedelta(minutes=self.queue_interval)
+
+                if self.buffer:
+                    self.buffer += b','
+
+                self.buffer += self.encoder(message)
+                self.count += 1
+
+                if len(self.buffer) >= self.max_bytes:
+                    self.publish(last=False)
+
+            if messages:
+                self.last_timestamp = messages[-1].timestamp
+                self.last_added = time.monotonic()
+
+            if self.live_feed and self.count and self.timer is None:
+                self.schedule()
+
+    def schedule(self):
+        # Waits until the message time reaches the stop, if it advanced in wall-clock time since the last route update
+        self.timer = threading.Timer(
+            interval=max((self.stop - self.last_timestamp).total_seconds() - (time.monotonic() - self.last_added), 0),
+            function=self.expire,
+        )
+        self.timer.daemon = True
+        self.timer.start()
+
+    def expire(self):
+        # A quiet live feed is closed by the timer, its route updates are timestamped in wall-clock time
+        # So once the message time must have passed the stop, no more route updates of the interval can follow
+        with self.lock:
+            self.timer = None
+
+            if not self.count and not self.part:
+                return
+
+            if self.last_timestamp + timedelta(seconds=time.monotonic() - self.last_added) >= self.stop:
+                self.close()
+            else:
+                self.schedule()
+
+    def close(self):
+        # Publishes the last part of the interval, the stop is advanced by the next route update
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if self.count or self.part:
+                self.publish(last=True)
+
+            self.part = 0
+
+    def publish(self, last: bool):
+        self.publisher.publish(
+            routing_key='grouped',
+            body=b'[' + self.buffer + b']',
+            properties={
+                'content_type': RABBITMQ_CONTENT_TYPES['json'],
+                'type': RABBITMQ_BATCH_MESSAGE_TYPE,
+                # Consumers join the parts of an interval until the last one
+                'headers': {
+                    'interval_stop': self.stop.isoformat(),
+                    'part': self.part,
+                    'last': last,
+                },
+            },
+        )
+
+        self.buffer = bytearray()
+        self.count = 0
+        self.part += 1
+
+class RabbitMQAdapter:
+    '''
+    This class is responsible for receiving the parsed messages and forwarding them to the RabbitMQ message broker.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, parser: RouteUpdateParser, no_direct: bool, queue_interval: int, live_feed: bool = False):
+        '''
+        Initializes the RabbitMQAdapter.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            parser (RouteUpdateParser): The parser to receive the parsed messages from.
+            no_direct (bool): Whether to disable the direct route updates.
+            queue_interval (int): The interval in minutes to group the route updates.
+            live_feed (bool): Whether the route updates are received live, so quiet intervals are closed by a timer.
+        '''
+        # The messages are published by the background thread of the shared publisher
+        publisher = get_rabbitmq_publisher()
+
+        encoding = os.getenv('RABBIT_MQ_ENCODING', 'json')
+
+        if encoding not in RABBITMQ_CONTENT_TYPES:
+            raise ValueError(f'Unknown RABBIT_MQ_ENCODING {encoding}, expected one of {", ".join(RABBITMQ_CONTENT_TYPES)}')
+
+        if encoding == 'msgpack' and msgpack is None:
+            raise ImportError('msgpack is required for RABBIT_MQ_ENCODING=msgpack, install ZettaBGP with the msgpack extra')
+
+        # Batched framing of the direct route updates is opt-in, consumers have to decode a list per message
+        direct_batch_size = int(os.getenv('RABBIT_MQ_DIRECT_BATCH_SIZE', 0))
+        # zlib compression level of the batches, 0 disables the compression
+        compression = int(os.getenv('RABBIT_MQ_COMPRESSION', 0))
+
+        # Each route update is serialized once per encoding, the queues using the same encoding share it by a bounded cache
+        sink_encodings = [encoding] * ((not no_direct) + bool(publisher.topic_exchange)) + (['json'] if queue_interval else [])
+        encoding_cache_size = int(os.getenv('RABBIT_MQ_ENCODING_CACHE_SIZE', RABBITMQ_ENCODING_CACHE_SIZE))
+
+        def get_encoder(name: str) -> Callable[[RouteUpdateRecord], bytes]:
+            if sink_encodings.count(name) < 2:
+                return lambda message: encode_route_update(message, name)
+
+            return _EncodingCache(
+                encoding=name,
+                maxsize=encoding_cache_size,
+            ).encode
+
+        encoders = {
+            name: get_encoder(name)
+                for name in set(sink_encodings)
+        }
+
+        def publish_batch(messages: list[RouteUpdateRecord], routing_key: str, exchange: str = RABBITMQ_EXCHANGE):
+            body = encode_route_updates(
+                messages=messages,
+                encoding=encoding,
+                encoder=encoders[encoding],
+            )
+
+            # The repeated field names of the route updates are compressed well
+            if compression:
+                body = zlib.compress(body, compression)
+
+            publisher.publish(
+                routing_key=routing_key,
+                body=body,
+                properties={
+                    'content_type': RABBITMQ_CONTENT_TYPES[encoding],
+                    'content_encoding': 'deflate' if compression else None,
+                    'type': RABBITMQ_BATCH_MESSAGE_TYPE,
+                },
+                exchange=exchange,
+            )
+
+        def publish_message(message: RouteUpdateRecord, routing_key: str, exchange: str = RABBITMQ_EXCHANGE):
+            publisher.publish(
+                routing_key=routing_key,
+                body=encoders[encoding](message),
+                properties={
+                    'content_type': RABBITMQ_CONTENT_TYPES[encoding],
+                    'type': RABBITMQ_MESSAGE_TYPE,
+                },
+                exchange=exchange,
+            )
+
+        if not no_direct and direct_batch_size:
+            # A batch is published when it holds the batch size or after the interval in milliseconds
+            def direct_batch(messages: list[RouteUpdateRecord]):
+                publish_batch(
+                    messages=messages,
+                    routing_key='direct',
+                )
+
+            parser.on_update_batch(
+                fn=direct_batch,
+                batch_size=direct_batch_size,
+                batch_interval=float(os.getenv('RABBIT_MQ_DIRECT_BATCH_INTERVAL', 1000)),
+            )
+        elif not no_direct:
+            @parser.on_update_batch
+            def direct(messages: list[RouteUpdateRecord]):
+                for message in messages:
+                    publish_message(
+                        message=message,
+                        routing_key='direct',
+                    )
+
+        # The topic exchange is opt-in, consumers bind only to the route updates they analyse and the broker filters the rest
+        if publisher.topic_exchange:
+            def topic(messages: list[RouteUpdateRecord]):
+                if not direct_batch_size:
+                    for message in messages:
+                        publish_message(
+                            message=message,
+                            routing_key=get_topic_routing_key(message),
+                            exchange=publisher.topic_exchange,
+                        )
+
+                    return
+
+                # With batched framing the batches are split by routing key, the order of a routing key is kept
+                batches: dict[str, list[RouteUpdateRecord]] = {}
+
+                for message in messages:
+                    batches.setdefault(get_topic_routing_key(message), []).append(message)
+
+                for routing_key, batch in batches.items():
+                    publish_batch(
+                        messages=batch,
+                        routing_key=routing_key,
+                        exchange=publisher.topic_exchange,
+                    )
+
+            parser.on_update_batch(
+                fn=topic,
+                batch_size=direct_batch_size or None,
+                batch_interval=float(os.getenv('RABBIT_MQ_DIRECT_BATCH_INTERVAL', 1000)) if direct_batch_size else None,
+            )
+
+        if queue_interval:
+            grouped_window = _GroupedWindow(
+                publisher=publisher,
+                queue_interval=queue_interval,
+                max_bytes=int(os.getenv('RABBIT_MQ_GROUPED_MAX_BYTES', RABBITMQ_GROUPED_MAX_BYTES)),
+                encoder=encoders['json'],
+                live_feed=live_feed,
+            )
+
+            # Intervals are closed by the timestamps of the route updates, by a timer when a live feed is quiet and when the input ends
+            # Flushing the parser, e.g. before a playback pause, does not close the interval
+            parser.on_update_batch(grouped_window.add)
+            parser.on_close(grouped_window.close)
+
+        flush_timeout = float(os.getenv('RABBIT_MQ_FLUSH_TIMEOUT', RABBITMQ_FLUSH_TIMEOUT))
 
-                queue_interval_messages.append(message)
+        # All messages of the parser are published when it is flushed, e.g. at the end of a file
+        # The wait is bounded, so the parser is not stalled by an unreachable broker, the messages stay queued
+        @parser.on_flush
+        def flush():
+            if not publisher.flush(flush_timeout):
+                print(f'Could not publish all messages to RabbitMQ within {flush_timeout}s, they stay queued')
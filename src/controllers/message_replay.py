@@ -44,9 +44,14 @@ def start_message_replay(message_replay_request: MessageReplayRequest) -> Messag
         end_timestamp=None,
         start_time=message_replay_request.start_time + ':00',
         end_time=message_replay_request.end_time + ':00',
+        validate_messages=message_replay_request.validate_messages,
     )
 
     return MessageReplayResult(
         count_announce=message_replay_result.count_announce,
         count_withdraw=message_replay_result.count_withdraw,
+        count_by_peer=message_replay_result.count_by_peer,
+        count_by_interval=message_replay_result.count_by_interval,
+        playback_lag_max=message_replay_result.playback_lag_max,
+        playback_lag_mean=message_replay_result.playback_lag_mean,
     )
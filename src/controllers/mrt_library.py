@@ -119,4 +119,6 @@ def start_mrt_scenario(mrt_scenario_request: MRTScenarioRequest) -> MRTScenarioR
     return MRTScenarioResult(
         count_announce=mrt_simulation_result.count_announce,
         count_withdraw=mrt_simulation_result.count_withdraw,
+        playback_lag_max=mrt_simulation_result.playback_lag_max,
+        playback_lag_mean=mrt_simulation_result.playback_lag_mean,
     )
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.adapters.rabbitmq import RabbitMQPublisherMetrics, get_rabbitmq_publisher
+from fastapi import APIRouter
+
+rabbitmq_router = APIRouter()
+
+@rabbitmq_router.get('/metrics')
+def get_rabbitmq_metrics() -> RabbitMQPublisherMetrics:
+    '''
+    This function returns the metrics of the RabbitMQ publisher, e.g. for sizing its queue.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Returns:
+        RabbitMQPublisherMetrics: The metrics of the RabbitMQ publisher.
+    '''
+    return get_rabbitmq_publisher().metrics()
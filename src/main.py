@@ -14,8 +14,14 @@ import src.services.mrt_simulation as mrt_simulation_service
 import src.services.message_replay as message_replay_service
 import src.services.rib_load as rib_load_service
 import src.services.exabgp as exabgp_service
+import src.services.mongodb_indexes as mongodb_indexes_service
+import src.services.mongodb_migration as mongodb_migration_service
+from src.adapters.mongodb import MONGODB_ID_SCHEMAS, get_mongodb_id_schema
+from src.parsers.mrt_filter import MESSAGE_TYPES
 from src.webapp import start_webapp
-import click
+from rich.table import Table
+from rich import print
+import click, os
 
 @click.group()
 def cli():
@@ -85,6 +91,13 @@ def exabgp(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool
         clear_mongodb=clear_mongodb,
     )
 
+def _print_playback_lag(playback_lag_max: float, playback_lag_mean: float):
+    # The lag is only measured with a playback speed, it shows whether the playback kept up with it
+    if playback_lag_max is None:
+        return
+
+    print(f'Playback lag: max {playback_lag_max:.3f} s, mean {playback_lag_mean:.3f} s')
+
 @cli.command(
     name='mrt-simulation',
     help='Process BGP4MP MRT files.',
@@ -127,7 +140,7 @@ def exabgp(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool
 @click.option(
     '--playback-speed',
     '-p',
-    type=int,
+    type=float,
     default=None,
     show_default='1',
     is_flag=False,
@@ -144,6 +157,73 @@ def exabgp(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool
     flag_value=5,
     help='Playback interval in minutes.',
 )
+@click.option(
+    '--native-decoder',
+    '-n',
+    is_flag=True,
+    help='Decode BGP4MP records with the built-in decoder instead of mrtparse.',
+)
+@click.option(
+    '--workers',
+    '-w',
+    type=int,
+    default=None,
+    show_default='CPU count',
+    is_flag=False,
+    flag_value=os.cpu_count(),
+    help='Number of worker processes for decoding the MRT files in parallel.',
+)
+@click.option(
+    '--decompression-threads',
+    '-z',
+    type=int,
+    default=None,
+    show_default='CPU count',
+    is_flag=False,
+    flag_value=os.cpu_count(),
+    help='Number of threads for decompressing multi-stream bz2 or gzip files in parallel.',
+)
+@click.option(
+    '--start-time',
+    '-r',
+    type=str,
+    help='Starttime of simulation as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.',
+)
+@click.option(
+    '--end-time',
+    '-f',
+    type=str,
+    help='Endtime of simulation as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.',
+)
+@click.option(
+    '--peer',
+    '-i',
+    type=str,
+    multiple=True,
+    help='Only process route updates of the peer with this IP address, can be given multiple times.',
+)
+@click.option(
+    '--peer-as',
+    '-a',
+    type=int,
+    multiple=True,
+    help='Only process route updates of peers with this AS number, can be given multiple times.',
+)
+@click.option(
+    '--prefix-within',
+    '-x',
+    type=str,
+    multiple=True,
+    help='Only process routes within this prefix in CIDR notation, can be given multiple times.',
+)
+@click.option(
+    '--message-type',
+    '-m',
+    type=click.Choice(sorted(MESSAGE_TYPES)),
+    metavar='SUBTYPE',
+    multiple=True,
+    help='Only process MRT records of this subtype, can be given multiple times.',
+)
 @click.argument(
     'mrt_files',
     type=click.Path(
@@ -153,7 +233,7 @@ def exabgp(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool
     required=True,
     nargs=-1,
 )
-def mrt_simulation(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, playback_speed: int, playback_interval: int, mrt_files: tuple[str, ...]):
+def mrt_simulation(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, playback_speed: float, playback_interval: int, native_decoder: bool, workers: int, decompression_threads: int, start_time: str, end_time: str, peer: tuple[str, ...], peer_as: tuple[int, ...], prefix_within: tuple[str, ...], message_type: tuple[str, ...], mrt_files: tuple[str, ...]):
     '''
     MRT Simulation command for retrieving BGP messages from MRT files and processing them.
 
@@ -168,11 +248,20 @@ def mrt_simulation(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_l
         no_mongodb_state (bool): Disable state storage to MongoDB.
         no_mongodb_statistics (bool): Disable statistics storage to MongoDB.
         clear_mongodb (bool): Clear MongoDB collections.
-        playback_speed (int): Playback speed in multiples of real time.
+        playback_speed (float): Playback speed in multiples of real time.
         playback_interval (int): Playback interval in minutes.
+        native_decoder (bool): Decode BGP4MP records with the built-in decoder instead of mrtparse.
+        workers (int): Number of worker processes for decoding the MRT files in parallel.
+        decompression_threads (int): Number of threads for decompressing multi-stream bz2 or gzip files in parallel.
+        start_time (str): Starttime of simulation as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
+        end_time (str): Endtime of simulation as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
+        peer (tuple[str, ...]): Only process route updates of the peers with these IP addresses.
+        peer_as (tuple[int, ...]): Only process route updates of peers with these AS numbers.
+        prefix_within (tuple[str, ...]): Only process routes within these prefixes in CIDR notation.
+        message_type (tuple[str, ...]): Only process MRT records of these subtypes.
         mrt_files (tuple[str, ...]): MRT files to process.
     '''
-    mrt_simulation_service.mrt_simulation(
+    mrt_simulation_result = mrt_simulation_service.mrt_simulation(
         no_rabbitmq_direct=no_rabbitmq_direct,
         rabbitmq_grouped=rabbitmq_grouped,
         no_mongodb_log=no_mongodb_log,
@@ -181,9 +270,23 @@ def mrt_simulation(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_l
         clear_mongodb=clear_mongodb,
         playback_speed=playback_speed,
         playback_interval=playback_interval,
+        native_decoder=native_decoder,
+        workers=workers,
+        decompression_threads=decompression_threads,
+        start_time=start_time,
+        end_time=end_time,
+        peer=peer,
+        peer_as=peer_as,
+        prefix_within=prefix_within,
+        message_type=message_type,
         mrt_files=mrt_files,
     )
 
+    _print_playback_lag(
+        playback_lag_max=mrt_simulation_result.playback_lag_max,
+        playback_lag_mean=mrt_simulation_result.playback_lag_mean,
+    )
+
 @cli.command(
     name='webapp',
     help='Open the admin webapp.',
@@ -246,6 +349,55 @@ def webapp(reload: bool):
     '-c',
     is_flag=True,
 )
+@click.option(
+    '--workers',
+    '-w',
+    type=int,
+    default=None,
+    show_default='CPU count',
+    is_flag=False,
+    flag_value=os.cpu_count(),
+    help='Number of worker processes for decoding the RIB file in parallel.',
+)
+@click.option(
+    '--decompression-threads',
+    '-z',
+    type=int,
+    default=None,
+    show_default='CPU count',
+    is_flag=False,
+    flag_value=os.cpu_count(),
+    help='Number of threads for decompressing multi-stream bz2 or gzip files in parallel.',
+)
+@click.option(
+    '--peer',
+    '-i',
+    type=str,
+    multiple=True,
+    help='Only process routes of the peer with this IP address, can be given multiple times.',
+)
+@click.option(
+    '--peer-as',
+    '-a',
+    type=int,
+    multiple=True,
+    help='Only process routes of peers with this AS number, can be given multiple times.',
+)
+@click.option(
+    '--prefix-within',
+    '-x',
+    type=str,
+    multiple=True,
+    help='Only process routes within this prefix in CIDR notation, can be given multiple times.',
+)
+@click.option(
+    '--message-type',
+    '-m',
+    type=click.Choice(sorted(MESSAGE_TYPES)),
+    metavar='SUBTYPE',
+    multiple=True,
+    help='Only process MRT records of this subtype, can be given multiple times.',
+)
 @click.argument(
     'rib_file',
     type=click.Path(
@@ -253,7 +405,7 @@ def webapp(reload: bool):
         resolve_path=True,
     ),
 )
-def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, rib_file: str):
+def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, workers: int, decompression_threads: int, peer: tuple[str, ...], peer_as: tuple[int, ...], prefix_within: tuple[str, ...], message_type: tuple[str, ...], rib_file: str):
     '''
     RIB Load command for retrieving BGP routes from RIB files and loading them.
 
@@ -267,6 +419,12 @@ def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bo
         no_mongodb_state (bool): Disable state storage to MongoDB.
         no_mongodb_statistics (bool): Disable statistics storage to MongoDB.
         clear_mongodb (bool): Clear MongoDB collections.
+        workers (int): Number of worker processes for decoding the RIB file in parallel.
+        decompression_threads (int): Number of threads for decompressing multi-stream bz2 or gzip files in parallel.
+        peer (tuple[str, ...]): Only process routes of the peers with these IP addresses.
+        peer_as (tuple[int, ...]): Only process routes of peers with these AS numbers.
+        prefix_within (tuple[str, ...]): Only process routes within these prefixes in CIDR notation.
+        message_type (tuple[str, ...]): Only process MRT records of these subtypes.
         rib_file (str): RIB file to process.
     '''
     rib_load_service.rib_load(
@@ -277,6 +435,12 @@ def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bo
         no_mongodb_statistics=no_mongodb_statistics,
         clear_mongodb=clear_mongodb,
         rib_file=rib_file,
+        workers=workers,
+        decompression_threads=decompression_threads,
+        peer=peer,
+        peer_as=peer_as,
+        prefix_within=prefix_within,
+        message_type=message_type,
     )
 
 @cli.command(
@@ -321,7 +485,7 @@ def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bo
 @click.option(
     '--playback-speed',
     '-p',
-    type=int,
+    type=float,
     default=None,
     show_default='1',
     is_flag=False,
@@ -364,7 +528,13 @@ def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bo
     type=str,
     help='Endtime of replay as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.',
 )
-def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, playback_speed: int, playback_interval: int, start_timestamp: float, end_timestamp: float, start_time: str, end_time: str):
+@click.option(
+    '--validate',
+    '-v',
+    is_flag=True,
+    help='Validate the replayed messages against the RouteUpdate model.',
+)
+def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, playback_speed: float, playback_interval: int, start_timestamp: float, end_timestamp: float, start_time: str, end_time: str, validate: bool):
     '''
     Message replay command for replaying BGP messages from Database log.
 
@@ -378,14 +548,15 @@ def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_l
         no_mongodb_state (bool): Disable state storage to MongoDB.
         no_mongodb_statistics (bool): Disable statistics storage to MongoDB.
         clear_mongodb (bool): Clear MongoDB collections.
-        playback_speed (int): Playback speed in multiples of real time.
+        playback_speed (float): Playback speed in multiples of real time.
         playback_interval (int): Playback interval in minutes.
         start_timestamp (float): Starttime of replay as timestamp.
         end_timestamp (float): Endtime of replay as timestamp.
         start_time (str): Starttime of replay as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
         end_time (str): Endtime of replay as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
+        validate (bool): Validate the replayed messages against the RouteUpdate model.
     '''
-    message_replay_service.message_replay(
+    message_replay_result = message_replay_service.message_replay(
         no_rabbitmq_direct=no_rabbitmq_direct,
         rabbitmq_grouped=rabbitmq_grouped,
         no_mongodb_log=no_mongodb_log,
@@ -398,4 +569,80 @@ def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_l
         end_timestamp=end_timestamp,
         start_time=start_time,
         end_time=end_time,
+        validate_messages=validate,
+    )
+
+    _print_playback_lag(
+        playback_lag_max=message_replay_result.playback_lag_max,
+        playback_lag_mean=message_replay_result.playback_lag_mean,
     )
+
+@cli.command(
+    name='mongodb-indexes',
+    help='Report the usage and size of the MongoDB indexes.',
+)
+@click.option(
+    '--create-missing',
+    '-c',
+    is_flag=True,
+    help='Create the missing indexes before reporting.',
+)
+def mongodb_indexes(create_missing: bool):
+    '''
+    MongoDB indexes command for reporting the usage and size of the indexes of the storage collections.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        create_missing (bool): Create the missing indexes before reporting.
+    '''
+    table = Table('Database', 'Index', 'Operations', 'Since', 'Size')
+
+    for index_usage in mongodb_indexes_service.mongodb_indexes(
+        create_missing=create_missing,
+    ):
+        table.add_row(
+            index_usage.database,
+            f'[dark_orange]{index_usage.name} (missing)[/]' if index_usage.missing else index_usage.name,
+            '' if index_usage.operations is None else str(index_usage.operations),
+            '' if index_usage.since is None else index_usage.since.isoformat(sep=' ', timespec='seconds'),
+            '' if index_usage.size is None else f'{index_usage.size / 1024 / 1024:.1f} MiB',
+        )
+
+    print(table)
+
+@cli.command(
+    name='mongodb-migrate-ids',
+    help='Convert the _id of the MongoDB state and statistics documents to another schema.',
+)
+@click.option(
+    '--id-schema',
+    '-i',
+    type=click.Choice(MONGODB_ID_SCHEMAS),
+    default=None,
+    show_default='MONGO_DB_ID_SCHEMA',
+    help='Schema of the _id to convert to.',
+)
+def mongodb_migrate_ids(id_schema: str):
+    '''
+    MongoDB migration command for converting the _id of the state and statistics documents to another schema.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        id_schema (str): Schema of the _id to convert to.
+    '''
+    table = Table('Database', 'Documents', 'Migrated')
+
+    for migration_result in mongodb_migration_service.mongodb_migrate_ids(
+        id_schema=id_schema or get_mongodb_id_schema(),
+    ):
+        table.add_row(
+            migration_result.database,
+            str(migration_result.count_documents),
+            str(migration_result.count_migrated),
+        )
+
+    print(table)
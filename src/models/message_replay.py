@@ -11,6 +11,7 @@ Author:
     Sebastian Forstner <sef9869@thi.de>
 '''
 from pydantic import BaseModel
+from datetime import datetime
 from typing import Optional
 
 class MessageReplayRequest(BaseModel):
@@ -26,9 +27,33 @@ class MessageReplayRequest(BaseModel):
     no_mongodb_state: bool
     no_mongodb_statistics: bool
     clear_mongodb: bool
-    playback_speed: Optional[int]
+    playback_speed: Optional[float]
     start_time: str
     end_time: str
+    validate_messages: bool = False
+
+class MessageReplayPeerCount(BaseModel):
+    '''
+    This class represents the number of replayed messages of a peer.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    peer_ip: str
+    peer_as: int
+    count_withdraw: int = 0
+    count_announce: int = 0
+
+class MessageReplayIntervalCount(BaseModel):
+    '''
+    This class represents the number of replayed messages in a time interval.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    timestamp: datetime
+    count_withdraw: int = 0
+    count_announce: int = 0
 
 class MessageReplayResult(BaseModel):
     '''
@@ -39,3 +64,7 @@ class MessageReplayResult(BaseModel):
     '''
     count_withdraw: int
     count_announce: int
+    count_by_peer: Optional[list[MessageReplayPeerCount]] = None
+    count_by_interval: Optional[list[MessageReplayIntervalCount]] = None
+    playback_lag_max: Optional[float] = None
+    playback_lag_mean: Optional[float] = None
@@ -31,6 +31,8 @@ class MRTScenarioResult(BaseModel):
     '''
     count_announce: int
     count_withdraw: int
+    playback_lag_max: Optional[float] = None
+    playback_lag_mean: Optional[float] = None
 
 class MRTScenario(BaseModel):
     '''
@@ -49,7 +51,7 @@ class MRTScenario(BaseModel):
     no_mongodb_state: bool
     no_mongodb_statistics: bool
     clear_mongodb: bool
-    playback_speed: Optional[int]
+    playback_speed: Optional[float]
     mrt_files: list[str]
 
 class MRTLibrary(BaseModel):
@@ -10,9 +10,10 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
+from pydantic_core import to_json, to_jsonable_python
+from typing import NamedTuple, Optional
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
 from enum import Enum
 
 class ChangeType(Enum):
@@ -113,3 +114,111 @@ class RouteUpdate(BaseModel):
     path_attributes: PathAttributes
     change_type: ChangeType = None
     nlri: NLRI = None
+
+def _record_dict(value):
+    # Nested records are converted field by field, the same way pydantic dumps the nested models
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return {
+            field: _record_dict(item)
+                for field, item in zip(value._fields, value)
+        }
+
+    if isinstance(value, list):
+        return [
+            _record_dict(item)
+                for item in value
+        ]
+
+    return value
+
+class NLRIRecord(NamedTuple):
+    '''
+    This class is the lightweight counterpart of NLRI used by the parsers and adapters.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    prefix: str
+    length: int
+
+class AsPathRecord(NamedTuple):
+    '''
+    This class is the lightweight counterpart of AsPath used by the parsers and adapters.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    type: AsPathType
+    value: list[int]
+
+class PathAttributesRecord(NamedTuple):
+    '''
+    This class is the lightweight counterpart of PathAttributes used by the parsers and adapters.
+    Its fields must be the same as the fields of PathAttributes.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    as_path: Optional[list[AsPathRecord]] = None
+
+class RouteUpdateRecord(NamedTuple):
+    '''
+    This class is the lightweight counterpart of RouteUpdate used by the parsers and adapters.
+    The records are not validated, they are only converted to the pydantic models or serialized at the edges.
+    The serialized records are identical to the serialized RouteUpdate models.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    timestamp: datetime
+    peer_ip: str
+    local_ip: str
+    peer_as: int
+    local_as: int
+    path_attributes: PathAttributesRecord
+    change_type: ChangeType = None
+    nlri: NLRIRecord = None
+
+    def to_dict(self, mode: str = 'python') -> dict:
+        '''
+        Converts the record to a dictionary, same as RouteUpdate.model_dump.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            mode (str): 'python' keeps the Python objects, 'json' converts them to JSON compatible types.
+
+        Returns:
+            dict: The route update as dictionary.
+        '''
+        route_update = _record_dict(self)
+
+        if mode == 'json':
+            return to_jsonable_python(route_update)
+
+        return route_update
+
+    def to_json(self) -> bytes:
+        '''
+        Serializes the record to JSON, same as RouteUpdate.model_dump_json.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Returns:
+            bytes: The route update as JSON.
+        '''
+        return to_json(_record_dict(self))
+
+    def to_model(self) -> RouteUpdate:
+        '''
+        Converts the record to the validated RouteUpdate model.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Returns:
+            RouteUpdate: The route update model.
+        '''
+        return RouteUpdate.model_validate(_record_dict(self))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from typing import Callable, Hashable, TypeVar
+from collections import OrderedDict
+
+# Number of distinct attribute sets kept per cache, older entries are evicted first
+ATTRIBUTE_CACHE_SIZE = 1 << 16
+
+T = TypeVar('T')
+
+class AttributeCache:
+    '''
+    This class is a bounded LRU cache for interning parsed path attributes.
+    Route updates with the same attributes share a single object, which must therefore never be modified.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, maxsize: int = ATTRIBUTE_CACHE_SIZE):
+        '''
+        Initializes the AttributeCache.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            maxsize (int): Maximum number of cached entries.
+        '''
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        '''
+        Returns the cached value of a key, the value is created by the factory on a miss.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            key (Hashable): The key, e.g. the raw attribute bytes or a canonical tuple of the attributes.
+            factory (Callable[[], T]): Function creating the value of the key.
+
+        Returns:
+            T: The cached value.
+        '''
+        try:
+            value = self._entries[key]
+        except KeyError:
+            value = self._entries[key] = factory()
+
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+            return value
+
+        self._entries.move_to_end(key)
+        return value
+
+    def get_by_identity(self, obj: object, factory: Callable[[], T]) -> T:
+        '''
+        Returns the cached value derived from an interned object, e.g. its serialized form.
+        The object is kept alive by the cache, so its id cannot be reused while it is cached.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            obj (object): The interned object.
+            factory (Callable[[], T]): Function creating the value of the object.
+
+        Returns:
+            T: The cached value.
+        '''
+        return self.get(
+            key=id(obj),
+            factory=lambda: (obj, factory()),
+        )[1]
@@ -10,7 +10,7 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
-from src.models.route_update import PathAttributes, RouteUpdate, OriginType, Aggregator, ChangeType, AsPathType, AsPath, NLRI
+from src.models.route_update import PathAttributesRecord, RouteUpdateRecord, OriginType, Aggregator, ChangeType, AsPathType, AsPathRecord, NLRIRecord
 from src.parsers.route_update import RouteUpdateParser
 from datetime import datetime
 import json
@@ -34,14 +34,14 @@ class ExaBGPParser(RouteUpdateParser):
             case 'incomplete':
                 return OriginType.INCOMPLETE
     
-    def _parse_as_path(self, as_path: list[int]) -> list[AsPath]:
+    def _parse_as_path(self, as_path: list[int]) -> list[AsPathRecord]:
         if as_path is None:
             return None
 
         # According to the ExaBGP documentation, the as-path attribute contains only as-sequences.
         # https://github.com/Exa-Networks/exabgp/wiki/Controlling-ExaBGP-:-API-for-received-messages#update-announcement-receive-routes
         return [
-            AsPath(
+            AsPathRecord(
                 type=AsPathType.AS_SEQUENCE,
                 value=as_path,
             )
@@ -115,10 +115,21 @@ class ExaBGPParser(RouteUpdateParser):
 
         return ext_communities
 
-    def _parse_path_attributes(self, exabgp_message: dict, next_hop: str = None) -> PathAttributes:
+    def _parse_path_attributes(self, exabgp_message: dict, next_hop: str = None) -> PathAttributesRecord:
         attribute: dict = exabgp_message['neighbor']['message']['update'].get('attribute', {})
+        as_path = attribute.get('as-path')
+
+        # The key must cover every attribute used by _build_path_attributes
+        return self._attribute_cache.get(
+            key=None if as_path is None else tuple(as_path),
+            factory=lambda: self._build_path_attributes(
+                attribute=attribute,
+                next_hop=next_hop,
+            ),
+        )
 
-        return PathAttributes(
+    def _build_path_attributes(self, attribute: dict, next_hop: str = None) -> PathAttributesRecord:
+        return PathAttributesRecord(
             # origin=self._parse_origin(
             #     origin=attribute.get('origin'),
             # ),
@@ -143,7 +154,7 @@ class ExaBGPParser(RouteUpdateParser):
             # cluster_list=attribute.get('cluster-list'),
         )
 
-    def parse(self, line: str) -> list[RouteUpdate]:
+    def parse(self, line: str) -> list[RouteUpdateRecord]:
         '''
         Parse an ExaBGP message.
 
@@ -154,16 +165,16 @@ class ExaBGPParser(RouteUpdateParser):
             line (str): The ExaBGP message.
 
         Returns:
-            list[RouteUpdate]: The parsed RouteUpdate objects.
+            list[RouteUpdateRecord]: The parsed RouteUpdateRecord objects.
         '''
-        route_updates: list[RouteUpdate] = []
+        route_updates: list[RouteUpdateRecord] = []
 
         exabgp_message = json.loads(line)
 
         if exabgp_message['type'] != 'update':
             return None
 
-        generic_update = RouteUpdate(
+        generic_update = RouteUpdateRecord(
             timestamp=datetime.fromtimestamp(
                 timestamp=exabgp_message['time'],
             ),
@@ -176,38 +187,37 @@ class ExaBGPParser(RouteUpdateParser):
             ),
         )
 
-        # Iterate over the withdraw routes and create RouteUpdate objects
+        # Iterate over the withdraw routes and create RouteUpdateRecord objects
         for withdraw_routes in exabgp_message['neighbor']['message']['update'].get('withdraw', {}).values():
             for withdraw_route in withdraw_routes:
                 route_updates.append(
-                    generic_update.model_copy(
-                        update={
-                            'change_type': ChangeType.WITHDRAW,
-                            'nlri': NLRI(
-                                prefix=withdraw_route['nlri'].split('/')[0],
-                                length=int(withdraw_route['nlri'].split('/')[1]),
-                            ),
-                        },
+                    generic_update._replace(
+                        change_type=ChangeType.WITHDRAW,
+                        nlri=NLRIRecord(
+                            prefix=withdraw_route['nlri'].split('/')[0],
+                            length=int(withdraw_route['nlri'].split('/')[1]),
+                        ),
                     )
                 )
 
-        # Iterate over the announce routes and create RouteUpdate objects
+        # Iterate over the announce routes and create RouteUpdateRecord objects
         for announce_hops in exabgp_message['neighbor']['message']['update'].get('announce', {}).values():
             for announce_hop, announce_routes in announce_hops.items():
+                # All routes of a next hop share the same path attributes
+                path_attributes = self._parse_path_attributes(
+                    exabgp_message=exabgp_message,
+                    next_hop=announce_hop,
+                )
+
                 for announce_route in announce_routes:
                     route_updates.append(
-                        generic_update.model_copy(
-                            update={
-                                'path_attributes': self._parse_path_attributes(
-                                    exabgp_message=exabgp_message,
-                                    next_hop=announce_hop,
-                                ),
-                                'change_type': ChangeType.ANNOUNCE,
-                                'nlri': NLRI(
-                                    prefix=announce_route['nlri'].split('/')[0],
-                                    length=int(announce_route['nlri'].split('/')[1]),
-                                ),
-                            },
+                        generic_update._replace(
+                            path_attributes=path_attributes,
+                            change_type=ChangeType.ANNOUNCE,
+                            nlri=NLRIRecord(
+                                prefix=announce_route['nlri'].split('/')[0],
+                                length=int(announce_route['nlri'].split('/')[1]),
+                            ),
                         )
                     )
 
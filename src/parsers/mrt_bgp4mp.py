@@ -10,7 +10,7 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
-from src.models.route_update import PathAttributes, RouteUpdate, OriginType, Aggregator, ChangeType, AsPathType, AsPath, NLRI
+from src.models.route_update import PathAttributesRecord, RouteUpdateRecord, OriginType, Aggregator, ChangeType, AsPathType, AsPathRecord, NLRIRecord
 from src.parsers.route_update import RouteUpdateParser
 from collections import OrderedDict
 from datetime import datetime
@@ -23,26 +23,27 @@ class MrtBgp4MpParser(RouteUpdateParser):
     Author:
         Benedikt Schwering <bes9584@thi.de>
     '''
-    def _parse_nlri(self, nlri: OrderedDict) -> NLRI:
+    def _parse_nlri(self, nlri: OrderedDict) -> NLRIRecord:
         nlri = dict(nlri)
         
-        return NLRI(
+        return NLRIRecord(
             prefix=nlri['prefix'],
             length=nlri['length'],
         )
     
-    def _get_path_attribute(self, path_attributes: list[OrderedDict], type: dict) -> dict:
+    def _index_path_attributes(self, path_attributes: list[OrderedDict]) -> dict[int, OrderedDict]:
+        # Index the path attributes once per message by their type code
+        # Only the first occurrence of an attribute type is used
+        path_attribute_index: dict[int, OrderedDict] = {}
+
         for path_attribute in path_attributes:
-            path_attribute = dict(path_attribute)
+            for type in path_attribute['type']:
+                path_attribute_index.setdefault(type, path_attribute)
 
-            if path_attribute['type'] == type:
-                return path_attribute
+        return path_attribute_index
     
-    def _parse_origin(self, path_attributes: list[OrderedDict]) -> OriginType:
-        origin = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={1: 'ORIGIN'},
-        )
+    def _parse_origin(self, path_attributes: dict[int, OrderedDict]) -> OriginType:
+        origin = path_attributes.get(1)
 
         if origin is None:
             return None
@@ -55,11 +56,8 @@ class MrtBgp4MpParser(RouteUpdateParser):
             case 'INCOMPLETE':
                 return OriginType.INCOMPLETE
 
-    def _parse_as_path(self, path_attributes: list[OrderedDict]) -> list[AsPath]:
-        as_paths = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={2: 'AS_PATH'},
-        )
+    def _parse_as_path(self, path_attributes: dict[int, OrderedDict]) -> list[AsPathRecord]:
+        as_paths = path_attributes.get(2)
 
         if as_paths is None:
             return None
@@ -76,79 +74,59 @@ class MrtBgp4MpParser(RouteUpdateParser):
                     return AsPathType.AS_CONFED_SEQUENCE
 
         return [
-            AsPath(
-                type=_as_path_type(dict(as_path)),
+            AsPathRecord(
+                type=_as_path_type(as_path),
                 value=[
                     int(value) 
-                        for value in dict(as_path)['value']
+                        for value in as_path['value']
                 ],
             )
                 for as_path in as_paths['value']
         ]
 
-    def _parse_next_hop(self, path_attributes: list[OrderedDict]) -> list[str]:
-        next_hop = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={3: 'NEXT_HOP'},
-        )
-        mp_reach_nlri = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={14: 'MP_REACH_NLRI'},
-        )
+    def _parse_next_hop(self, path_attributes: dict[int, OrderedDict]) -> list[str]:
+        next_hop = path_attributes.get(3)
+        mp_reach_nlri = path_attributes.get(14)
 
         if next_hop:
             return [next_hop['value']]
 
         if mp_reach_nlri:
-            mp_reach_nlri = dict(mp_reach_nlri['value'])
-
-            return mp_reach_nlri['next_hop']
+            return mp_reach_nlri['value']['next_hop']
             
         return None
     
-    def _parse_multi_exit_disc(self, path_attributes: list[OrderedDict]) -> int:
-        multi_exit_disc = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={4: 'MULTI_EXIT_DISC'},
-        )
+    def _parse_multi_exit_disc(self, path_attributes: dict[int, OrderedDict]) -> int:
+        multi_exit_disc = path_attributes.get(4)
 
         if multi_exit_disc is None:
             return 0
 
         return multi_exit_disc['value']
 
-    def _parse_atomic_aggregate(self, path_attributes: list[OrderedDict]) -> bool:
-        atomic_aggregate = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={6: 'ATOMIC_AGGREGATE'},
-        )
+    def _parse_atomic_aggregate(self, path_attributes: dict[int, OrderedDict]) -> bool:
+        atomic_aggregate = path_attributes.get(6)
 
         if atomic_aggregate is None:
             return False
 
         return atomic_aggregate['value'] == ''
 
-    def _parse_aggregator(self, path_attributes: list[OrderedDict]) -> Aggregator:
-        aggregator = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={7: 'AGGREGATOR'},
-        )
+    def _parse_aggregator(self, path_attributes: dict[int, OrderedDict]) -> Aggregator:
+        aggregator = path_attributes.get(7)
 
         if aggregator is None:
             return None
 
-        aggregator = dict(aggregator['value'])
+        aggregator = aggregator['value']
 
         return Aggregator(
             router_id=aggregator['id'],
             router_as=int(aggregator['as']),
         )
     
-    def _parse_community(self, path_attributes: list[OrderedDict]) -> list[list[int]]:
-        community = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={8: 'COMMUNITY'},
-        )
+    def _parse_community(self, path_attributes: dict[int, OrderedDict]) -> list[list[int]]:
+        community = path_attributes.get(8)
 
         if community is None:
             return None
@@ -161,11 +139,8 @@ class MrtBgp4MpParser(RouteUpdateParser):
                 for c in community['value']
         ]
 
-    def _parse_large_community(self, path_attributes: list[OrderedDict]) -> list[list[int]]:
-        large_community = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={32: 'LARGE_COMMUNITY'},
-        )
+    def _parse_large_community(self, path_attributes: dict[int, OrderedDict]) -> list[list[int]]:
+        large_community = path_attributes.get(32)
 
         if large_community is None:
             return None
@@ -190,11 +165,8 @@ class MrtBgp4MpParser(RouteUpdateParser):
         return ip
 
 
-    def _parse_extended_community(self, path_attributes: list[OrderedDict]) -> list[str]:
-        extended_community = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={16: 'EXTENDED COMMUNITIES'},
-        )
+    def _parse_extended_community(self, path_attributes: dict[int, OrderedDict]) -> list[str]:
+        extended_community = path_attributes.get(16)
 
         if extended_community is None:
             return None
@@ -243,8 +215,8 @@ class MrtBgp4MpParser(RouteUpdateParser):
 
         return ext_communities
 
-    def _parse_path_attributes(self, path_attributes: list[dict]) -> PathAttributes:
-        return PathAttributes(
+    def _build_path_attributes(self, path_attributes: dict[int, OrderedDict]) -> PathAttributesRecord:
+        return PathAttributesRecord(
             # origin=self._parse_origin(
             #     path_attributes=path_attributes,
             # ),
@@ -274,43 +246,55 @@ class MrtBgp4MpParser(RouteUpdateParser):
             # ),
         )
 
-    def _parse_mp_reach_nlri(self, path_attributes: list[OrderedDict]) -> list[NLRI]:
-        mp_reach_nlri = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={14: 'MP_REACH_NLRI'},
-        )
+    def _parse_mp_reach_nlri(self, path_attributes: dict[int, OrderedDict]) -> list[NLRIRecord]:
+        mp_reach_nlri = path_attributes.get(14)
 
         if mp_reach_nlri is None:
             return []
         
-        mp_reach_nlri = dict(mp_reach_nlri['value'])
-
         return [
             self._parse_nlri(
                 nlri=nlri,
             )
-                for nlri in mp_reach_nlri['nlri']
+                for nlri in mp_reach_nlri['value'].get('nlri', [])
         ]
 
-    def _parse_mp_unreach_nlri(self, path_attributes: list[OrderedDict]) -> list[NLRI]:
-        mp_unreach_nlri = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={15: 'MP_UNREACH_NLRI'},
-        )
+    def _parse_mp_unreach_nlri(self, path_attributes: dict[int, OrderedDict]) -> list[NLRIRecord]:
+        mp_unreach_nlri = path_attributes.get(15)
 
         if mp_unreach_nlri is None:
             return []
         
-        mp_unreach_nlri = dict(mp_unreach_nlri['value'])
-
         return [
             self._parse_nlri(
                 nlri=withdrawn_route,
             )
-                for withdrawn_route in mp_unreach_nlri['withdrawn_routes']
+                for withdrawn_route in mp_unreach_nlri['value'].get('withdrawn_routes', [])
         ]
 
-    def parse(self, bgp4mp_message: Bgp4Mp) -> list[RouteUpdate]:
+    def _path_attributes_key(self, path_attributes: dict[int, OrderedDict]) -> tuple:
+        # Canonical form of every attribute used by _build_path_attributes
+        as_paths = path_attributes.get(2)
+
+        if as_paths is None:
+            return None
+
+        return tuple(
+            (tuple(as_path['type']), tuple(as_path['value']))
+                for as_path in as_paths['value']
+        )
+
+    def _parse_path_attributes(self, path_attributes: dict[int, OrderedDict]) -> PathAttributesRecord:
+        return self._attribute_cache.get(
+            key=self._path_attributes_key(
+                path_attributes=path_attributes,
+            ),
+            factory=lambda: self._build_path_attributes(
+                path_attributes=path_attributes,
+            ),
+        )
+
+    def parse(self, bgp4mp_message: Bgp4Mp) -> list[RouteUpdateRecord]:
         '''
         Parse a BGP4MP message.
 
@@ -321,17 +305,26 @@ class MrtBgp4MpParser(RouteUpdateParser):
             bgp4mp_message (Bgp4Mp): The BGP4MP message.
 
         Returns:
-            list[RouteUpdate]: The parsed RouteUpdate objects.
+            list[RouteUpdateRecord]: The parsed RouteUpdateRecord objects.
         '''
-        route_updates: list[RouteUpdate] = []
+        route_updates: list[RouteUpdateRecord] = []
 
         bgp4mp_message = dict(bgp4mp_message.data)
+
+        # State change messages carry no BGP message
+        if 'bgp_message' not in bgp4mp_message:
+            return None
+
         nested_bgp4mp_message = dict(bgp4mp_message['bgp_message'])
         
         if nested_bgp4mp_message['type'].get(2) != 'UPDATE':
             return None
-        
-        generic_update = RouteUpdate(
+
+        path_attributes = self._index_path_attributes(
+            path_attributes=nested_bgp4mp_message.get('path_attributes', []),
+        )
+
+        generic_update = RouteUpdateRecord(
             timestamp=datetime.fromtimestamp(
                 timestamp=list(bgp4mp_message['timestamp'].keys())[0],
             ),
@@ -340,37 +333,39 @@ class MrtBgp4MpParser(RouteUpdateParser):
             peer_as=int(bgp4mp_message['peer_as']),
             local_as=int(bgp4mp_message['local_as']),
             path_attributes=self._parse_path_attributes(
-                path_attributes=nested_bgp4mp_message.get('path_attributes', []),
+                path_attributes=path_attributes,
             ),
         )
 
-        # Iterate over the withdraw routes and create RouteUpdate objects
-        for withdraw_route in nested_bgp4mp_message.get('withdrawn_routes', []) + self._parse_mp_unreach_nlri(
-            path_attributes=nested_bgp4mp_message.get('path_attributes', []),
+        # Iterate over the withdraw routes and create RouteUpdateRecord objects
+        for withdraw_route in [
+            self._parse_nlri(
+                nlri=nlri,
+            )
+                for nlri in nested_bgp4mp_message.get('withdrawn_routes', [])
+        ] + self._parse_mp_unreach_nlri(
+            path_attributes=path_attributes,
         ):
             route_updates.append(
-                generic_update.model_copy(
-                    update={
-                        'change_type': ChangeType.WITHDRAW,
-                        'nlri': self._parse_nlri(
-                            nlri=withdraw_route,
-                        ),
-                    },
+                generic_update._replace(
+                    change_type=ChangeType.WITHDRAW,
+                    nlri=withdraw_route,
                 )
             )
 
-        # Iterate over the announce routes and create RouteUpdate objects
-        for announce_route in nested_bgp4mp_message.get('nlri', []) + self._parse_mp_reach_nlri(
-            path_attributes=nested_bgp4mp_message.get('path_attributes', []),
+        # Iterate over the announce routes and create RouteUpdateRecord objects
+        for announce_route in [
+            self._parse_nlri(
+                nlri=nlri,
+            )
+                for nlri in nested_bgp4mp_message.get('nlri', [])
+        ] + self._parse_mp_reach_nlri(
+            path_attributes=path_attributes,
         ):
             route_updates.append(
-                generic_update.model_copy(
-                    update={
-                        'change_type': ChangeType.ANNOUNCE,
-                        'nlri': self._parse_nlri(
-                            nlri=announce_route,
-                        ),
-                    },
+                generic_update._replace(
+                    change_type=ChangeType.ANNOUNCE,
+                    nlri=announce_route,
                 )
             )
 
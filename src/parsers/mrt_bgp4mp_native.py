@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.models.route_update import PathAttributesRecord, RouteUpdateRecord, ChangeType, AsPathType, AsPathRecord, NLRIRecord
+from src.parsers.route_update import RouteUpdateParser
+from src.parsers.mrt_record import MrtRecord
+from datetime import datetime
+import socket
+
+MRT_TYPE_BGP4MP = 16
+MRT_TYPE_BGP4MP_ET = 17
+
+BGP_MESSAGE_UPDATE = 2
+
+AFI_IPV4 = 1
+AFI_IPV6 = 2
+
+SAFI_L3VPN = (128, 129)
+SAFI_SUPPORTED = (1, 2) + SAFI_L3VPN
+
+# BGP4MP subtypes carrying a BGP message, mapped to (AS number length, add-path)
+BGP4MP_MESSAGE_SUBTYPES = {
+    1: (2, False),  # BGP4MP_MESSAGE
+    4: (4, False),  # BGP4MP_MESSAGE_AS4
+    6: (2, False),  # BGP4MP_MESSAGE_LOCAL
+    7: (4, False),  # BGP4MP_MESSAGE_AS4_LOCAL
+    8: (2, True),   # BGP4MP_MESSAGE_ADDPATH
+    9: (4, True),   # BGP4MP_MESSAGE_AS4_ADDPATH
+    10: (2, True),  # BGP4MP_MESSAGE_LOCAL_ADDPATH
+    11: (4, True),  # BGP4MP_MESSAGE_AS4_LOCAL_ADDPATH
+}
+
+# Wire codes of the AS path segment types (RFC4271, RFC5065)
+AS_PATH_SEGMENT_TYPES = {
+    1: AsPathType.AS_SET,
+    2: AsPathType.AS_SEQUENCE,
+    3: AsPathType.AS_CONFED_SEQUENCE,
+    4: AsPathType.AS_CONFED_SET,
+}
+
+class MrtBgp4MpNativeParser(RouteUpdateParser):
+    '''
+    This class is responsible for parsing MRT BGP4MP messages directly from the raw record bytes.
+    It produces the same RouteUpdateRecord objects as the MrtBgp4MpParser without decoding through mrtparse.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    SUPPORTED_TYPES = (MRT_TYPE_BGP4MP, MRT_TYPE_BGP4MP_ET)
+
+    def _parse_address(self, data: memoryview, offset: int, afi: int, length: int = -1) -> str:
+        if afi == AFI_IPV4:
+            family, max_length = socket.AF_INET, 32
+        elif afi == AFI_IPV6:
+            family, max_length = socket.AF_INET6, 128
+        else:
+            raise ValueError(f'Unsupported AFI {afi}')
+
+        if length < 0:
+            length = max_length
+        elif length > max_length:
+            raise ValueError(f'Invalid prefix length {length}')
+
+        size = (length + 7) // 8
+        address = bytes(data[offset:offset + size])
+
+        if len(address) < size:
+            raise ValueError('Insufficient buffer for address')
+
+        # A prefix like "192.168.0.0/9" is invalid
+        if length % 8 and address[-1] & (0xff >> (length % 8)):
+            raise ValueError('Invalid prefix with host bits set')
+
+        return socket.inet_ntop(family, address + b'\x00' * (max_length // 8 - size))
+
+    def _parse_nlri_list(self, data: memoryview, afi: int, safi: int, add_path: bool) -> list[NLRIRecord]:
+        nlri_list: list[NLRIRecord] = []
+        offset = 0
+
+        while offset < len(data):
+            if add_path:
+                offset += 4
+
+            length = raw_length = data[offset]
+            offset += 1
+
+            if safi in SAFI_L3VPN:
+                labels = 0
+
+                while True:
+                    label = int.from_bytes(data[offset:offset + 3], 'big')
+                    offset += 3
+                    labels += 1
+
+                    if label & 0x000001 or label == 0x800000:
+                        break
+
+                # Skip the route distinguisher
+                offset += 8
+                length -= (3 * labels + 8) * 8
+
+            nlri_list.append(
+                NLRIRecord(
+                    prefix=self._parse_address(
+                        data=data,
+                        offset=offset,
+                        afi=afi,
+                        length=length,
+                    ),
+                    length=raw_length,
+                )
+            )
+            offset += (length + 7) // 8
+
+        return nlri_list
+
+    def _parse_nlri(self, data: memoryview, afi: int, safi: int, add_path: bool) -> list[NLRIRecord]:
+        if add_path:
+            return self._parse_nlri_list(data, afi, safi, True)
+
+        # Same heuristic as mrtparse: fall back to add-path encoding when the plain
+        # decoding fails or yields duplicate routes
+        try:
+            nlri_list = self._parse_nlri_list(data, afi, safi, False)
+
+            if len(nlri_list) == len({(nlri.prefix, nlri.length) for nlri in nlri_list}):
+                return nlri_list
+        except (ValueError, IndexError):
+            pass
+
+        return self._parse_nlri_list(data, afi, safi, True)
+
+    def _index_path_attributes(self, data: memoryview) -> dict[int, memoryview]:
+        path_attributes: dict[int, memoryview] = {}
+        offset = 0
+
+        while offset < len(data):
+            flag, type = data[offset], data[offset + 1]
+
+            # Extended length bit
+            if flag & 0x10:
+                length = int.from_bytes(data[offset + 2:offset + 4], 'big')
+                offset += 4
+            else:
+                length = data[offset + 2]
+                offset += 3
+
+            # Only the first occurrence of an attribute is used, same as the MrtBgp4MpParser
+            path_attributes.setdefault(type, data[offset:offset + length])
+            offset += length
+
+        return path_attributes
+
+    def _parse_as_path(self, path_attributes: dict[int, memoryview], as_length: int) -> list[AsPathRecord]:
+        as_path = path_attributes.get(2)
+
+        if as_path is None:
+            return None
+
+        as_paths: list[AsPathRecord] = []
+        offset = 0
+
+        while offset < len(as_path):
+            segment_type, segment_length = as_path[offset], as_path[offset + 1]
+            offset += 2
+
+            as_paths.append(
+                AsPathRecord(
+                    type=AS_PATH_SEGMENT_TYPES[segment_type],
+                    value=[
+                        int.from_bytes(as_path[position:position + as_length], 'big')
+                            for position in range(offset, offset + segment_length * as_length, as_length)
+                    ],
+                )
+            )
+            offset += segment_length * as_length
+
+        return as_paths
+
+    def _build_path_attributes(self, path_attributes: dict[int, memoryview], as_length: int) -> PathAttributesRecord:
+        return PathAttributesRecord(
+            as_path=self._parse_as_path(
+                path_attributes=path_attributes,
+                as_length=as_length,
+            ),
+        )
+
+    def _parse_path_attributes(self, path_attributes: dict[int, memoryview], as_length: int) -> PathAttributesRecord:
+        as_path = path_attributes.get(2)
+
+        # The key must cover the raw bytes of every attribute used by _build_path_attributes
+        return self._attribute_cache.get(
+            key=(as_length, None if as_path is None else bytes(as_path)),
+            factory=lambda: self._build_path_attributes(
+                path_attributes=path_attributes,
+                as_length=as_length,
+            ),
+        )
+
+    def _parse_mp_reach_nlri(self, path_attributes: dict[int, memoryview], add_path: bool) -> list[NLRIRecord]:
+        mp_reach_nlri = path_attributes.get(14)
+
+        if mp_reach_nlri is None:
+            return []
+
+        afi = int.from_bytes(mp_reach_nlri[0:2], 'big')
+        safi = mp_reach_nlri[2]
+
+        if afi not in (AFI_IPV4, AFI_IPV6) or safi not in SAFI_SUPPORTED:
+            return []
+
+        # Skip AFI, SAFI, next hop length, next hop and the reserved octet
+        return self._parse_nlri(
+            data=mp_reach_nlri[5 + mp_reach_nlri[3]:],
+            afi=afi,
+            safi=safi,
+            add_path=add_path,
+        )
+
+    def _parse_mp_unreach_nlri(self, path_attributes: dict[int, memoryview], add_path: bool) -> list[NLRIRecord]:
+        mp_unreach_nlri = path_attributes.get(15)
+
+        if mp_unreach_nlri is None:
+            return []
+
+        afi = int.from_bytes(mp_unreach_nlri[0:2], 'big')
+        safi = mp_unreach_nlri[2]
+
+        if afi not in (AFI_IPV4, AFI_IPV6) or safi not in SAFI_SUPPORTED:
+            return []
+
+        return self._parse_nlri(
+            data=mp_unreach_nlri[3:],
+            afi=afi,
+            safi=safi,
+            add_path=add_path,
+        )
+
+    def parse(self, bgp4mp_message: MrtRecord) -> list[RouteUpdateRecord]:
+        '''
+        Parse a raw BGP4MP record.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            bgp4mp_message (MrtRecord): The raw BGP4MP record.
+
+        Returns:
+            list[RouteUpdateRecord]: The parsed RouteUpdateRecord objects.
+        '''
+        route_updates: list[RouteUpdateRecord] = []
+
+        if bgp4mp_message.type not in self.SUPPORTED_TYPES or bgp4mp_message.subtype not in BGP4MP_MESSAGE_SUBTYPES:
+            return None
+
+        as_length, add_path = BGP4MP_MESSAGE_SUBTYPES[bgp4mp_message.subtype]
+        data = bgp4mp_message.data
+
+        # Skip the microsecond timestamp of the extended header
+        if bgp4mp_message.type == MRT_TYPE_BGP4MP_ET:
+            data = data[4:]
+
+        try:
+            peer_as = int.from_bytes(data[0:as_length], 'big')
+            local_as = int.from_bytes(data[as_length:2 * as_length], 'big')
+            offset = 2 * as_length + 2
+            afi = int.from_bytes(data[offset:offset + 2], 'big')
+            offset += 2
+            address_length = 4 if afi == AFI_IPV4 else 16
+
+            peer_ip = self._parse_address(data, offset, afi)
+            local_ip = self._parse_address(data, offset + address_length, afi)
+            offset += 2 * address_length
+
+            # BGP message header: 16 octets marker, 2 octets length and 1 octet type
+            bgp_message = data[offset:offset + int.from_bytes(data[offset + 16:offset + 18], 'big')]
+
+            if bgp_message[18] != BGP_MESSAGE_UPDATE:
+                return None
+
+            withdrawn_routes_length = int.from_bytes(bgp_message[19:21], 'big')
+            offset = 21 + withdrawn_routes_length
+            path_attributes_length = int.from_bytes(bgp_message[offset:offset + 2], 'big')
+            path_attributes = self._index_path_attributes(bgp_message[offset + 2:offset + 2 + path_attributes_length])
+
+            withdraw_routes = self._parse_nlri(bgp_message[21:21 + withdrawn_routes_length], AFI_IPV4, 1, add_path) + self._parse_mp_unreach_nlri(
+                path_attributes=path_attributes,
+                add_path=add_path,
+            )
+            announce_routes = self._parse_nlri(bgp_message[offset + 2 + path_attributes_length:], AFI_IPV4, 1, add_path) + self._parse_mp_reach_nlri(
+                path_attributes=path_attributes,
+                add_path=add_path,
+            )
+
+            generic_update = RouteUpdateRecord(
+                timestamp=datetime.fromtimestamp(
+                    timestamp=bgp4mp_message.timestamp,
+                ),
+                peer_ip=peer_ip,
+                local_ip=local_ip,
+                peer_as=peer_as,
+                local_as=local_as,
+                path_attributes=self._parse_path_attributes(
+                    path_attributes=path_attributes,
+                    as_length=as_length,
+                ),
+            )
+        except (ValueError, IndexError, KeyError):
+            # Malformed records are skipped, mrtparse reports them as MRT data errors without data
+            return None
+
+        # Iterate over the withdraw routes and create RouteUpdateRecord objects
+        for withdraw_route in withdraw_routes:
+            route_updates.append(
+                generic_update._replace(
+                    change_type=ChangeType.WITHDRAW,
+                    nlri=withdraw_route,
+                )
+            )
+
+        # Iterate over the announce routes and create RouteUpdateRecord objects
+        for announce_route in announce_routes:
+            route_updates.append(
+                generic_update._replace(
+                    change_type=ChangeType.ANNOUNCE,
+                    nlri=announce_route,
+                )
+            )
+
+        self._send_messages(route_updates)
+        return route_updates
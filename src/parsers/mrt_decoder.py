@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_record import MrtRecordReader, MrtCheckpoint, MrtRecord, MrtChunk, MRT_HEADER, read_bgp4mp_header
+from src.parsers.mrt_filter import MrtRecordFilter, MRT_TYPE_TABLE_DUMP_V2, TD_V2_PEER_INDEX_TABLE
+from src.parsers.mrt_bgp4mp_native import MrtBgp4MpNativeParser
+from typing import Callable, Iterator, NamedTuple, Optional
+from concurrent.futures import ProcessPoolExecutor, Future
+from src.parsers.mrt_bgp4mp import MrtBgp4MpParser
+from src.parsers.mrt_index import find_mrt_chunk, split_indexed_mrt_chunk
+from src.models.route_update import RouteUpdateRecord
+from src.parsers.rib import RibParser
+from mrtparse import Reader
+import collections, itertools, tempfile, heapq
+
+MRT_TYPE_BGP4MP = 16
+
+BGP_MESSAGE_UPDATE = 2
+
+# Maximum uncompressed size of the chunks decoded by the workers
+MRT_CHUNK_SIZE = 32 << 20
+
+class MrtDecodedRecord(NamedTuple):
+    '''
+    This class represents a decoded MRT record with its route updates.
+    Records of unsupported MRT types have no route updates.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    timestamp: int
+    type: int
+    route_updates: Optional[list[RouteUpdateRecord]]
+
+class _RecordFeed:
+    # File object passing single raw records to a mrtparse Reader
+    def __init__(self):
+        self._data = memoryview(b'')
+
+    def feed(self, record: MrtRecord):
+        self._data = memoryview(MRT_HEADER.pack(record.timestamp, record.type, record.subtype, len(record.data)) + record.data)
+
+    def read(self, size: int) -> bytes:
+        data, self._data = self._data[:size], self._data[size:]
+        return bytes(data)
+
+    def close(self):
+        pass
+
+def _mrtparse_decoder() -> Callable[[MrtRecord], Reader]:
+    # The records are read and filtered as raw records, only the remaining records are decoded by mrtparse
+    record_feed = _RecordFeed()
+    reader = Reader(record_feed)
+
+    def decode(record: MrtRecord) -> Reader:
+        record_feed.feed(record)
+        return next(reader)
+
+    return decode
+
+def _is_bgp4mp_update(record: MrtRecord) -> bool:
+    bgp4mp_header = read_bgp4mp_header(record.type, record.subtype, record.data)
+
+    # Unreadable headers are left to the decoder
+    return bgp4mp_header is None or bgp4mp_header.message_type == BGP_MESSAGE_UPDATE
+
+def decode_mrt_file(mrt_file: str, native_decoder: bool = False, offset: int = 0, length: int = None, checkpoints: tuple[MrtCheckpoint, ...] = (), decompression_threads: int = None, record_filter: MrtRecordFilter = None) -> Iterator[MrtDecodedRecord]:
+    '''
+    Decodes the BGP4MP records of an MRT file without sending the route updates to any registered function.
+    Records are filtered on their fixed headers, so only BGP4MP UPDATE messages matching the filter are decoded.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+        native_decoder (bool): Decode BGP4MP records with the built-in decoder instead of mrtparse.
+        offset (int): Offset of the first record in the uncompressed file.
+        length (int): Number of uncompressed bytes to decode, None decodes until the end of the file.
+        checkpoints (tuple[MrtCheckpoint, ...]): Decompression checkpoints for seeking in a compressed file.
+        decompression_threads (int): Number of threads for decompressing multi-stream files in parallel.
+        record_filter (MrtRecordFilter): Filter for the records and route updates, None decodes all records.
+
+    Returns:
+        Iterator[MrtDecodedRecord]: The decoded records in file order.
+    '''
+    if native_decoder:
+        parser = MrtBgp4MpNativeParser()
+        supported_types = MrtBgp4MpNativeParser.SUPPORTED_TYPES
+    else:
+        parser = MrtBgp4MpParser()
+        supported_types = (MRT_TYPE_BGP4MP,)
+        decode = _mrtparse_decoder()
+
+    for record in MrtRecordReader(mrt_file, offset, length, checkpoints, decompression_threads):
+        if record_filter and not record_filter.filter_record(record):
+            continue
+
+        if record.type not in supported_types:
+            yield MrtDecodedRecord(record.timestamp, record.type, None)
+            continue
+
+        # State changes, KEEPALIVE, OPEN and NOTIFICATION messages contain no route updates
+        if not _is_bgp4mp_update(record):
+            yield MrtDecodedRecord(record.timestamp, record.type, [])
+            continue
+
+        if native_decoder:
+            route_updates = parser.parse(
+                bgp4mp_message=record,
+            )
+        else:
+            route_updates = parser.parse(
+                bgp4mp_message=decode(record),
+            )
+
+        if route_updates and record_filter:
+            route_updates = record_filter.filter_route_updates(route_updates)
+
+        yield MrtDecodedRecord(
+            timestamp=record.timestamp,
+            type=record.type,
+            route_updates=route_updates or [],
+        )
+
+def decode_rib_file(rib_file: str, offset: int = 0, length: int = None, checkpoints: tuple[MrtCheckpoint, ...] = (), decompression_threads: int = None, record_filter: MrtRecordFilter = None) -> Iterator[MrtDecodedRecord]:
+    '''
+    Decodes the TABLE_DUMP_V2 records of a RIB file without sending the route updates to any registered function.
+    Records are filtered on their fixed headers and RIB entries of other peers are dropped before decoding.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        rib_file (str): Path to the RIB file.
+        offset (int): Offset of the first record in the uncompressed file.
+        length (int): Number of uncompressed bytes to decode, None decodes until the end of the file.
+        checkpoints (tuple[MrtCheckpoint, ...]): Decompression checkpoints for seeking in a compressed file.
+        decompression_threads (int): Number of threads for decompressing multi-stream files in parallel.
+        record_filter (MrtRecordFilter): Filter for the records and route updates, None decodes all records.
+
+    Returns:
+        Iterator[MrtDecodedRecord]: The decoded records in file order.
+    '''
+    parser = RibParser()
+    decode = _mrtparse_decoder()
+
+    # The peer index table at the beginning of the file is needed to filter the RIB entries of chunks
+    if record_filter and record_filter.filters_peers and offset:
+        for record in MrtRecordReader(rib_file, 0, None, checkpoints):
+            record_filter.filter_record(record)
+            break
+
+    for record in MrtRecordReader(rib_file, offset, length, checkpoints, decompression_threads):
+        if record_filter:
+            record = record_filter.filter_record(record)
+
+            if record is None:
+                continue
+
+        if record.type != MRT_TYPE_TABLE_DUMP_V2:
+            yield MrtDecodedRecord(record.timestamp, record.type, None)
+            continue
+
+        # The peer index table contains no routes
+        if record.subtype == TD_V2_PEER_INDEX_TABLE:
+            yield MrtDecodedRecord(record.timestamp, record.type, [])
+            continue
+
+        route_updates = parser.parse(
+            statement=decode(record).data,
+        )
+
+        if route_updates and record_filter:
+            route_updates = record_filter.filter_route_updates(route_updates)
+
+        yield MrtDecodedRecord(
+            timestamp=record.timestamp,
+            type=record.type,
+            route_updates=route_updates or [],
+        )
+
+def _iter_chunk(decode_function: Callable, chunk: MrtChunk, kwargs: dict) -> Iterator[MrtDecodedRecord]:
+    return decode_function(
+        chunk.mrt_file,
+        offset=chunk.offset,
+        length=chunk.length,
+        checkpoints=chunk.checkpoints,
+        **kwargs,
+    )
+
+def _decode_chunk(decode_function: Callable, chunk: MrtChunk, kwargs: dict) -> list[MrtDecodedRecord]:
+    # Worker process entry point, the decoded records are pickled back as a whole
+    return list(_iter_chunk(decode_function, chunk, kwargs))
+
+def _merge_files(files: Iterator[Iterator[MrtDecodedRecord]]) -> Iterator[MrtDecodedRecord]:
+    # k-way merge of the decoded files in timestamp order, records with equal timestamps keep the order of the files
+    # A file is only started when the merged records reach its first timestamp, so only overlapping files are read at once
+    files = enumerate(files)
+    heap: list[list] = []
+
+    def start_file() -> Optional[list]:
+        for index, records in files:
+            record = next(records, None)
+
+            if record is not None:
+                return [record.timestamp, index, record, records]
+
+        return None
+
+    upcoming = start_file()
+
+    while heap or upcoming:
+        if upcoming and (not heap or upcoming[0] <= heap[0][0]):
+            heapq.heappush(heap, upcoming)
+            upcoming = start_file()
+            continue
+
+        entry = heap[0]
+        yield entry[2]
+
+        record = next(entry[3], None)
+
+        if record is None:
+            heapq.heappop(heap)
+        else:
+            entry[0], entry[2] = record.timestamp, record
+            heapq.heapreplace(heap, entry)
+
+class _ChunkPrefetch:
+    # Submits the chunks of the files to the workers ahead of the merge, the files share a limit of chunks in flight
+    # The decoded records of a chunk are held in memory until they are merged, so the limit bounds the memory
+    def __init__(self, executor: ProcessPoolExecutor, limit: int):
+        self.executor = executor
+        self.limit = limit
+        self.in_flight = 0
+
+    def iter_chunks(self, decode_function: Callable, chunks: list[MrtChunk], kwargs: dict) -> Iterator[MrtDecodedRecord]:
+        chunks = iter(chunks)
+        futures: collections.deque[Future] = collections.deque()
+
+        try:
+            while True:
+                # The next chunk of the file is always submitted, otherwise the merge could not proceed
+                while not futures or self.in_flight < self.limit:
+                    chunk = next(chunks, None)
+
+                    if chunk is None:
+                        break
+
+                    futures.append(self.executor.submit(_decode_chunk, decode_function, chunk, kwargs))
+                    self.in_flight += 1
+
+                if not futures:
+                    return
+
+                records = futures.popleft().result()
+                self.in_flight -= 1
+
+                yield from records
+        finally:
+            for future in futures:
+                future.cancel()
+                self.in_flight -= 1
+
+def _decode_files(decode_function: Callable, files: tuple[str, ...], workers: int, start_timestamp: int = None, end_timestamp: int = None, **kwargs) -> Iterator[MrtDecodedRecord]:
+    time_window = start_timestamp is not None or end_timestamp is not None
+
+    if not workers:
+        def iter_file(file: str) -> Iterator[MrtDecodedRecord]:
+            if time_window:
+                chunk = find_mrt_chunk(file, start_timestamp, end_timestamp)
+            else:
+                chunk = MrtChunk(file)
+
+            yield from _iter_chunk(decode_function, chunk, kwargs)
+
+        # Merged the same way as the chunks of the workers, so the order does not depend on the number of workers
+        yield from _merge_files(
+            iter_file(file)
+                for file in files
+        )
+        return
+
+    # Files are split into chunks at record boundaries when there are fewer files than workers
+    # Large files are split into chunks of at most MRT_CHUNK_SIZE as well, the decoded chunks are held in memory
+    chunks_per_file = -(-workers // len(files))
+
+    with tempfile.TemporaryDirectory() as spool_directory, ProcessPoolExecutor(
+        max_workers=workers,
+    ) as executor:
+        # The indexes of the files are built or loaded in the workers as well
+        if time_window:
+            base_chunks = list(
+                executor.map(
+                    find_mrt_chunk,
+                    files,
+                    itertools.repeat(start_timestamp),
+                    itertools.repeat(end_timestamp),
+                )
+            )
+        else:
+            base_chunks = [
+                MrtChunk(file)
+                    for file in files
+            ]
+
+        # The files are split on their indexes, compressed files without enough checkpoints are spooled uncompressed
+        file_chunks = executor.map(
+            split_indexed_mrt_chunk,
+            base_chunks,
+            itertools.repeat(chunks_per_file),
+            itertools.repeat(spool_directory),
+            itertools.repeat(MRT_CHUNK_SIZE),
+        )
+
+        # At most two chunks per worker are decoded ahead of the merge, the chunks of a file are reassembled in order
+        chunk_prefetch = _ChunkPrefetch(
+            executor=executor,
+            limit=2 * workers,
+        )
+
+        yield from _merge_files(
+            chunk_prefetch.iter_chunks(decode_function, chunks, kwargs)
+                for chunks in file_chunks
+        )
+
+def decode_mrt_files(mrt_files: tuple[str, ...], native_decoder: bool = False, workers: int = None, start_timestamp: int = None, end_timestamp: int = None, decompression_threads: int = None, record_filter: MrtRecordFilter = None) -> Iterator[MrtDecodedRecord]:
+    '''
+    Decodes multiple MRT files, either sequentially or with a pool of worker processes.
+    With workers the files are split into chunks, which are decoded in their own processes and reassembled in order.
+    In both cases the files are merged in timestamp order, records with equal timestamps keep the order of the given files.
+    The files are expected in time order, a file is only read once the merged records reach its first timestamp.
+    With a time window only the records within it are decoded, the file index is used to seek to them.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_files (tuple[str, ...]): Paths to the MRT files.
+        native_decoder (bool): Decode BGP4MP records with the built-in decoder instead of mrtparse.
+        workers (int): Number of worker processes, None decodes sequentially in this process.
+        start_timestamp (int): First timestamp to decode, None starts at the beginning of the files.
+        end_timestamp (int): Last timestamp to decode, None decodes until the end of the files.
+        decompression_threads (int): Number of threads for decompressing multi-stream files in parallel.
+        record_filter (MrtRecordFilter): Filter for the records and route updates, None decodes all records.
+
+    Returns:
+        Iterator[MrtDecodedRecord]: The decoded records.
+    '''
+    yield from _decode_files(
+        decode_mrt_file,
+        mrt_files,
+        workers,
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+        native_decoder=native_decoder,
+        decompression_threads=decompression_threads,
+        record_filter=record_filter,
+    )
+
+def decode_rib_files(rib_files: tuple[str, ...], workers: int = None, decompression_threads: int = None, record_filter: MrtRecordFilter = None) -> Iterator[MrtDecodedRecord]:
+    '''
+    Decodes RIB files, either sequentially or split into chunks for a pool of worker processes.
+    The chunks are reassembled in file order, the files are merged in timestamp order.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        rib_files (tuple[str, ...]): Paths to the RIB files.
+        workers (int): Number of worker processes, None decodes sequentially in this process.
+        decompression_threads (int): Number of threads for decompressing multi-stream files in parallel.
+        record_filter (MrtRecordFilter): Filter for the records and route updates, None decodes all records.
+
+    Returns:
+        Iterator[MrtDecodedRecord]: The decoded records.
+    '''
+    yield from _decode_files(
+        decode_rib_file,
+        rib_files,
+        workers,
+        decompression_threads=decompression_threads,
+        record_filter=record_filter,
+    )
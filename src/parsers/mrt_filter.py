@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_record import MrtRecord, read_bgp4mp_header, MRT_TYPE_BGP4MP, MRT_TYPE_BGP4MP_ET
+from src.models.route_update import RouteUpdateRecord
+from mrtparse import BGP4MP_ST, TD_V2_ST
+from typing import Optional
+import ipaddress, struct
+
+MRT_TYPE_TABLE_DUMP_V2 = 13
+
+TD_V2_PEER_INDEX_TABLE = 1
+
+# TABLE_DUMP_V2 subtypes with a fixed prefix header, mapped to (address length, add-path)
+TD_V2_RIB_SUBTYPES = {
+    2: (4, False),   # RIB_IPV4_UNICAST
+    3: (4, False),   # RIB_IPV4_MULTICAST
+    4: (16, False),  # RIB_IPV6_UNICAST
+    5: (16, False),  # RIB_IPV6_MULTICAST
+    8: (4, True),    # RIB_IPV4_UNICAST_ADDPATH
+    9: (4, True),    # RIB_IPV4_MULTICAST_ADDPATH
+    10: (16, True),  # RIB_IPV6_UNICAST_ADDPATH
+    11: (16, True),  # RIB_IPV6_MULTICAST_ADDPATH
+}
+
+# Names of the filterable message types, same as in the mrtparse output
+MESSAGE_TYPES = {
+    name: (MRT_TYPE_TABLE_DUMP_V2, subtype)
+        for name, subtype in TD_V2_ST.items()
+            if isinstance(name, str)
+} | {
+    name: (MRT_TYPE_BGP4MP, subtype)
+        for name, subtype in BGP4MP_ST.items()
+            if isinstance(name, str)
+}
+
+class MrtRecordFilter:
+    '''
+    This class is responsible for filtering raw MRT records by their fixed headers before the records are decoded.
+    Records are filtered by the peer and the message type of BGP4MP records and the prefix of TABLE_DUMP_V2 records.
+    RIB entries of other peers are removed from the TABLE_DUMP_V2 records and the NLRI of route updates are filtered by prefix after decoding.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, peers: tuple[str, ...] = (), peer_as: tuple[int, ...] = (), prefixes: tuple[str, ...] = (), message_types: tuple[str, ...] = ()):
+        '''
+        Initializes the MrtRecordFilter.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            peers (tuple[str, ...]): IP addresses of the peers to keep, empty keeps all peers.
+            peer_as (tuple[int, ...]): AS numbers of the peers to keep, empty keeps all peers.
+            prefixes (tuple[str, ...]): Prefixes in CIDR notation, only routes within them are kept, empty keeps all routes.
+            message_types (tuple[str, ...]): MRT subtype names of the BGP4MP and TABLE_DUMP_V2 records to keep, empty keeps all records.
+        '''
+        self.peers = {
+            ipaddress.ip_address(peer).packed
+                for peer in peers
+        }
+        self.peer_as = set(peer_as)
+        self.prefixes = [
+            ipaddress.ip_network(prefix)
+                for prefix in prefixes
+        ]
+        self.message_types = {
+            MESSAGE_TYPES[message_type]
+                for message_type in message_types
+        }
+
+        # Indexes of the matching peers in the peer index table of the current RIB file
+        self.peer_indexes: Optional[set[int]] = None
+
+    @property
+    def filters_peers(self) -> bool:
+        return bool(self.peers or self.peer_as)
+
+    def _match_peer(self, peer_as: int, peer_ip: bytes) -> bool:
+        return (not self.peers or peer_ip in self.peers) and (not self.peer_as or peer_as in self.peer_as)
+
+    def _match_prefix(self, prefix: str, length: int) -> bool:
+        network = ipaddress.ip_network(f'{prefix}/{length}', strict=False)
+
+        return any(
+            network.version == within.version and network.subnet_of(within)
+                for within in self.prefixes
+        )
+
+    def _read_peer_index_table(self, data: memoryview):
+        # Collector BGP ID, view name and peer count precede the peer entries
+        offset = 4
+        view_name_length = int.from_bytes(data[offset:offset + 2], 'big')
+        offset += 2 + view_name_length
+        peer_count = int.from_bytes(data[offset:offset + 2], 'big')
+        offset += 2
+
+        self.peer_indexes = set()
+
+        for peer_index in range(peer_count):
+            peer_type = data[offset]
+            address_length = 16 if peer_type & 0x01 else 4
+            as_length = 4 if peer_type & 0x02 else 2
+            offset += 5
+            peer_ip = bytes(data[offset:offset + address_length])
+            offset += address_length
+            peer_as = int.from_bytes(data[offset:offset + as_length], 'big')
+            offset += as_length
+
+            if self._match_peer(peer_as, peer_ip):
+                self.peer_indexes.add(peer_index)
+
+    def _filter_rib_entries(self, record: MrtRecord, prefix_end: int, add_path: bool) -> Optional[bytes]:
+        data = record.data
+        offset = prefix_end + 2
+        entries: list[memoryview] = []
+
+        for _ in range(int.from_bytes(data[prefix_end:offset], 'big')):
+            entry_start = offset
+            peer_index = int.from_bytes(data[offset:offset + 2], 'big')
+
+            # Peer index, originated time and the optional path identifier
+            offset += 10 if add_path else 6
+            offset += 2 + int.from_bytes(data[offset:offset + 2], 'big')
+
+            if peer_index in self.peer_indexes:
+                entries.append(data[entry_start:offset])
+
+        if not entries:
+            return None
+
+        return b''.join([data[:prefix_end], struct.pack('>H', len(entries))] + entries)
+
+    def filter_record(self, record: MrtRecord) -> Optional[MrtRecord]:
+        '''
+        Checks a raw MRT record against the filter, only its fixed headers are read.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            record (MrtRecord): The raw MRT record.
+
+        Returns:
+            Optional[MrtRecord]: The record, with the RIB entries of other peers removed, None if it is filtered out.
+        '''
+        if record.type in (MRT_TYPE_BGP4MP, MRT_TYPE_BGP4MP_ET):
+            if self.message_types and (MRT_TYPE_BGP4MP, record.subtype) not in self.message_types:
+                return None
+
+            if self.filters_peers:
+                bgp4mp_header = read_bgp4mp_header(record.type, record.subtype, record.data)
+
+                if bgp4mp_header is None or not self._match_peer(bgp4mp_header.peer_as, bgp4mp_header.peer_ip):
+                    return None
+
+            return record
+
+        if record.type == MRT_TYPE_TABLE_DUMP_V2:
+            # The peer index table is needed for decoding the RIB entries and is always kept
+            if record.subtype == TD_V2_PEER_INDEX_TABLE:
+                if self.filters_peers:
+                    self._read_peer_index_table(record.data)
+
+                return record
+
+            if self.message_types and (MRT_TYPE_TABLE_DUMP_V2, record.subtype) not in self.message_types:
+                return None
+
+            if record.subtype not in TD_V2_RIB_SUBTYPES:
+                return record
+
+            address_length, add_path = TD_V2_RIB_SUBTYPES[record.subtype]
+
+            try:
+                # Sequence number followed by the prefix length and the prefix
+                length = record.data[4]
+                prefix_end = 5 + (length + 7) // 8
+
+                if self.prefixes:
+                    prefix = bytes(record.data[5:prefix_end]).ljust(address_length, b'\x00')
+
+                    if not self._match_prefix(str(ipaddress.ip_address(prefix)), length):
+                        return None
+
+                if self.filters_peers and self.peer_indexes is not None:
+                    data = self._filter_rib_entries(record, prefix_end, add_path)
+
+                    if data is None:
+                        return None
+
+                    return record._replace(
+                        data=memoryview(data),
+                    )
+            except (IndexError, ValueError):
+                # Malformed records are left to the decoder
+                pass
+
+            return record
+
+        # Records of other types are only kept without a message type filter
+        return None if self.message_types else record
+
+    def filter_route_updates(self, route_updates: list[RouteUpdateRecord]) -> list[RouteUpdateRecord]:
+        '''
+        Filters decoded route updates by the prefix of their NLRI.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            route_updates (list[RouteUpdateRecord]): The decoded route updates.
+
+        Returns:
+            list[RouteUpdateRecord]: The route updates within the prefixes.
+        '''
+        if not self.prefixes:
+            return route_updates
+
+        return [
+            route_update
+                for route_update in route_updates
+                    if self._match_prefix(route_update.nlri.prefix, route_update.nlri.length)
+        ]
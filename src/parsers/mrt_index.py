@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_record import MrtCheckpoint, MrtChunk, BGP4MP_HEADER_LENGTH, MRT_HEADER_LENGTH, MRT_HEADER, open_mrt_file, read_bgp4mp_header, is_gzip_mrt_file, split_mrt_chunk
+from typing import NamedTuple, Optional
+from bisect import bisect_left, bisect_right
+from array import array
+import ipaddress, struct, sys, os
+
+# The index is cached next to the MRT file with this suffix
+MRT_INDEX_SUFFIX = '.zidx'
+
+MRT_INDEX_MAGIC = b'ZIDX'
+MRT_INDEX_VERSION = 2
+
+# Magic, version, size and modification time of the MRT file, uncompressed size, number of records, peers and checkpoints
+MRT_INDEX_HEADER = struct.Struct('<4sHQqQIII')
+MRT_INDEX_PEER = struct.Struct('<IB')
+MRT_INDEX_CHECKPOINT = struct.Struct('<QQB')
+
+# Peer id of records without a peer, e.g. TABLE_DUMP_V2 records
+NO_PEER = 0xffffffff
+
+class MrtPeer(NamedTuple):
+    '''
+    This class represents a BGP peer referenced by the records of an MRT index.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    peer_as: int
+    peer_ip: str
+
+def _array_bytes(values: array) -> bytes:
+    # The index is stored little endian regardless of the platform
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+def _array_from_bytes(typecode: str, data: memoryview) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    return values
+
+class MrtIndex:
+    '''
+    This class represents the record index of an MRT file.
+    For every record the offset in the uncompressed stream, the timestamp, the type, the subtype and the peer are stored in compact arrays.
+    For compressed files the checkpoints of the decompression are stored as well.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    # Array type codes of the record columns: offset, timestamp, type, subtype and peer id
+    COLUMNS = (('offsets', 'Q'), ('timestamps', 'I'), ('types', 'H'), ('subtypes', 'H'), ('peer_ids', 'I'))
+
+    def __init__(self, mrt_file: str, size: int, peers: list[MrtPeer] = None, checkpoints: list[MrtCheckpoint] = None, **columns: array):
+        '''
+        Initializes the MrtIndex.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            mrt_file (str): Path to the indexed MRT file.
+            size (int): Size of the uncompressed MRT stream.
+            peers (list[MrtPeer]): Peers referenced by the peer ids of the records.
+            checkpoints (list[MrtCheckpoint]): Decompression checkpoints of a compressed MRT file.
+            columns (array): Record columns, see COLUMNS.
+        '''
+        self.mrt_file = mrt_file
+        self.size = size
+        self.peers = peers or []
+        self.checkpoints = checkpoints or []
+
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, columns.get(name, array(typecode)))
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @classmethod
+    def build(cls, mrt_file: str) -> 'MrtIndex':
+        '''
+        Builds the index of an MRT file by reading it once.
+        Only the common MRT header and the BGP4MP peer fields of each record are decoded.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            mrt_file (str): Path to the MRT file.
+
+        Returns:
+            MrtIndex: The index of the MRT file.
+        '''
+        columns = {
+            name: array(typecode)
+                for name, typecode in cls.COLUMNS
+        }
+        peer_ids: dict[tuple[int, bytes], int] = {}
+        offset = 0
+
+        with open_mrt_file(mrt_file) as file:
+            while True:
+                header = file.read(MRT_HEADER_LENGTH)
+
+                if len(header) < MRT_HEADER_LENGTH:
+                    break
+
+                timestamp, type, subtype, length = MRT_HEADER.unpack(header)
+                data = file.read(min(length, BGP4MP_HEADER_LENGTH))
+                file.seek(length - len(data), os.SEEK_CUR)
+
+                bgp4mp_header = read_bgp4mp_header(type, subtype, data)
+                peer = None if bgp4mp_header is None else bgp4mp_header[:2]
+
+                columns['offsets'].append(offset)
+                columns['timestamps'].append(timestamp)
+                columns['types'].append(type)
+                columns['subtypes'].append(subtype)
+                columns['peer_ids'].append(
+                    NO_PEER if peer is None else peer_ids.setdefault(peer, len(peer_ids))
+                )
+
+                offset += MRT_HEADER_LENGTH + length
+
+            checkpoints = file.raw.checkpoints
+
+        return cls(
+            mrt_file=mrt_file,
+            size=offset,
+            peers=[
+                MrtPeer(
+                    peer_as=peer_as,
+                    peer_ip=str(ipaddress.ip_address(peer_ip)),
+                )
+                    for peer_as, peer_ip in peer_ids
+            ],
+            checkpoints=checkpoints,
+            **columns,
+        )
+
+    @classmethod
+    def read(cls, mrt_file: str, index_file: str) -> Optional['MrtIndex']:
+        '''
+        Reads a cached index, if it still matches the MRT file.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            mrt_file (str): Path to the MRT file.
+            index_file (str): Path to the cached index.
+
+        Returns:
+            Optional[MrtIndex]: The cached index, None if it is missing, outdated or invalid.
+        '''
+        try:
+            stat = os.stat(mrt_file)
+
+            with open(index_file, 'rb') as file:
+                data = memoryview(file.read())
+        except OSError:
+            return None
+
+        if len(data) < MRT_INDEX_HEADER.size:
+            return None
+
+        magic, version, file_size, file_mtime, size, records, peers, checkpoints = MRT_INDEX_HEADER.unpack_from(data)
+
+        if magic != MRT_INDEX_MAGIC or version != MRT_INDEX_VERSION or file_size != stat.st_size or file_mtime != stat.st_mtime_ns:
+            return None
+
+        try:
+            offset = MRT_INDEX_HEADER.size
+            mrt_peers: list[MrtPeer] = []
+
+            for _ in range(peers):
+                peer_as, address_length = MRT_INDEX_PEER.unpack_from(data, offset)
+                offset += MRT_INDEX_PEER.size
+
+                mrt_peers.append(
+                    MrtPeer(
+                        peer_as=peer_as,
+                        peer_ip=str(ipaddress.ip_address(bytes(data[offset:offset + address_length]))),
+                    )
+                )
+                offset += address_length
+
+            mrt_checkpoints: list[MrtCheckpoint] = []
+
+            for _ in range(checkpoints):
+                mrt_checkpoints.append(MrtCheckpoint(*MRT_INDEX_CHECKPOINT.unpack_from(data, offset)))
+                offset += MRT_INDEX_CHECKPOINT.size
+
+            columns: dict[str, array] = {}
+
+            for name, typecode in cls.COLUMNS:
+                length = records * array(typecode).itemsize
+                columns[name] = _array_from_bytes(typecode, data[offset:offset + length])
+                offset += length
+        except (struct.error, ValueError):
+            return None
+
+        if any(len(column) != records for column in columns.values()):
+            return None
+
+        return cls(
+            mrt_file=mrt_file,
+            size=size,
+            peers=mrt_peers,
+            checkpoints=mrt_checkpoints,
+            **columns,
+        )
+
+    def write(self, index_file: str):
+        '''
+        Writes the index to a file, the file is replaced atomically.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            index_file (str): Path to write the index to.
+        '''
+        stat = os.stat(self.mrt_file)
+        temporary_file = f'{index_file}.{os.getpid()}.tmp'
+
+        with open(temporary_file, 'wb') as file:
+            file.write(
+                MRT_INDEX_HEADER.pack(
+                    MRT_INDEX_MAGIC,
+                    MRT_INDEX_VERSION,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    self.size,
+                    len(self),
+                    len(self.peers),
+                    len(self.checkpoints),
+                )
+            )
+
+            for peer in self.peers:
+                peer_ip = ipaddress.ip_address(peer.peer_ip).packed
+
+                file.write(MRT_INDEX_PEER.pack(peer.peer_as, len(peer_ip)))
+                file.write(peer_ip)
+
+            for checkpoint in self.checkpoints:
+                file.write(MRT_INDEX_CHECKPOINT.pack(*checkpoint))
+
+            for name, _ in self.COLUMNS:
+                file.write(_array_bytes(getattr(self, name)))
+
+        os.replace(temporary_file, index_file)
+
+    def find_chunk(self, start_timestamp: int = None, end_timestamp: int = None) -> MrtChunk:
+        '''
+        Finds the records within a time window.
+        The records of MRT files are written in time order, so the window is a single chunk.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            start_timestamp (int): First timestamp of the window, None starts at the beginning of the file.
+            end_timestamp (int): Last timestamp of the window, None reaches until the end of the file.
+
+        Returns:
+            MrtChunk: The chunk with the records of the window and the checkpoints for seeking to it.
+        '''
+        start = 0 if start_timestamp is None else bisect_left(self.timestamps, start_timestamp)
+        stop = len(self) if end_timestamp is None else bisect_right(self.timestamps, end_timestamp)
+
+        offset = self.offsets[start] if start < len(self) else self.size
+        end = self.offsets[stop] if stop < len(self) else self.size
+
+        return MrtChunk(
+            mrt_file=self.mrt_file,
+            offset=offset,
+            length=max(end - offset, 0),
+            checkpoints=tuple(self.checkpoints),
+        )
+
+    def split_chunk(self, chunk: MrtChunk, chunks: int, chunk_size: int = None) -> Optional[list[MrtChunk]]:
+        '''
+        Splits a chunk of the indexed file at record boundaries into chunks of about equal size.
+        The chunks of a compressed file start the decompression at the closest checkpoint before them.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            chunk (MrtChunk): The chunk to split, MrtChunk(mrt_file) splits the whole file.
+            chunks (int): Number of chunks to split the chunk into.
+            chunk_size (int): Maximum size of the chunks, more chunks are created for larger files, None for no maximum.
+
+        Returns:
+            Optional[list[MrtChunk]]: The chunks in file order, None if the checkpoints are too far apart to split a compressed file.
+        '''
+        start = chunk.offset
+        end = self.size if chunk.length is None else min(chunk.offset + chunk.length, self.size)
+        size = max(end - start, 0)
+
+        if chunk_size:
+            chunks = max(chunks, -(-size // chunk_size))
+
+        first = bisect_left(self.offsets, start)
+        last = bisect_left(self.offsets, end)
+        offsets = [start]
+
+        for number in range(1, max(chunks, 1)):
+            index = bisect_left(self.offsets, start + size * number / chunks, first, last)
+
+            if index < last and self.offsets[index] > offsets[-1]:
+                offsets.append(self.offsets[index])
+
+        # Every chunk decompresses the data between its checkpoint and its first record again
+        if self.checkpoints:
+            checkpoint_offsets = sorted(checkpoint.offset for checkpoint in self.checkpoints)
+            skipped = sum(
+                offset - checkpoint_offsets[bisect_right(checkpoint_offsets, offset) - 1]
+                    for offset in offsets[1:]
+            )
+
+            if skipped > size:
+                return None
+
+        return [
+            MrtChunk(
+                mrt_file=self.mrt_file,
+                offset=offset,
+                length=stop - offset,
+                checkpoints=tuple(self.checkpoints),
+            )
+                for offset, stop in zip(offsets, offsets[1:] + [end])
+        ]
+
+def get_mrt_index(mrt_file: str) -> MrtIndex:
+    '''
+    Returns the index of an MRT file, either from the sidecar file next to it or by building and caching it.
+    When the sidecar file cannot be written, the index is only kept in memory.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+
+    Returns:
+        MrtIndex: The index of the MRT file.
+    '''
+    index_file = mrt_file + MRT_INDEX_SUFFIX
+    mrt_index = MrtIndex.read(
+        mrt_file=mrt_file,
+        index_file=index_file,
+    )
+
+    if mrt_index is None:
+        mrt_index = MrtIndex.build(
+            mrt_file=mrt_file,
+        )
+
+        try:
+            mrt_index.write(
+                index_file=index_file,
+            )
+        except OSError:
+            pass
+
+    return mrt_index
+
+def find_mrt_chunk(mrt_file: str, start_timestamp: int = None, end_timestamp: int = None) -> MrtChunk:
+    '''
+    Finds the records of an MRT file within a time window using its index.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+        start_timestamp (int): First timestamp of the window, None starts at the beginning of the file.
+        end_timestamp (int): Last timestamp of the window, None reaches until the end of the file.
+
+    Returns:
+        MrtChunk: The chunk with the records of the window.
+    '''
+    return get_mrt_index(mrt_file).find_chunk(
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+    )
+
+
+def split_indexed_mrt_chunk(chunk: MrtChunk, chunks: int, spool_directory: str, chunk_size: int = None) -> list[MrtChunk]:
+    '''
+    Splits an MRT chunk at record boundaries using the index of the file, so the file is not scanned again.
+    Compressed files are read from the checkpoints of the index, they are only spooled when the checkpoints are too far apart.
+    gzip files without a cached index are spooled right away, their index would have to be built with another decompression.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        chunk (MrtChunk): The chunk to split, MrtChunk(mrt_file) splits the whole file.
+        chunks (int): Number of chunks to split the chunk into.
+        spool_directory (str): Directory for the uncompressed copy of compressed files.
+        chunk_size (int): Maximum size of the chunks, more chunks are created for larger files, None for no maximum.
+
+    Returns:
+        list[MrtChunk]: The chunks in file order.
+    '''
+    mrt_index = MrtIndex.read(
+        mrt_file=chunk.mrt_file,
+        index_file=chunk.mrt_file + MRT_INDEX_SUFFIX,
+    )
+
+    if mrt_index is None and not is_gzip_mrt_file(chunk.mrt_file):
+        mrt_index = get_mrt_index(chunk.mrt_file)
+
+    mrt_chunks = None if mrt_index is None else mrt_index.split_chunk(
+        chunk=chunk,
+        chunks=chunks,
+        chunk_size=chunk_size,
+    )
+
+    if mrt_chunks is None:
+        mrt_chunks = split_mrt_chunk(
+            chunk=chunk,
+            chunks=chunks,
+            spool_directory=spool_directory,
+            chunk_size=chunk_size,
+        )
+
+    return mrt_chunks
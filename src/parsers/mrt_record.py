@@ -0,0 +1,861 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Iterator, NamedTuple, BinaryIO, Optional
+import collections, itertools, threading, tempfile, struct, queue, mmap, zlib, bz2, io, os
+
+# Magic numbers of the compressed file formats, same detection as mrtparse
+BZ2_MAGIC = b'\x42\x5a\x68'
+GZIP_MAGIC = b'\x1f\x8b'
+
+MRT_HEADER_LENGTH = 12
+MRT_HEADER = struct.Struct('>IHHI')
+
+MRT_TYPE_BGP4MP = 16
+MRT_TYPE_BGP4MP_ET = 17
+
+# BGP4MP subtypes with 4 octet AS numbers, all other subtypes use 2 octets
+BGP4MP_AS4_SUBTYPES = (4, 5, 7, 9, 11)
+
+# BGP4MP subtypes carrying a BGP message instead of a state change
+BGP4MP_MESSAGE_SUBTYPES = (1, 4, 6, 7, 8, 9, 10, 11)
+
+# Maximum length of the BGP4MP_ET header up to and including the BGP message type
+BGP4MP_HEADER_LENGTH = 4 + 2 * 4 + 2 + 2 + 2 * 16 + 19
+
+# Number of compressed bytes fed into the decompressor at once
+COMPRESSED_READ_SIZE = 1 << 20
+
+# Size and number of the uncompressed blocks read ahead by the decompression thread
+PIPELINE_BLOCK_SIZE = 1 << 20
+PIPELINE_BUFFERS = 8
+
+class MrtRecord(NamedTuple):
+    '''
+    This class represents a raw MRT record with its decoded common header.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    offset: int
+    timestamp: int
+    type: int
+    subtype: int
+    data: memoryview
+
+class Bgp4MpHeader(NamedTuple):
+    '''
+    This class represents the fixed header fields of a BGP4MP record.
+    The message type is None for state changes.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    peer_as: int
+    peer_ip: bytes
+    message_type: Optional[int]
+
+class MrtCheckpoint(NamedTuple):
+    '''
+    This class represents a position in a compressed MRT file at which the decompression can be started.
+    These are the beginnings of the bz2 blocks, which can be decompressed on their own, and of the gzip members of the file.
+    bz2 blocks are not byte aligned, so the checkpoint also holds the first bit of the block within the compressed byte.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    compressed_offset: int
+    offset: int
+    bit: int = 0
+
+class MrtChunk(NamedTuple):
+    '''
+    This class represents a range of complete MRT records within an uncompressed MRT file.
+    A chunk without length reaches until the end of the file.
+    The checkpoints of a compressed file allow to start the decompression close to the chunk.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    mrt_file: str
+    offset: int = 0
+    length: Optional[int] = None
+    checkpoints: tuple[MrtCheckpoint, ...] = ()
+
+def read_bgp4mp_header(type: int, subtype: int, data: bytes) -> Optional[Bgp4MpHeader]:
+    '''
+    Reads the fixed header fields of a BGP4MP record without decoding the BGP message.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        type (int): The MRT type of the record.
+        subtype (int): The MRT subtype of the record.
+        data (bytes): The record body, at least the first BGP4MP_HEADER_LENGTH bytes.
+
+    Returns:
+        Optional[Bgp4MpHeader]: The header fields, None for other records or truncated headers.
+    '''
+    if type not in (MRT_TYPE_BGP4MP, MRT_TYPE_BGP4MP_ET):
+        return None
+
+    # Skip the microsecond timestamp of the extended header
+    offset = 4 if type == MRT_TYPE_BGP4MP_ET else 0
+    as_length = 4 if subtype in BGP4MP_AS4_SUBTYPES else 2
+    peer_as = int.from_bytes(data[offset:offset + as_length], 'big')
+    offset += 2 * as_length + 2
+    afi = int.from_bytes(data[offset:offset + 2], 'big')
+    address_length = 4 if afi == 1 else 16
+    offset += 2
+    peer_ip = bytes(data[offset:offset + address_length])
+
+    if afi not in (1, 2) or len(peer_ip) < address_length:
+        return None
+
+    message_type = None
+
+    if subtype in BGP4MP_MESSAGE_SUBTYPES:
+        # Skip the addresses, the marker and the length of the BGP message
+        offset += 2 * address_length + 18
+
+        if offset >= len(data):
+            return None
+
+        message_type = data[offset]
+
+    return Bgp4MpHeader(
+        peer_as=peer_as,
+        peer_ip=peer_ip,
+        message_type=message_type,
+    )
+
+def _read_magic(mrt_file: str) -> bytes:
+    with open(mrt_file, 'rb') as file:
+        return file.read(max(len(BZ2_MAGIC), len(GZIP_MAGIC)))
+
+def is_compressed_mrt_file(mrt_file: str) -> bool:
+    '''
+    Checks whether an MRT file is bz2 or gzip compressed.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+
+    Returns:
+        bool: Whether the MRT file is compressed.
+    '''
+    magic = _read_magic(mrt_file)
+
+    return magic.startswith(BZ2_MAGIC) or magic.startswith(GZIP_MAGIC)
+
+def is_gzip_mrt_file(mrt_file: str) -> bool:
+    '''
+    Checks whether an MRT file is gzip compressed.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+
+    Returns:
+        bool: Whether the MRT file is gzip compressed.
+    '''
+    return _read_magic(mrt_file).startswith(GZIP_MAGIC)
+
+# Magic numbers of a bz2 block and of the end of a bz2 stream, both can start at any bit of the compressed data
+BZ2_BLOCK_MAGIC = 0x314159265359
+BZ2_END_MAGIC = 0x177245385090
+
+# Five bytes of a magic number are complete for each of the eight bit offsets, they are searched as byte strings
+BZ2_MAGIC_KEYS = [
+    (magic, shift, (magic << (8 - shift)).to_bytes(7, 'big')[1:6])
+        for magic in (BZ2_BLOCK_MAGIC, BZ2_END_MAGIC)
+            for shift in range(8)
+]
+
+# Number of compressed bytes searched for magic numbers at once
+BZ2_SCAN_SIZE = 1 << 22
+
+# Number of following magic numbers a block is joined with when it cannot be decompressed on its own
+BZ2_BLOCK_JOINS = 2
+
+def _decompress_stream(compression: str, data: bytes) -> tuple[bytes, bool]:
+    decompressor = _create_decompressor(compression)
+
+    try:
+        uncompressed = decompressor.decompress(data)
+    except (OSError, zlib.error):
+        return b'', False
+
+    # The data is exactly one complete stream, otherwise the stream boundaries were wrong
+    return uncompressed, decompressor.eof and not decompressor.unused_data
+
+def _read_bits(data: bytes, start: int, end: int) -> int:
+    first, last = start // 8, -(-end // 8)
+
+    return (int.from_bytes(data[first:last], 'big') >> (last * 8 - end)) & ((1 << (end - start)) - 1)
+
+def _bz2_magics(data: bytes, start_bit: int) -> Iterator[tuple[int, int]]:
+    # Bit offsets and magic numbers of the bz2 blocks and stream ends in order, starting at the given bit
+    position = start_bit // 8
+
+    while position < len(data):
+        stop = min(position + BZ2_SCAN_SIZE, len(data))
+        magics: list[tuple[int, int]] = []
+
+        for magic, shift, key in BZ2_MAGIC_KEYS:
+            index = data.find(key, position + 1, stop + len(key))
+
+            while index >= 0:
+                bit = (index - 1) * 8 + shift
+
+                if bit >= start_bit and bit + 48 <= len(data) * 8 and _read_bits(data, bit, bit + 48) == magic:
+                    magics.append((bit, magic))
+
+                index = data.find(key, index + 1, stop + len(key))
+
+        yield from sorted(magics)
+        position = stop
+
+def _bz2_block_ranges(data: bytes, start_bit: int) -> Iterator[tuple[int, int]]:
+    # A block reaches until the next block or the end of its stream, the stream headers in between are skipped
+    block_start = None
+
+    for bit, magic in _bz2_magics(data, start_bit):
+        if block_start is not None:
+            yield block_start, bit
+
+        block_start = bit if magic == BZ2_BLOCK_MAGIC else None
+
+    if block_start is not None:
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+def _decompress_bz2_block(data: bytes, start: int, end: int) -> tuple[bytes, bool]:
+    # The block is shifted to a byte boundary and wrapped into a stream of its own, like bzip2recover does
+    # The combined CRC of a stream with a single block is the CRC of the block, which follows the block magic
+    block_crc = _read_bits(data, start + 48, start + 80)
+    length = end - start + 80
+    padding = -length % 8
+    block = (((_read_bits(data, start, end) << 48) | BZ2_END_MAGIC) << 32) | block_crc
+
+    return _decompress_stream('bz2', b'BZh9' + (block << padding).to_bytes((length + padding) // 8, 'big'))
+
+def _create_decompressor(compression: str):
+    if compression == 'bz2':
+        return bz2.BZ2Decompressor()
+
+    return zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+class MrtDecompressor(io.RawIOBase):
+    '''
+    This class is responsible for reading the uncompressed stream of a plain, bz2 or gzip compressed MRT file.
+    bz2 files are decompressed block by block, the beginnings of the blocks are recorded as checkpoints.
+    For gzip files the beginnings of further members are recorded, a single member can only be read from its start.
+    bz2 files and gzip files with multiple members can be decompressed by a pool of threads, one block or member per thread.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, mrt_file: str, offset: int = 0, length: int = None, checkpoints: tuple[MrtCheckpoint, ...] = (), threads: int = None):
+        '''
+        Initializes the MrtDecompressor.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            mrt_file (str): Path to the MRT file.
+            offset (int): Offset in the uncompressed stream to start reading at.
+            length (int): Number of uncompressed bytes to read, None reads until the end of the file.
+            checkpoints (tuple[MrtCheckpoint, ...]): Known checkpoints of the file, the closest one before the offset is used.
+            threads (int): Number of threads for decompressing bz2 blocks or gzip members in parallel, None decompresses in the calling thread.
+        '''
+        super().__init__()
+
+        magic = _read_magic(mrt_file)
+
+        if magic.startswith(BZ2_MAGIC):
+            self.compression = 'bz2'
+        elif magic.startswith(GZIP_MAGIC):
+            self.compression = 'gzip'
+        else:
+            self.compression = None
+
+        self.mrt_file = mrt_file
+        self.checkpoints: list[MrtCheckpoint] = []
+        self.position = 0
+
+        self._file = open(mrt_file, 'rb')
+        self._stop = None if length is None else offset + length
+        self._buffer = memoryview(b'')
+        self._blocks = None
+        self._produced = 0
+        self._pending_offset = offset
+
+        if self.compression:
+            checkpoint = max(
+                (checkpoint for checkpoint in checkpoints if checkpoint.offset <= offset),
+                key=lambda checkpoint: checkpoint.offset,
+                default=MrtCheckpoint(0, 0),
+            )
+
+            self.position = self._produced = checkpoint.offset
+
+            if self.compression == 'bz2':
+                self._blocks = self._bz2_blocks(checkpoint.compressed_offset * 8 + checkpoint.bit, threads)
+            elif threads and threads > 1:
+                self._blocks = self._parallel_blocks(checkpoint.compressed_offset, checkpoints, threads)
+            else:
+                self._blocks = self._sequential_blocks(checkpoint.compressed_offset)
+
+    def _start_stream(self, compressed_offset: int):
+        self.checkpoints.append(MrtCheckpoint(compressed_offset, self._produced))
+
+    def _sequential_blocks(self, compressed_offset: int) -> Iterator[bytes]:
+        self._file.seek(compressed_offset)
+        self._start_stream(compressed_offset)
+        decompressor = _create_decompressor(self.compression)
+
+        while True:
+            if decompressor.eof:
+                data = decompressor.unused_data
+                compressed_offset = self._file.tell() - len(data)
+
+                if not data:
+                    data = self._file.read(COMPRESSED_READ_SIZE)
+
+                if not data:
+                    return
+
+                self._start_stream(compressed_offset)
+                decompressor = _create_decompressor(self.compression)
+
+                # Trailing garbage after the first stream ends the file, same as BZ2File
+                try:
+                    block = decompressor.decompress(data)
+                except (OSError, zlib.error):
+                    self.checkpoints.pop()
+                    return
+            else:
+                data = self._file.read(COMPRESSED_READ_SIZE)
+
+                if not data:
+                    raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+                block = decompressor.decompress(data)
+
+            self._produced += len(block)
+            yield block
+
+    def _stream_boundaries(self, compressed_offset: int, checkpoints: tuple[MrtCheckpoint, ...]) -> list[int]:
+        boundaries = {
+            checkpoint.compressed_offset
+                for checkpoint in checkpoints
+                    if checkpoint.compressed_offset > compressed_offset
+        }
+
+        # gzip members can only be found from known checkpoints
+        return [compressed_offset] + sorted(boundaries) + [os.fstat(self._file.fileno()).st_size]
+
+    def _parallel_blocks(self, compressed_offset: int, checkpoints: tuple[MrtCheckpoint, ...], threads: int) -> Iterator[bytes]:
+        boundaries = self._stream_boundaries(compressed_offset, checkpoints)
+        streams = iter(zip(boundaries, boundaries[1:]))
+        futures: collections.deque[tuple[int, Future]] = collections.deque()
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            try:
+                while True:
+                    # At most two streams per thread are decompressed ahead of the reader
+                    for start, end in itertools.islice(streams, 2 * threads - len(futures)):
+                        self._file.seek(start)
+                        futures.append((start, executor.submit(_decompress_stream, self.compression, self._file.read(end - start))))
+
+                    if not futures:
+                        return
+
+                    start, future = futures.popleft()
+                    block, complete = future.result()
+
+                    # A stream header pattern within compressed data or trailing data, the rest is decompressed sequentially
+                    if not complete:
+                        break
+
+                    self._start_stream(start)
+                    self._produced += len(block)
+                    yield block
+            finally:
+                for _, future in futures:
+                    future.cancel()
+
+        yield from self._sequential_blocks(start)
+
+    def _bz2_blocks(self, start_bit: int, threads: int = None) -> Iterator[bytes]:
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        joined_end = 0
+        blocks = (
+            (start, end)
+                for start, end in _bz2_block_ranges(data, start_bit)
+                    if start >= joined_end
+        )
+        futures: collections.deque[tuple[int, int, Optional[Future]]] = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=threads) if threads and threads > 1 else None
+
+        try:
+            while True:
+                # Blocks within a joined block were no blocks
+                while futures and futures[0][0] < joined_end:
+                    _, _, future = futures.popleft()
+
+                    if future:
+                        future.cancel()
+
+                # At most two blocks per thread are decompressed ahead of the reader
+                if executor is not None:
+                    for start, end in itertools.islice(blocks, 2 * threads - len(futures)):
+                        futures.append((start, end, executor.submit(_decompress_bz2_block, data, start, end)))
+                elif not futures:
+                    futures.extend((start, end, None) for start, end in itertools.islice(blocks, 1))
+
+                if not futures:
+                    return
+
+                start, end, future = futures.popleft()
+                block, complete = future.result() if future else _decompress_bz2_block(data, start, end)
+
+                # A magic number within the compressed data splits a block, the block is joined up to the next magic number
+                for _ in range(BZ2_BLOCK_JOINS):
+                    if complete:
+                        break
+
+                    end = next((bit for bit, _ in _bz2_magics(data, end + 1)), None)
+
+                    if end is None:
+                        break
+
+                    block, complete = _decompress_bz2_block(data, start, end)
+
+                if not complete:
+                    raise OSError('Invalid data stream')
+
+                joined_end = end
+
+                self.checkpoints.append(MrtCheckpoint(start // 8, self._produced, start % 8))
+                self._produced += len(block)
+                yield block
+        finally:
+            if executor is not None:
+                for _, _, future in futures:
+                    future.cancel()
+
+                executor.shutdown()
+
+            data.close()
+
+    def _decompress(self, size: int) -> memoryview:
+        while not self._buffer:
+            block = next(self._blocks, None)
+
+            if block is None:
+                break
+
+            self._buffer = memoryview(block)
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        if self._pending_offset is not None:
+            return self._pending_offset
+
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        # Seeking to the initial offset is deferred to the first read
+        if self._pending_offset is not None:
+            self.seek(self._pending_offset)
+
+        size = len(buffer)
+
+        if self._stop is not None:
+            size = max(min(size, self._stop - self.position), 0)
+
+        if not size:
+            return 0
+
+        if self.compression:
+            data = self._decompress(size)
+            length = len(data)
+            buffer[:length] = data
+        else:
+            length = self._file.readinto(memoryview(buffer)[:size])
+
+        self.position += length
+
+        return length
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('Only seeking relative to the start or the current position is supported')
+
+        self._pending_offset = None
+
+        if not self.compression:
+            self.position = self._file.seek(offset)
+            return self.position
+
+        if offset < self.position:
+            raise io.UnsupportedOperation('Compressed MRT files can only be read forward')
+
+        # Compressed data in front of the offset has to be decompressed, but it is not copied anywhere
+        while self.position < offset and (self._stop is None or self.position < self._stop):
+            size = min(offset - self.position, COMPRESSED_READ_SIZE)
+
+            if self._stop is not None:
+                size = min(size, self._stop - self.position)
+
+            data = self._decompress(size)
+
+            if not data:
+                break
+
+            self.position += len(data)
+
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            if self._blocks is not None:
+                self._blocks.close()
+
+            self._file.close()
+
+        super().close()
+
+class MrtPipeline(io.RawIOBase):
+    '''
+    This class is responsible for reading a stream ahead in a background thread.
+    The read blocks are passed to the reader through a bounded queue, so the decompression runs while the reader decodes the records.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, source: io.RawIOBase, buffers: int = PIPELINE_BUFFERS):
+        '''
+        Initializes the MrtPipeline and starts the background thread.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            source (io.RawIOBase): The stream to read ahead.
+            buffers (int): Maximum number of blocks read ahead.
+        '''
+        super().__init__()
+
+        self.source = source
+        self.position = source.tell()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=buffers)
+        self._closing = threading.Event()
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(
+            target=self._read_ahead,
+            daemon=True,
+        )
+        self._thread.start()
+
+    @property
+    def checkpoints(self) -> list[MrtCheckpoint]:
+        return self.source.checkpoints
+
+    def _put(self, item):
+        while not self._closing.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _read_ahead(self):
+        try:
+            while not self._closing.is_set():
+                block = self.source.read(PIPELINE_BLOCK_SIZE)
+                self._put(block)
+
+                if not block:
+                    return
+        except Exception as error:
+            self._put(error)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            if self._eof:
+                return 0
+
+            block = self._queue.get()
+
+            # Errors of the background thread are raised in the reader
+            if isinstance(block, Exception):
+                self._eof = True
+                raise block
+
+            if not block:
+                self._eof = True
+                return 0
+
+            self._buffer = memoryview(block)
+
+        length = min(len(buffer), len(self._buffer))
+        buffer[:length] = self._buffer[:length]
+        self._buffer = self._buffer[length:]
+        self.position += length
+
+        return length
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('Only seeking relative to the start or the current position is supported')
+
+        if offset < self.position:
+            raise io.UnsupportedOperation('Pipelined MRT files can only be read forward')
+
+        while self.position < offset:
+            if not self.read(min(offset - self.position, PIPELINE_BLOCK_SIZE)):
+                break
+
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self._closing.set()
+            self._thread.join()
+            self.source.close()
+
+        super().close()
+
+def open_mrt_file(mrt_file: str, offset: int = 0, length: int = None, checkpoints: tuple[MrtCheckpoint, ...] = (), decompression_threads: int = None) -> BinaryIO:
+    '''
+    Opens a plain, bz2 or gzip compressed MRT file for reading.
+    Compressed files are decompressed in a background thread while the caller reads.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+        offset (int): Offset in the uncompressed stream to start reading at.
+        length (int): Number of uncompressed bytes to read, None reads until the end of the file.
+        checkpoints (tuple[MrtCheckpoint, ...]): Known checkpoints of a compressed file.
+        decompression_threads (int): Number of threads for decompressing multi-stream files in parallel.
+
+    Returns:
+        BinaryIO: The opened and, if necessary, decompressing file object.
+    '''
+    mrt_stream = MrtDecompressor(
+        mrt_file=mrt_file,
+        offset=offset,
+        length=length,
+        checkpoints=checkpoints,
+        threads=decompression_threads,
+    )
+
+    if mrt_stream.compression:
+        mrt_stream = MrtPipeline(
+            source=mrt_stream,
+        )
+
+    return io.BufferedReader(mrt_stream)
+
+class MrtRecordReader:
+    '''
+    This class is responsible for reading raw MRT records without decoding their bodies.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, mrt_file: str, offset: int = 0, length: int = None, checkpoints: tuple[MrtCheckpoint, ...] = (), decompression_threads: int = None):
+        '''
+        Initializes the MrtRecordReader.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            mrt_file (str): Path to the MRT file.
+            offset (int): Offset of the first record in the uncompressed file.
+            length (int): Number of uncompressed bytes to read, None reads until the end of the file.
+            checkpoints (tuple[MrtCheckpoint, ...]): Known checkpoints of a compressed file.
+            decompression_threads (int): Number of threads for decompressing multi-stream files in parallel.
+        '''
+        self.mrt_file = mrt_file
+        self.offset = offset
+        self.length = length
+        self.checkpoints = checkpoints
+        self.decompression_threads = decompression_threads
+
+    def __iter__(self) -> Iterator[MrtRecord]:
+        offset = self.offset
+        stop = None if self.length is None else self.offset + self.length
+
+        with open_mrt_file(
+            mrt_file=self.mrt_file,
+            offset=self.offset,
+            length=self.length,
+            checkpoints=self.checkpoints,
+            decompression_threads=self.decompression_threads,
+        ) as file:
+            while stop is None or offset < stop:
+                header = file.read(MRT_HEADER_LENGTH)
+
+                if len(header) < MRT_HEADER_LENGTH:
+                    return
+
+                timestamp, type, subtype, length = MRT_HEADER.unpack(header)
+                data = file.read(length)
+
+                if len(data) < length:
+                    return
+
+                yield MrtRecord(
+                    offset=offset,
+                    timestamp=timestamp,
+                    type=type,
+                    subtype=subtype,
+                    data=memoryview(data),
+                )
+
+                offset += MRT_HEADER_LENGTH + length
+
+def scan_mrt_chunk(chunk: MrtChunk, spool_file: str = None) -> Iterator[int]:
+    '''
+    Finds the record boundaries of an MRT chunk by reading only the common MRT headers.
+    Compressed files have to be decompressed for this, the uncompressed stream can be spooled into a file on the way.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        chunk (MrtChunk): The chunk to scan, MrtChunk(mrt_file) scans the whole file.
+        spool_file (str): Path to write the uncompressed stream of the chunk to.
+
+    Returns:
+        Iterator[int]: The offsets of the records relative to the chunk, followed by the total size.
+    '''
+    offset = 0
+    spool = None if spool_file is None else open(spool_file, 'wb')
+
+    try:
+        with open_mrt_file(
+            mrt_file=chunk.mrt_file,
+            offset=chunk.offset,
+            length=chunk.length,
+            checkpoints=chunk.checkpoints,
+        ) as file:
+            while True:
+                header = file.read(MRT_HEADER_LENGTH)
+
+                if len(header) < MRT_HEADER_LENGTH:
+                    break
+
+                length = MRT_HEADER.unpack(header)[3]
+
+                if spool is None:
+                    file.seek(length, os.SEEK_CUR)
+                else:
+                    spool.write(header)
+                    spool.write(file.read(length))
+
+                yield offset
+                offset += MRT_HEADER_LENGTH + length
+    finally:
+        if spool is not None:
+            spool.close()
+
+    yield offset
+
+def split_mrt_chunk(chunk: MrtChunk, chunks: int, spool_directory: str, chunk_size: int = None) -> list[MrtChunk]:
+    '''
+    Splits an MRT chunk at record boundaries into chunks of about equal size, which can be decoded independently.
+    Compressed files are spooled uncompressed into the spool directory, so that every chunk can be read with random access.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        chunk (MrtChunk): The chunk to split, MrtChunk(mrt_file) splits the whole file.
+        chunks (int): Number of chunks to split the chunk into.
+        spool_directory (str): Directory for the uncompressed copy of compressed files.
+        chunk_size (int): Maximum size of the chunks, more chunks are created for larger files, None for no maximum.
+
+    Returns:
+        list[MrtChunk]: The chunks in file order.
+    '''
+    spool_file = None
+
+    if is_compressed_mrt_file(chunk.mrt_file):
+        spool_descriptor, spool_file = tempfile.mkstemp(
+            suffix='.mrt',
+            dir=spool_directory,
+        )
+        os.close(spool_descriptor)
+
+    offsets = list(
+        scan_mrt_chunk(
+            chunk=chunk,
+            spool_file=spool_file,
+        )
+    )
+
+    # The spooled copy starts at the chunk, offsets within the plain file are shifted by the chunk offset
+    source_file = spool_file or chunk.mrt_file
+    source_offset = 0 if spool_file else chunk.offset
+    if chunk_size:
+        chunks = max(chunks, -(-offsets[-1] // chunk_size))
+
+    target_size = offsets[-1] / max(chunks, 1)
+    chunk_start = 0
+    mrt_chunks: list[MrtChunk] = []
+
+    for offset in offsets[1:-1]:
+        if offset >= target_size * (len(mrt_chunks) + 1):
+            mrt_chunks.append(MrtChunk(source_file, source_offset + chunk_start, offset - chunk_start))
+            chunk_start = offset
+
+    mrt_chunks.append(MrtChunk(source_file, source_offset + chunk_start, offsets[-1] - chunk_start))
+
+    return mrt_chunks
@@ -10,9 +10,9 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
-from src.models.route_update import PathAttributes, RouteUpdate, OriginType, Aggregator, ChangeType, AsPathType, AsPath, NLRI
+from src.models.route_update import PathAttributesRecord, RouteUpdateRecord, OriginType, Aggregator, ChangeType, AsPathType, AsPathRecord, NLRIRecord
 from src.parsers.route_update import RouteUpdateParser
-from typing import Optional
+from typing import Iterable, Optional
 
 class ReverseParser(RouteUpdateParser):
     '''
@@ -22,6 +22,20 @@ class ReverseParser(RouteUpdateParser):
         Benedikt Schwering <bes9584@thi.de>
         Sebastian Forstner <sef9869@thi.de>
     '''
+    def __init__(self, validate: bool = False):
+        '''
+        Initializes the ReverseParser.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+
+        Args:
+            validate (bool): Whether to validate every route update against the RouteUpdate model.
+        '''
+        super().__init__()
+
+        self.validate = validate
+
     def _parse_origin(self, orig_value: int) -> OriginType:
         if orig_value:
             match orig_value:
@@ -36,8 +50,8 @@ class ReverseParser(RouteUpdateParser):
         else:
             return None
 
-    def _parse_as_path(self, as_paths: list[int, list[int]]) -> list[AsPath]:
-        all_paths: Optional[list[AsPath]] = None
+    def _parse_as_path(self, as_paths: list[int, list[int]]) -> list[AsPathRecord]:
+        all_paths: Optional[list[AsPathRecord]] = None
         if as_paths:
             for path in as_paths:
                 path_type: AsPathType
@@ -52,7 +66,7 @@ class ReverseParser(RouteUpdateParser):
                         path_type = AsPathType.AS_CONFED_SEQUENCE
                     case _:
                         return None
-                new_path = AsPath(
+                new_path = AsPathRecord(
                     type=path_type,
                     value=path[1]
                 )
@@ -74,8 +88,8 @@ class ReverseParser(RouteUpdateParser):
 
         return new_aggregator
 
-    def _parse_nlri(self, nlri: dict) -> NLRI:
-        new_nlri = NLRI(
+    def _parse_nlri(self, nlri: dict) -> NLRIRecord:
+        new_nlri = NLRIRecord(
             prefix=nlri['prefix'],
             length=nlri['length'],
         )
@@ -90,7 +104,63 @@ class ReverseParser(RouteUpdateParser):
             case _:
                 return None
 
-    def parse(self, message_data: dict) -> list[RouteUpdate]:
+    def _build_path_attributes(self, path_attributes: dict) -> PathAttributesRecord:
+        return PathAttributesRecord(
+            # origin=self._parse_origin(path_attributes['origin']),
+            as_path=self._parse_as_path(path_attributes['as_path']),
+            # next_hop=path_attributes['next_hop'],
+            # multi_exit_disc=path_attributes['multi_exit_disc'],
+            # local_pref=path_attributes['local_pref'],
+            # atomic_aggregate=path_attributes['atomic_aggregate'],
+            # aggregator=self._parse_aggregator(path_attributes.get('aggregator')),
+            # community=path_attributes['community'],
+            # large_community=path_attributes['large_community'],
+            # extended_community=path_attributes['extended_community'],
+            # orginator_id=path_attributes['orginator_id'],
+            # cluster_list=path_attributes['cluster_list'],
+        )
+
+    def _path_attributes_key(self, path_attributes: dict) -> tuple:
+        # Canonical form of every attribute used by _build_path_attributes
+        as_paths = path_attributes['as_path']
+
+        if not as_paths:
+            return None
+
+        return tuple([
+            (as_path[0], tuple(as_path[1]))
+                for as_path in as_paths
+        ])
+
+    def _parse_path_attributes(self, path_attributes: dict) -> PathAttributesRecord:
+        return self._attribute_cache.get(
+            key=self._path_attributes_key(
+                path_attributes=path_attributes,
+            ),
+            factory=lambda: self._build_path_attributes(
+                path_attributes=path_attributes,
+            ),
+        )
+
+    def _parse_route_update(self, message_data: dict) -> RouteUpdateRecord:
+        route_update = RouteUpdateRecord(
+            timestamp=message_data['timestamp'],
+            peer_ip=message_data['peer_ip'],
+            local_ip=message_data['local_ip'],
+            peer_as=message_data['peer_as'],
+            local_as=message_data['local_as'],
+            path_attributes=self._parse_path_attributes(message_data['path_attributes']),
+            change_type=self._parse_change_type(message_data['change_type'][0]),
+            nlri=self._parse_nlri(message_data['nlri']),
+        )
+
+        # Raises a pydantic ValidationError for malformed documents
+        if self.validate:
+            route_update.to_model()
+
+        return route_update
+
+    def parse(self, message_data: dict) -> list[RouteUpdateRecord]:
         '''
         Parse a Database Log message.
 
@@ -102,40 +172,30 @@ class ReverseParser(RouteUpdateParser):
             message_data (dict): The Database Log message.
 
         Returns:
-            list[RouteUpdate]: The parsed RouteUpdate objects.
+            list[RouteUpdateRecord]: The parsed RouteUpdateRecord objects.
         '''
-        route_updates: list[RouteUpdate] = []
+        route_updates = [self._parse_route_update(message_data)]
 
-        if message_data['path_attributes']['aggregator']:
-            aggregators = self._parse_aggregator(dict(message_data['path_attributes']['aggregator']))
-        else:
-            aggregators = None
-        
-        new_path_attribute = PathAttributes(
-            # origin=self._parse_origin(message_data['path_attributes']['origin']),
-            as_path=self._parse_as_path(message_data['path_attributes']['as_path']),
-            # next_hop=message_data['path_attributes']['next_hop'],
-            # multi_exit_disc=message_data['path_attributes']['multi_exit_disc'],
-            # local_pref=message_data['path_attributes']['local_pref'],
-            # atomic_aggregate=message_data['path_attributes']['atomic_aggregate'],
-            # aggregator=aggregators,
-            # community=message_data['path_attributes']['community'],
-            # large_community=message_data['path_attributes']['large_community'],
-            # extended_community=message_data['path_attributes']['extended_community'],
-            # orginator_id=message_data['path_attributes']['orginator_id'],
-            # cluster_list=message_data['path_attributes']['cluster_list'],
-        )
-        new_route_update = RouteUpdate(
-            timestamp=message_data['timestamp'],
-            peer_ip=message_data['peer_ip'],
-            local_ip=message_data['local_ip'],
-            peer_as=message_data['peer_as'],
-            local_as=message_data['local_as'],
-            path_attributes=new_path_attribute,
-            change_type=self._parse_change_type(message_data['change_type'][0]),
-            nlri=self._parse_nlri(message_data['nlri']),
-        )
-        route_updates.append(new_route_update)
+        self._send_messages(route_updates)
+        return route_updates
+
+    def parse_batch(self, messages_data: Iterable[dict]) -> list[RouteUpdateRecord]:
+        '''
+        Parse multiple Database Log messages, the route updates are sent to the registered functions at once.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+
+        Args:
+            messages_data (Iterable[dict]): The Database Log messages.
+
+        Returns:
+            list[RouteUpdateRecord]: The parsed RouteUpdateRecord objects.
+        '''
+        route_updates = [
+            self._parse_route_update(message_data)
+                for message_data in messages_data
+        ]
 
         self._send_messages(route_updates)
         return route_updates
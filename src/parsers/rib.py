@@ -10,7 +10,7 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
-from src.models.route_update import PathAttributes, RouteUpdate, OriginType, Aggregator, ChangeType, AsPathType, AsPath, NLRI
+from src.models.route_update import PathAttributesRecord, RouteUpdateRecord, OriginType, Aggregator, ChangeType, AsPathType, AsPathRecord, NLRIRecord
 from src.parsers.route_update import RouteUpdateParser
 from collections import OrderedDict
 from datetime import datetime
@@ -23,17 +23,19 @@ class RibParser(RouteUpdateParser):
         Benedikt Schwering <bes9584@thi.de>
         Sebastian Forstner <sef9869@thi.de>
     '''
-    def _get_path_attribute(self, path_attributes: list[OrderedDict], type: dict) -> dict:
+    def _index_path_attributes(self, path_attributes: list[OrderedDict]) -> dict[int, OrderedDict]:
+        # Index the path attributes once per RIB entry by their type code
+        # Only the first occurrence of an attribute type is used
+        path_attribute_index: dict[int, OrderedDict] = {}
+
         for path_attribute in path_attributes:
+            for type in path_attribute['type']:
+                path_attribute_index.setdefault(type, path_attribute)
 
-            if path_attribute['type'] == type:
-                return dict(path_attribute)
+        return path_attribute_index
 
-    def _parse_origin(self, path_attributes: list[OrderedDict]) -> OriginType:
-        origin = self._get_path_attribute(
-            path_attributes = path_attributes,
-            type = {1: 'ORIGIN'},
-        )
+    def _parse_origin(self, path_attributes: dict[int, OrderedDict]) -> OriginType:
+        origin = path_attributes.get(1)
         if origin is None:
             return None
         
@@ -45,11 +47,8 @@ class RibParser(RouteUpdateParser):
             case 'INCOMPLETE':
                 return OriginType.INCOMPLETE
 
-    def _parse_as_path(self, path_attributes: list[OrderedDict]) -> list[AsPath]:
-        as_paths = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={2: 'AS_PATH'},
-        )
+    def _parse_as_path(self, path_attributes: dict[int, OrderedDict]) -> list[AsPathRecord]:
+        as_paths = path_attributes.get(2)
 
         if as_paths is None:
             return None
@@ -66,79 +65,59 @@ class RibParser(RouteUpdateParser):
                     return AsPathType.AS_CONFED_SEQUENCE
 
         return [
-            AsPath(
-                type=_as_path_type(dict(as_path)),
+            AsPathRecord(
+                type=_as_path_type(as_path),
                 value=[
                     int(value) 
-                        for value in dict(as_path)['value']
+                        for value in as_path['value']
                 ],
             )
                 for as_path in as_paths['value']
         ]
 
-    def _parse_next_hop(self, path_attributes: list[OrderedDict]) -> list[str]:
-        next_hop = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={3: 'NEXT_HOP'},
-        )
-        mp_reach_nlri = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={14: 'MP_REACH_NLRI'},
-        )
+    def _parse_next_hop(self, path_attributes: dict[int, OrderedDict]) -> list[str]:
+        next_hop = path_attributes.get(3)
+        mp_reach_nlri = path_attributes.get(14)
 
         if next_hop:
             return [next_hop['value']]
 
         if mp_reach_nlri:
-            mp_reach_nlri = dict(mp_reach_nlri['value'])
-
-            return mp_reach_nlri['next_hop']
+            return mp_reach_nlri['value']['next_hop']
         
         return None
         
-    def _parse_multi_exit_disc(self, path_attributes: list[OrderedDict]) -> int:
-        multi_exit_disc = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={4: 'MULTI_EXIT_DISC'},
-        )
+    def _parse_multi_exit_disc(self, path_attributes: dict[int, OrderedDict]) -> int:
+        multi_exit_disc = path_attributes.get(4)
 
         if multi_exit_disc is None:
             return 0
 
         return multi_exit_disc['value']
 
-    def _parse_atomic_aggregate(self, path_attributes: list[OrderedDict]) -> int:
-        atomic_aggregate = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={6: 'ATOMIC_AGGREGATE'},
-        )
+    def _parse_atomic_aggregate(self, path_attributes: dict[int, OrderedDict]) -> int:
+        atomic_aggregate = path_attributes.get(6)
 
         if atomic_aggregate is None:
             return False
         
         return atomic_aggregate['value'] == ''
     
-    def _parse_aggregator(self, path_attributes: list[OrderedDict]) -> Aggregator:
-        aggregator = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={7: 'AGGREGATOR'},
-        )
+    def _parse_aggregator(self, path_attributes: dict[int, OrderedDict]) -> Aggregator:
+        aggregator = path_attributes.get(7)
 
         if aggregator is None:
             return None
 
-        aggregator = dict(aggregator['value'])
+        aggregator = aggregator['value']
 
         return Aggregator(
             router_id=aggregator['id'],
             router_as=int(aggregator['as']),
         )
     
-    def _parse_community(self, path_attributes: list[OrderedDict]) -> list[list[int]]:
-        community = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={8: 'COMMUNITY'},
-        )
+    def _parse_community(self, path_attributes: dict[int, OrderedDict]) -> list[list[int]]:
+        community = path_attributes.get(8)
 
         if community is None:
             return None
@@ -151,11 +130,8 @@ class RibParser(RouteUpdateParser):
                 for c in community['value']
         ]
 
-    def _parse_large_community(self, path_attributes: list[OrderedDict]) -> list[list[int]]:
-        large_community = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={32: 'LARGE_COMMUNITY'},
-        )
+    def _parse_large_community(self, path_attributes: dict[int, OrderedDict]) -> list[list[int]]:
+        large_community = path_attributes.get(32)
 
         if large_community is None:
             return None
@@ -178,11 +154,8 @@ class RibParser(RouteUpdateParser):
 
         return ip
     
-    def _parse_extended_community(self, path_attributes: list[OrderedDict]) -> list[str]:
-        extended_community = self._get_path_attribute(
-            path_attributes=path_attributes,
-            type={16: 'EXTENDED COMMUNITIES'},
-        )
+    def _parse_extended_community(self, path_attributes: dict[int, OrderedDict]) -> list[str]:
+        extended_community = path_attributes.get(16)
 
         if extended_community is None:
             return None
@@ -231,8 +204,8 @@ class RibParser(RouteUpdateParser):
 
         return ext_communities
 
-    def _parse_path_attributes(self, rib_entrie: list[OrderedDict]) -> PathAttributes:
-        return PathAttributes(
+    def _build_path_attributes(self, rib_entrie: dict[int, OrderedDict]) -> PathAttributesRecord:
+        return PathAttributesRecord(
             # origin = self._parse_origin(
             #     path_attributes = rib_entrie
             # ),
@@ -262,7 +235,29 @@ class RibParser(RouteUpdateParser):
             # ),
         )
 
-    def parse(self, statement: OrderedDict) -> list[RouteUpdate]:
+    def _path_attributes_key(self, path_attributes: dict[int, OrderedDict]) -> tuple:
+        # Canonical form of every attribute used by _build_path_attributes
+        as_paths = path_attributes.get(2)
+
+        if as_paths is None:
+            return None
+
+        return tuple(
+            (tuple(as_path['type']), tuple(as_path['value']))
+                for as_path in as_paths['value']
+        )
+
+    def _parse_path_attributes(self, rib_entrie: dict[int, OrderedDict]) -> PathAttributesRecord:
+        return self._attribute_cache.get(
+            key=self._path_attributes_key(
+                path_attributes=rib_entrie,
+            ),
+            factory=lambda: self._build_path_attributes(
+                rib_entrie=rib_entrie,
+            ),
+        )
+
+    def parse(self, statement: OrderedDict) -> list[RouteUpdateRecord]:
         '''
         Parse a BGP4MP message.
 
@@ -274,9 +269,9 @@ class RibParser(RouteUpdateParser):
             statement (OrderedDict): The RIB statement.
 
         Returns:
-            list[RouteUpdate]: The parsed RouteUpdate objects.
+            list[RouteUpdateRecord]: The parsed RouteUpdateRecord objects.
         '''
-        route_updates: list[RouteUpdate] = []
+        route_updates: list[RouteUpdateRecord] = []
 
         if statement['subtype'].get(1) == 'PEER_INDEX_TABLE':
             return None
@@ -284,7 +279,7 @@ class RibParser(RouteUpdateParser):
         rib_entries = statement['rib_entries']
         
         for entrie in rib_entries:
-            generic_update = RouteUpdate(
+            generic_update = RouteUpdateRecord(
                 timestamp=datetime.fromtimestamp(
                     list((statement['timestamp'].keys()))[0]
                 ),
@@ -292,9 +287,13 @@ class RibParser(RouteUpdateParser):
                 local_ip=statement['prefix'],
                 peer_as=0,
                 local_as=0,
-                path_attributes = self._parse_path_attributes(entrie['path_attributes']),
+                path_attributes = self._parse_path_attributes(
+                    self._index_path_attributes(
+                        path_attributes=entrie['path_attributes'],
+                    ),
+                ),
                 change_type=ChangeType.ANNOUNCE,
-                nlri=NLRI(
+                nlri=NLRIRecord(
                     prefix=statement['prefix'],
                     length=statement['length'],
                 ),
@@ -10,7 +10,49 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
-from src.models.route_update import RouteUpdate
+from src.parsers.attribute_cache import AttributeCache
+from src.models.route_update import RouteUpdateRecord
+import threading
+
+class _UpdateBatch:
+    def __init__(self, fn, batch_size: int = None, batch_interval: float = None):
+        self.fn = fn
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.messages: list[RouteUpdateRecord] = []
+        self.timer: threading.Timer = None
+        self.lock = threading.RLock()
+
+    def send(self, messages: list[RouteUpdateRecord]):
+        # Without a size or interval every parsed message is delivered as one batch
+        if not self.batch_size and not self.batch_interval:
+            if messages:
+                self.fn(messages)
+            return
+
+        with self.lock:
+            self.messages.extend(messages)
+
+            if self.batch_size and len(self.messages) >= self.batch_size:
+                self.flush()
+            elif self.batch_interval and self.messages and self.timer is None:
+                # The interval starts with the first buffered route update
+                self.timer = threading.Timer(
+                    interval=self.batch_interval / 1000,
+                    function=self.flush,
+                )
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if self.messages:
+                messages, self.messages = self.messages, []
+                self.fn(messages)
 
 class RouteUpdateParser:
     '''
@@ -19,13 +61,64 @@ class RouteUpdateParser:
     Author:
         Benedikt Schwering <bes9584@thi.de>
     '''
-    _on_update_functions = []
+    def __init__(self):
+        # Registered functions are bound to the parser instance
+        # Otherwise every parser, e.g. in worker processes or subsequent webapp runs, would share them
+        self._on_update_functions = []
+        self._on_update_batches: list[_UpdateBatch] = []
+        self._on_flush_functions = []
+        self._on_close_functions = []
 
-    def _send_messages(self, messages: list[RouteUpdate]):
+        # Parsed path attributes are interned per parser, route updates with the same attributes share one object
+        self._attribute_cache = AttributeCache()
+
+    def _send_messages(self, messages: list[RouteUpdateRecord]):
         for message in messages:
             for fn in self._on_update_functions:
                 fn(message)
 
+        for batch in self._on_update_batches:
+            batch.send(messages)
+
+    def send_messages(self, messages: list[RouteUpdateRecord]):
+        '''
+        Send route updates that were parsed by another parser instance, e.g. in a worker process, to the registered functions.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            messages (list[RouteUpdateRecord]): The parsed route updates.
+        '''
+        self._send_messages(messages)
+
+    def flush(self):
+        '''
+        Deliver the route updates that are still buffered for the registered batch functions.
+        Must be called when no more route updates follow, e.g. at the end of a file or before pausing.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        for batch in self._on_update_batches:
+            batch.flush()
+
+        for fn in self._on_flush_functions:
+            fn()
+
+    def close(self):
+        '''
+        Flush the parser and call the functions registered by on_close.
+        Must be called once when the input ends, unlike flush, which is also called before pausing.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self.flush()
+
+        for fn in self._on_close_functions:
+            fn()
+
     def on_update(self, fn):
         '''
         Register a function that should be called when a new route update is parsed.
@@ -37,3 +130,67 @@ class RouteUpdateParser:
             fn: The function that should be called when a new route update is parsed.
         '''
         self._on_update_functions.append(fn)
+
+    def on_update_batch(self, fn, batch_size: int = None, batch_interval: float = None):
+        '''
+        Register a function that should be called with lists of parsed route updates.
+        By default the route updates of every parsed message are delivered as one list.
+        With a batch size or interval the route updates are buffered across messages until one of them is reached.
+        Batches closed by the interval are delivered from a timer thread, remaining route updates are delivered by flush.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            fn: The function that should be called with the list of route updates.
+            batch_size (int): Number of route updates after which the buffered route updates are delivered.
+            batch_interval (float): Time in milliseconds after which the buffered route updates are delivered.
+
+        Returns:
+            The registered function, so this method can be used as decorator.
+        '''
+        self._on_update_batches.append(
+            _UpdateBatch(
+                fn=fn,
+                batch_size=batch_size,
+                batch_interval=batch_interval,
+            )
+        )
+
+        return fn
+
+    def on_flush(self, fn):
+        '''
+        Register a function that should be called by flush, after the buffered route updates are delivered.
+        Used by adapters that keep their own buffers, e.g. a write-behind cache.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            fn: The function that should be called without arguments.
+
+        Returns:
+            The registered function, so this method can be used as decorator.
+        '''
+        self._on_flush_functions.append(fn)
+
+        return fn
+
+    def on_close(self, fn):
+        '''
+        Register a function that should be called by close, after the parser is flushed.
+        Used by adapters that keep buffers until the input ends, e.g. a grouped interval.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            fn: The function that should be called without arguments.
+
+        Returns:
+            The registered function, so this method can be used as decorator.
+        '''
+        self._on_close_functions.append(fn)
+
+        return fn
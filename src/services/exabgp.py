@@ -38,6 +38,7 @@ def exabgp(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool
             parser=parser,
             no_direct=no_rabbitmq_direct,
             queue_interval=rabbitmq_grouped,
+            live_feed=True,
         )
 
     if not no_mongodb_log or not no_mongodb_state or not no_mongodb_statistics:
@@ -49,10 +50,15 @@ def exabgp(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool
             clear_mongodb=clear_mongodb,
         )
 
-    while True:
-        for line in sys.stdin:
-            parser.parse(
-                line=line,
-            )
+    try:
+        while True:
+            for line in sys.stdin:
+                parser.parse(
+                    line=line,
+                )
 
-        time.sleep(1)
+            parser.flush()
+            time.sleep(1)
+    finally:
+        # Buffered route updates and open grouped intervals are still written when the service is stopped
+        parser.close()
@@ -12,18 +12,81 @@ Author:
 '''
 from src.adapters.mongodb import MongoDBAdapter, MongoDBLogLoader
 from src.adapters.rabbitmq import RabbitMQAdapter
-from src.models.route_update import ChangeType
+from src.models.message_replay import MessageReplayPeerCount, MessageReplayIntervalCount
+from src.models.route_update import RouteUpdateRecord, ChangeType
+from src.services.playback import PlaybackScheduler
 from src.parsers.reverse import ReverseParser
-from datetime import timedelta, datetime
-from collections import OrderedDict
+from typing import Optional, Union
 from pydantic import BaseModel
-import time
+from itertools import islice
+from datetime import datetime
+import os
+
+# Default interval of the counts by time in minutes
+MESSAGE_REPLAY_COUNT_INTERVAL = 5
 
 class MessageReplayResult(BaseModel):
     count_announce: int
     count_withdraw: int
+    count_by_peer: Optional[list[MessageReplayPeerCount]] = None
+    count_by_interval: Optional[list[MessageReplayIntervalCount]] = None
+    playback_lag_max: Optional[float] = None
+    playback_lag_mean: Optional[float] = None
+
+def _count_updates(message_replay_result: MessageReplayResult, updates: list[RouteUpdateRecord]):
+    for update in updates:
+        if update.change_type == ChangeType.ANNOUNCE:
+            message_replay_result.count_announce += 1
+        elif update.change_type == ChangeType.WITHDRAW:
+            message_replay_result.count_withdraw += 1
+
+def _count_messages(time_start: datetime, time_end: datetime, count_interval: int) -> MessageReplayResult:
+    counts = MongoDBLogLoader.count_messages(
+        timestamp_start=time_start,
+        timestamp_end=time_end,
+        count_interval=count_interval,
+    )
+    count_by_change_type = {
+        group['_id']: group['count']
+            for group in counts['change_type']
+    }
+    count_by_peer: dict[tuple[str, int], MessageReplayPeerCount] = {}
+    count_by_interval: dict[datetime, MessageReplayIntervalCount] = {}
+
+    # The groups are split by change type, which becomes a field of the counts
+    for group in counts['peer']:
+        peer_count = count_by_peer.setdefault(
+            (group['_id']['peer_ip'], group['_id']['peer_as']),
+            MessageReplayPeerCount(
+                peer_ip=group['_id']['peer_ip'],
+                peer_as=group['_id']['peer_as'],
+            ),
+        )
+        _add_count(peer_count, group['_id']['change_type'], group['count'])
+
+    for group in counts['interval']:
+        interval_count = count_by_interval.setdefault(
+            group['_id']['timestamp'],
+            MessageReplayIntervalCount(
+                timestamp=group['_id']['timestamp'],
+            ),
+        )
+        _add_count(interval_count, group['_id']['change_type'], group['count'])
 
-def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, playback_speed: int, playback_interval: int, start_timestamp: float, end_timestamp: float, start_time: str, end_time: str) -> MessageReplayResult:
+    return MessageReplayResult(
+        count_announce=count_by_change_type.get(ChangeType.ANNOUNCE.value[0], 0),
+        count_withdraw=count_by_change_type.get(ChangeType.WITHDRAW.value[0], 0),
+        count_by_peer=list(count_by_peer.values()),
+        count_by_interval=list(count_by_interval.values()),
+    )
+
+def _add_count(count: Union[MessageReplayPeerCount, MessageReplayIntervalCount], change_type: int, value: int):
+    if change_type == ChangeType.ANNOUNCE.value[0]:
+        count.count_announce += value
+    elif change_type == ChangeType.WITHDRAW.value[0]:
+        count.count_withdraw += value
+
+def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, playback_speed: float, playback_interval: int, start_timestamp: float, end_timestamp: float, start_time: str, end_time: str, validate_messages: bool = False, count_interval: int = None) -> MessageReplayResult:
     '''
     Message replay service for replaying BGP messages from Database log.
 
@@ -37,22 +100,45 @@ def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_l
         no_mongodb_state (bool): Disable state storage to MongoDB.
         no_mongodb_statistics (bool): Disable statistics storage to MongoDB.
         clear_mongodb (bool): Clear MongoDB collections.
-        playback_speed (int): Playback speed in multiples of real time.
+        playback_speed (float): Playback speed in multiples of real time.
         playback_interval (int): Playback interval in minutes.
         start_timestamp (float): Starttime of replay as timestamp.
         end_timestamp (float): Endtime of replay as timestamp.
         start_time (str): Starttime of replay as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
         end_time (str): Endtime of replay as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
+        validate_messages (bool): Validate the replayed messages against the RouteUpdate model.
+        count_interval (int): Interval of the counts by time in minutes, only used when the messages are only counted.
 
     Returns:
         MessageReplayResult: The message replay result.
     '''
+    # Check if start and end are given and in which format; no time given results in replaying whole db
+    if start_timestamp and end_timestamp:
+        time_start = datetime.fromtimestamp(start_timestamp)
+        time_end = datetime.fromtimestamp(end_timestamp)
+    elif start_time and end_time: 
+        time_start = datetime.fromisoformat(start_time)
+        time_end = datetime.fromisoformat(end_time)
+    else:
+        time_start = None
+        time_end = None
+
+    # Without sinks the replay has no side effects, so the messages are only counted by MongoDB
+    if no_rabbitmq_direct and not rabbitmq_grouped and no_mongodb_log and no_mongodb_state and no_mongodb_statistics and not validate_messages:
+        return _count_messages(
+            time_start=time_start,
+            time_end=time_end,
+            count_interval=count_interval or MESSAGE_REPLAY_COUNT_INTERVAL,
+        )
+
     message_replay_result = MessageReplayResult(
         count_announce=0,
         count_withdraw=0,
     )
 
-    parser = ReverseParser()
+    parser = ReverseParser(
+        validate=validate_messages,
+    )
 
     if not no_rabbitmq_direct or rabbitmq_grouped:
         RabbitMQAdapter(
@@ -61,60 +147,54 @@ def message_replay(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_l
             queue_interval=rabbitmq_grouped,
         )
     
-    playback_speed_reference: datetime = None
-    playback_interval_stop: datetime = None
-
-    # Check if start and end are given and in which format; no time given results in replaying whole db
-    if start_timestamp and end_timestamp:
-        start_time = datetime.fromtimestamp(start_timestamp)
-        end_time = datetime.fromtimestamp(end_timestamp)
-        new_messages = MongoDBLogLoader.load_messages(timestamp_start = start_time, timestamp_end = end_time)
-    elif start_time and end_time: 
-        time_start = datetime.fromisoformat(start_time)
-        time_end = datetime.fromisoformat(end_time)
-        new_messages = MongoDBLogLoader.load_messages(timestamp_start = time_start, timestamp_end = time_end)
-    else:
-        new_messages = MongoDBLogLoader.load_messages(timestamp_start = None, timestamp_end = None)
-
-    # Copy messages in local list to avoid deleting them if -c is set; new_messages is corsor pointing to db
-    all_messages: list[OrderedDict] = []
-    for message in new_messages:
-        all_messages.append(message)
-
-    # Init for MongoDBAdapter to avouid deleting messages before loading
-    if not no_mongodb_log or not no_mongodb_state or not no_mongodb_statistics:
-        MongoDBAdapter(
-            parser=parser,
-            no_mongodb_log=no_mongodb_log,
-            no_mongodb_state=no_mongodb_state,
-            no_mongodb_statistics=no_mongodb_statistics,
-            clear_mongodb=clear_mongodb,
-        )
-
-    for message in all_messages:
-        current_timestamp: datetime = message['timestamp']
-
-        if playback_speed:
-            if playback_speed_reference:
-                time.sleep((current_timestamp - playback_speed_reference).seconds / playback_speed)
-
-            playback_speed_reference = current_timestamp
-
-        if playback_interval:
-            if playback_interval_stop:
-                if current_timestamp > playback_interval_stop:
-                    input('Enter for next interval...')
-                    playback_interval_stop = playback_interval_stop + timedelta(minutes=playback_interval)
-            else:
-                playback_interval_stop = current_timestamp + timedelta(minutes=playback_interval)
+    playback_scheduler = PlaybackScheduler(
+        playback_speed=playback_speed,
+        playback_interval=playback_interval,
+        # Buffered route updates of the interval are delivered before pausing
+        on_pause=parser.flush,
+    )
 
-        updates = parser.parse(message)
+    # The log is loaded from a snapshot when the replay writes to it
+    # Otherwise clearing the log or the replayed route updates would change the messages being replayed
+    all_messages = MongoDBLogLoader.load_messages(
+        timestamp_start=time_start,
+        timestamp_end=time_end,
+        snapshot=not no_mongodb_log,
+    )
 
-        if updates:
-            for update in updates:
-                if update.change_type == ChangeType.ANNOUNCE:
-                    message_replay_result.count_announce += 1
-                elif update.change_type == ChangeType.WITHDRAW:
-                    message_replay_result.count_withdraw += 1
+    try:
+        # Init for MongoDBAdapter after loading, so the snapshot is taken before the log is cleared
+        if not no_mongodb_log or not no_mongodb_state or not no_mongodb_statistics:
+            MongoDBAdapter(
+                parser=parser,
+                no_mongodb_log=no_mongodb_log,
+                no_mongodb_state=no_mongodb_state,
+                no_mongodb_statistics=no_mongodb_statistics,
+                clear_mongodb=clear_mongodb,
+            )
+
+        # Without playback the messages are parsed in batches, the route updates of a batch are sent at once
+        if not playback_speed and not playback_interval:
+            batch_size = int(os.getenv('MONGO_DB_REPLAY_BATCH_SIZE', 1000))
+            messages = iter(all_messages)
+
+            while message_batch := list(islice(messages, batch_size)):
+                _count_updates(message_replay_result, parser.parse_batch(message_batch))
+        else:
+            # Messages with the same timestamp are parsed at once, when their virtual time of the playback is reached
+            for message_batch in playback_scheduler.play(
+                records=all_messages,
+                timestamp=lambda message: message['timestamp'],
+            ):
+                _count_updates(message_replay_result, parser.parse_batch(message_batch))
+    finally:
+        # Releases the cursor and drops the snapshot
+        all_messages.close()
+
+    parser.close()
+
+    if playback_speed:
+        message_replay_result.playback_lag_max = playback_scheduler.lag_max
+        message_replay_result.playback_lag_mean = playback_scheduler.lag_mean
 
     return message_replay_result
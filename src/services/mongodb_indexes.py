@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.adapters.mongodb import MONGODB_INDEXES, MONGODB_UNIQUE_INDEXES, ensure_mongodb_indexes, get_mongodb_indexes, get_mongodb_client
+from pymongo.errors import OperationFailure
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Union
+
+class MongoDBIndexUsage(BaseModel):
+    database: str
+    name: str
+    keys: list[tuple[str, Union[int, str]]]
+    operations: Optional[int] = None
+    since: Optional[datetime] = None
+    size: Optional[int] = None
+    unique: bool = False
+    expected: bool = False
+    missing: bool = False
+
+def mongodb_indexes(create_missing: bool = False) -> list[MongoDBIndexUsage]:
+    '''
+    MongoDB indexes service for reporting the usage and size of the indexes of the storage collections.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        create_missing (bool): Create the missing indexes before reporting.
+
+    Returns:
+        list[MongoDBIndexUsage]: The indexes of all storage collections, including the missing ones.
+    '''
+    database_client = get_mongodb_client()
+
+    index_usages: list[MongoDBIndexUsage] = []
+
+    for database in MONGODB_INDEXES:
+        collection = database_client[database].storage
+        expected_keys = get_mongodb_indexes(database)
+
+        if create_missing:
+            ensure_mongodb_indexes(collection, database)
+
+        try:
+            index_stats = list(collection.aggregate([{'$indexStats': {}}]))
+            storage_stats = next(collection.aggregate([{'$collStats': {'storageStats': {}}}]), {}).get('storageStats', {})
+        except OperationFailure:
+            # The collection does not exist yet
+            index_stats = []
+            storage_stats = {}
+
+        for index_stat in index_stats:
+            keys = list(index_stat['key'].items())
+            unique = index_stat.get('spec', {}).get('unique', False)
+
+            index_usages.append(
+                MongoDBIndexUsage(
+                    database=database,
+                    name=index_stat['name'],
+                    keys=keys,
+                    operations=index_stat['accesses']['ops'],
+                    since=index_stat['accesses']['since'],
+                    size=storage_stats.get('indexSizes', {}).get(index_stat['name']),
+                    unique=unique,
+                    # An index, which should be unique but is not, is reported as missing
+                    expected=keys in expected_keys and unique == (keys in MONGODB_UNIQUE_INDEXES),
+                )
+            )
+
+        existing_keys = [
+            index_usage.keys
+                for index_usage in index_usages
+                    if index_usage.database == database and index_usage.expected
+        ]
+
+        for keys in expected_keys:
+            if keys not in existing_keys:
+                index_usages.append(
+                    MongoDBIndexUsage(
+                        database=database,
+                        name='_'.join(f'{key}_{direction}' for key, direction in keys),
+                        keys=keys,
+                        unique=keys in MONGODB_UNIQUE_INDEXES,
+                        expected=True,
+                        missing=True,
+                    )
+                )
+
+    return index_usages
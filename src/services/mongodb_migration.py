@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.adapters.mongodb import ensure_mongodb_indexes, get_mongodb_document_filter, get_mongodb_client
+from pymongo import ReplaceOne, UpdateOne, ASCENDING
+from pydantic import BaseModel
+from typing import Union
+
+# Number of documents written to the migrated collection with one bulk write
+MIGRATION_BATCH_SIZE = 1000
+
+# Databases of the collections keyed by prefix and the field the latest document of a prefix is found by
+MIGRATION_DATABASES = {
+    'message_state': 'timestamp',
+    'message_statistics': 'current_timestamp',
+}
+
+class MongoDBMigrationResult(BaseModel):
+    database: str
+    count_documents: int
+    count_migrated: int
+
+def _merge_statistics_operation(document_filter: dict, document: dict) -> UpdateOne:
+    # Statistics of the same new _id are added up, the other fields are taken from the latest document
+    # The pipeline references the values merged so far, missing values mean the document is inserted
+    new_values = {
+        field: {'$literal': value}
+            for field, value in document.items()
+                if field != '_id'
+    }
+    new_values['change_count'] = {'$add': [{'$ifNull': ['$change_count', 0]}, document.get('change_count', 0)]}
+    # The current_timestamp of an earlier document is a previous change as well, $max ignores missing values
+    new_values['last_timestamp'] = {'$max': [{'$literal': document.get('last_timestamp')}, '$current_timestamp']}
+
+    return UpdateOne(document_filter, [{'$set': new_values}], upsert=True)
+
+def mongodb_migrate_ids(id_schema: str) -> list[MongoDBMigrationResult]:
+    '''
+    MongoDB migration service for converting the _id of the state and statistics documents to another schema.
+    The documents are copied into a new collection, which replaces the old one when all documents are copied.
+    Documents with the same new _id, or of the same prefix for the object schema, are merged.
+    The latest state document of a prefix is kept, the change counts of the statistics documents are added up.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+
+    Args:
+        id_schema (str): One of MONGODB_ID_SCHEMAS.
+
+    Returns:
+        list[MongoDBMigrationResult]: The number of documents before and after the migration per database.
+    '''
+    database_client = get_mongodb_client()
+
+    migration_results: list[MongoDBMigrationResult] = []
+
+    for database, timestamp_field in MIGRATION_DATABASES.items():
+        collection = database_client[database].storage
+        migrated_collection = database_client[database].storage_migration
+        migrated_collection.drop()
+
+        # The indexes are created first, so the documents of the object schema are merged by the unique NLRI index
+        ensure_mongodb_indexes(migrated_collection, database, id_schema)
+
+        count_documents = 0
+        operations: list[Union[ReplaceOne, UpdateOne]] = []
+
+        # Ordered by time, so the latest document of a prefix is written last
+        for document in collection.find().sort(timestamp_field, ASCENDING).allow_disk_use(True):
+            count_documents += 1
+
+            document_filter = get_mongodb_document_filter(
+                id_schema=id_schema,
+                prefix=document['nlri']['prefix'],
+                length=document['nlri']['length'],
+                peer_ip=document.get('peer_ip') if database == 'message_state' else None,
+            )
+
+            # The object schema keeps the _id of the first document of a prefix and inserts new ones with a new ObjectId
+            if id_schema == 'object':
+                del document['_id']
+            else:
+                document['_id'] = document_filter['_id']
+
+            if database == 'message_statistics':
+                operations.append(_merge_statistics_operation(document_filter, document))
+            else:
+                operations.append(ReplaceOne(document_filter, document, upsert=True))
+
+            if len(operations) >= MIGRATION_BATCH_SIZE:
+                migrated_collection.bulk_write(operations)
+                operations = []
+
+        if operations:
+            migrated_collection.bulk_write(operations)
+
+        migration_results.append(
+            MongoDBMigrationResult(
+                database=database,
+                count_documents=count_documents,
+                count_migrated=migrated_collection.count_documents({}),
+            )
+        )
+
+        if count_documents:
+            migrated_collection.rename('storage', dropTarget=True)
+        else:
+            migrated_collection.drop()
+
+    return migration_results
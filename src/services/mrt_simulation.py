@@ -10,20 +10,24 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
-from src.parsers.mrt_bgp4mp import MrtBgp4MpParser
+from src.parsers.route_update import RouteUpdateParser
+from src.parsers.mrt_filter import MrtRecordFilter
+from src.parsers.mrt_decoder import MrtDecodedRecord, decode_mrt_files
 from src.adapters.rabbitmq import RabbitMQAdapter
 from src.adapters.mongodb import MongoDBAdapter
+from src.services.playback import PlaybackScheduler
 from src.models.route_update import ChangeType
-from datetime import timedelta, datetime
+from typing import Iterable, Iterator, Optional
 from pydantic import BaseModel
-from mrtparse import Reader
-import time
+from datetime import datetime
 
 class MRTSimulationResult(BaseModel):
     count_announce: int
     count_withdraw: int
+    playback_lag_max: Optional[float] = None
+    playback_lag_mean: Optional[float] = None
 
-def mrt_simulation(no_rabbitmq_direct: bool = False, rabbitmq_grouped: int = None, no_mongodb_log: bool = False, no_mongodb_state: bool = False, no_mongodb_statistics: bool = False, clear_mongodb: bool = False, playback_speed: int = None, playback_interval: int = None, mrt_files: tuple[str, ...] = ()) -> MRTSimulationResult:
+def mrt_simulation(no_rabbitmq_direct: bool = False, rabbitmq_grouped: int = None, no_mongodb_log: bool = False, no_mongodb_state: bool = False, no_mongodb_statistics: bool = False, clear_mongodb: bool = False, playback_speed: float = None, playback_interval: int = None, native_decoder: bool = False, workers: int = None, decompression_threads: int = None, start_time: str = None, end_time: str = None, peer: tuple[str, ...] = (), peer_as: tuple[int, ...] = (), prefix_within: tuple[str, ...] = (), message_type: tuple[str, ...] = (), mrt_files: tuple[str, ...] = ()) -> MRTSimulationResult:
     '''
     MRT Simulation service for retrieving BGP messages from MRT files and processing them.
 
@@ -38,8 +42,17 @@ def mrt_simulation(no_rabbitmq_direct: bool = False, rabbitmq_grouped: int = Non
         no_mongodb_state (bool): Disable state storage to MongoDB.
         no_mongodb_statistics (bool): Disable statistics storage to MongoDB.
         clear_mongodb (bool): Clear MongoDB collections.
-        playback_speed (int): Playback speed in multiples of real time.
+        playback_speed (float): Playback speed in multiples of real time.
         playback_interval (int): Playback interval in minutes.
+        native_decoder (bool): Decode BGP4MP records with the built-in decoder instead of mrtparse.
+        workers (int): Number of worker processes for decoding the MRT files in parallel.
+        decompression_threads (int): Number of threads for decompressing multi-stream bz2 or gzip files in parallel.
+        start_time (str): Starttime of simulation as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
+        end_time (str): Endtime of simulation as time; in format (T is a set character): YYYY-MM-DDThh:mm:ss.
+        peer (tuple[str, ...]): Only process route updates of the peers with these IP addresses.
+        peer_as (tuple[int, ...]): Only process route updates of peers with these AS numbers.
+        prefix_within (tuple[str, ...]): Only process routes within these prefixes in CIDR notation.
+        message_type (tuple[str, ...]): Only process MRT records of these subtypes.
         mrt_files (tuple[str, ...]): MRT files to process.
 
     Returns:
@@ -50,7 +63,19 @@ def mrt_simulation(no_rabbitmq_direct: bool = False, rabbitmq_grouped: int = Non
         count_withdraw=0,
     )
 
-    parser = MrtBgp4MpParser()
+    record_filter: MrtRecordFilter = None
+
+    # The filters are checked on the fixed headers of the MRT records before they are decoded
+    if peer or peer_as or prefix_within or message_type:
+        record_filter = MrtRecordFilter(
+            peers=peer,
+            peer_as=peer_as,
+            prefixes=prefix_within,
+            message_types=message_type,
+        )
+
+    # The MRT files are decoded by decode_mrt_files, this parser only forwards the route updates
+    parser = RouteUpdateParser()
 
     if not no_rabbitmq_direct or rabbitmq_grouped:
         RabbitMQAdapter(
@@ -68,43 +93,56 @@ def mrt_simulation(no_rabbitmq_direct: bool = False, rabbitmq_grouped: int = Non
             clear_mongodb=clear_mongodb,
         )
 
-    playback_speed_reference: datetime = None
-    playback_interval_stop: datetime = None
+    # Records with the same timestamp are sent at once, when their virtual time of the playback is reached
+    playback_scheduler = PlaybackScheduler(
+        playback_speed=playback_speed,
+        playback_interval=playback_interval,
+        # Buffered route updates of the interval are delivered before pausing
+        on_pause=parser.flush,
+    )
 
-    for mrt_file in mrt_files:
-        for message in Reader(mrt_file):
-            if message.data['type'] != {16: 'BGP4MP'}:
+    def _supported_messages(messages: Iterable[MrtDecodedRecord]) -> Iterator[MrtDecodedRecord]:
+        for message in messages:
+            if message.route_updates is None:
                 print('[dark_orange]\[WARN][/] Skipping unsupported MRT type: ', end='')
-                print(message.data['type'])
+                print(message.type)
                 continue
 
-            current_timestamp: datetime = datetime.fromtimestamp(
-                timestamp=list(message.data['timestamp'].keys())[0],
-            )
-
-            if playback_speed:
-                if playback_speed_reference:
-                    time.sleep((current_timestamp - playback_speed_reference).seconds / playback_speed)
-
-                playback_speed_reference = current_timestamp
-
-            if playback_interval:
-                if playback_interval_stop:
-                    if current_timestamp > playback_interval_stop:
-                        input('Enter for next interval...')
-                        playback_interval_stop = playback_interval_stop + timedelta(minutes=playback_interval)
-                else:
-                    playback_interval_stop = current_timestamp + timedelta(minutes=playback_interval)
-
-            updates = parser.parse(
-                bgp4mp_message=message,
-            )
-
-            if updates:
-                for update in updates:
-                    if update.change_type == ChangeType.ANNOUNCE:
-                        mrt_simulation_result.count_announce += 1
-                    elif update.change_type == ChangeType.WITHDRAW:
-                        mrt_simulation_result.count_withdraw += 1
+            yield message
+
+    # A time window seeks to the first matching record using the sidecar index of each MRT file
+    for messages in playback_scheduler.play(
+        records=_supported_messages(
+            decode_mrt_files(
+                mrt_files=mrt_files,
+                native_decoder=native_decoder,
+                workers=workers,
+                decompression_threads=decompression_threads,
+                record_filter=record_filter,
+                start_timestamp=int(datetime.fromisoformat(start_time).timestamp()) if start_time else None,
+                end_timestamp=int(datetime.fromisoformat(end_time).timestamp()) if end_time else None,
+            ),
+        ),
+        timestamp=lambda message: datetime.fromtimestamp(message.timestamp),
+    ):
+        route_updates = [
+            update
+                for message in messages
+                    for update in message.route_updates
+        ]
+
+        parser.send_messages(route_updates)
+
+        for update in route_updates:
+            if update.change_type == ChangeType.ANNOUNCE:
+                mrt_simulation_result.count_announce += 1
+            elif update.change_type == ChangeType.WITHDRAW:
+                mrt_simulation_result.count_withdraw += 1
+
+    parser.close()
+
+    if playback_speed:
+        mrt_simulation_result.playback_lag_max = playback_scheduler.lag_max
+        mrt_simulation_result.playback_lag_mean = playback_scheduler.lag_mean
 
     return mrt_simulation_result
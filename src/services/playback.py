@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from typing import Callable, Iterable, Iterator, TypeVar
+from datetime import datetime, timedelta
+import time
+
+T = TypeVar('T')
+
+class PlaybackScheduler:
+    '''
+    This class paces the playback of timestamped records on a virtual clock.
+    The virtual time of a record is its offset to the first record divided by the playback speed, counted from the start of the playback.
+    Waiting for the virtual time instead of the gap to the previous record does not drift, late records are dispatched at once until the playback has caught up.
+    With a playback interval the playback pauses after each interval until enter is pressed, the pause is not part of the virtual time.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def __init__(self, playback_speed: float = None, playback_interval: int = None, on_pause: Callable[[], None] = None):
+        '''
+        Initializes the PlaybackScheduler.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            playback_speed (float): Playback speed in multiples of real time, None to play without waiting.
+            playback_interval (int): Playback interval in minutes, None to play without pausing.
+            on_pause: Function that should be called before pausing, e.g. to flush the buffered route updates.
+        '''
+        self.playback_speed = playback_speed
+        self.playback_interval = playback_interval
+        self.on_pause = on_pause
+
+        # Seconds the dispatched records were behind their virtual time
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self.count_dispatched = 0
+
+        self._reference_timestamp: datetime = None
+        self._reference_clock: float = None
+        self._interval_stop: datetime = None
+
+    @property
+    def lag_mean(self) -> float:
+        '''
+        Returns the mean lag of the dispatched records behind their virtual time in seconds.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Returns:
+            float: The mean lag in seconds.
+        '''
+        if not self.count_dispatched:
+            return 0.0
+
+        return self.lag_total / self.count_dispatched
+
+    def wait(self, timestamp: datetime):
+        '''
+        Waits until the virtual time of a timestamp is reached and pauses at the end of a playback interval.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            timestamp (datetime): The timestamp of the next record.
+        '''
+        if self.playback_interval:
+            if self._interval_stop is None:
+                self._interval_stop = timestamp + timedelta(minutes=self.playback_interval)
+            elif timestamp > self._interval_stop:
+                pause_start = time.monotonic()
+
+                if self.on_pause:
+                    self.on_pause()
+
+                input('Enter for next interval...')
+                self._interval_stop = self._interval_stop + timedelta(minutes=self.playback_interval)
+
+                # The virtual clock is stopped while pausing
+                if self._reference_clock is not None:
+                    self._reference_clock += time.monotonic() - pause_start
+
+        if self.playback_speed:
+            if self._reference_timestamp is None:
+                self._reference_timestamp = timestamp
+                self._reference_clock = time.monotonic()
+
+            target_clock = self._reference_clock + (timestamp - self._reference_timestamp).total_seconds() / self.playback_speed
+            delay = target_clock - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            lag = max(time.monotonic() - target_clock, 0.0)
+
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_total += lag
+            self.count_dispatched += 1
+
+    def play(self, records: Iterable[T], timestamp: Callable[[T], datetime]) -> Iterator[list[T]]:
+        '''
+        Groups consecutive records with the same timestamp and yields each group when its virtual time is reached.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+
+        Args:
+            records (Iterable[T]): The records ordered by time.
+            timestamp (Callable[[T], datetime]): Function returning the timestamp of a record.
+
+        Returns:
+            Iterator[list[T]]: The groups of records with the same timestamp.
+        '''
+        batch: list[T] = []
+        batch_timestamp: datetime = None
+
+        for record in records:
+            record_timestamp = timestamp(record)
+
+            if batch and record_timestamp != batch_timestamp:
+                self.wait(batch_timestamp)
+                yield batch
+                batch = []
+
+            batch_timestamp = record_timestamp
+            batch.append(record)
+
+        if batch:
+            self.wait(batch_timestamp)
+            yield batch
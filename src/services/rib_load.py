@@ -10,13 +10,14 @@ Author:
     Benedikt Schwering <bes9584@thi.de>
     Sebastian Forstner <sef9869@thi.de>
 '''
+from src.parsers.route_update import RouteUpdateParser
+from src.parsers.mrt_filter import MrtRecordFilter
+from src.parsers.mrt_decoder import decode_rib_files
 from src.adapters.rabbitmq import RabbitMQAdapter
 from src.adapters.mongodb import MongoDBAdapter
-from src.parsers.rib import RibParser
-from mrtparse import Reader
 from rich import print
 
-def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, rib_file: str):
+def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bool, no_mongodb_state: bool, no_mongodb_statistics: bool, clear_mongodb: bool, rib_file: str, workers: int = None, decompression_threads: int = None, peer: tuple[str, ...] = (), peer_as: tuple[int, ...] = (), prefix_within: tuple[str, ...] = (), message_type: tuple[str, ...] = ()):
     '''
     RIB Load service for retrieving BGP routes from RIB files and loading them.
 
@@ -31,8 +32,26 @@ def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bo
         no_mongodb_statistics (bool): Disable statistics storage to MongoDB.
         clear_mongodb (bool): Clear MongoDB collections.
         rib_file (str): RIB file to process.
+        workers (int): Number of worker processes for decoding the RIB file in parallel.
+        decompression_threads (int): Number of threads for decompressing multi-stream bz2 or gzip files in parallel.
+        peer (tuple[str, ...]): Only process routes of the peers with these IP addresses.
+        peer_as (tuple[int, ...]): Only process routes of peers with these AS numbers.
+        prefix_within (tuple[str, ...]): Only process routes within these prefixes in CIDR notation.
+        message_type (tuple[str, ...]): Only process MRT records of these subtypes.
     '''
-    parser = RibParser()
+    record_filter: MrtRecordFilter = None
+
+    # The filters are checked on the fixed headers of the MRT records before they are decoded
+    if peer or peer_as or prefix_within or message_type:
+        record_filter = MrtRecordFilter(
+            peers=peer,
+            peer_as=peer_as,
+            prefixes=prefix_within,
+            message_types=message_type,
+        )
+
+    # The RIB file is decoded by decode_rib_files, this parser only forwards the route updates
+    parser = RouteUpdateParser()
 
     if not no_rabbitmq_direct or rabbitmq_grouped:
         RabbitMQAdapter(
@@ -50,12 +69,17 @@ def rib_load(no_rabbitmq_direct: bool, rabbitmq_grouped: int, no_mongodb_log: bo
             clear_mongodb=clear_mongodb,
         )
 
-    for message in Reader(rib_file):
-        if message.data['type'] != {13: 'TABLE_DUMP_V2'}:
+    for message in decode_rib_files(
+        rib_files=(rib_file,),
+        workers=workers,
+        decompression_threads=decompression_threads,
+        record_filter=record_filter,
+    ):
+        if message.route_updates is None:
             print('[dark_orange]\[WARN][/] Skipping unsupported MRT type: ', end='')
-            print(message.data['type'])
+            print(message.type)
             continue
 
-        parser.parse(
-            statement=message.data,
-        )
+        parser.send_messages(message.route_updates)
+
+    parser.close()
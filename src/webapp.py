@@ -12,13 +12,32 @@ Author:
 '''
 from src.controllers.message_replay import message_replay_router
 from src.controllers.mrt_library import mrt_library_router
+from src.adapters.rabbitmq import close_rabbitmq_publisher
+from src.controllers.rabbitmq import rabbitmq_router
 from src.controllers.version import version_router
+from src.adapters.mongodb import close_mongodb_client
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn, os
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    '''
+    Lifespan of the web application, the shared MongoDB client and RabbitMQ publisher are closed on shutdown.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    yield
+
+    close_rabbitmq_publisher()
+    close_mongodb_client()
+
+app = FastAPI(
+    lifespan=lifespan,
+)
 
 app.include_router(
     router=message_replay_router,
@@ -28,6 +47,10 @@ app.include_router(
     router=mrt_library_router,
     prefix='/api/mrt-library',
 )
+app.include_router(
+    router=rabbitmq_router,
+    prefix='/api/rabbitmq',
+)
 app.include_router(
     router=version_router,
     prefix='/api/version',
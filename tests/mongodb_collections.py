@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from pymongo import InsertOne, ReplaceOne, UpdateOne, DeleteOne
+from bson import ObjectId
+import copy
+
+def _get_field(document: dict, field: str):
+    for key in field.split('.'):
+        if not isinstance(document, dict) or key not in document:
+            return None
+
+        document = document[key]
+
+    return document
+
+def _evaluate(document: dict, expression):
+    # The aggregation expressions used by the update pipelines of the adapters and services
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _get_field(document, expression[1:])
+
+    if isinstance(expression, dict) and len(expression) == 1 and next(iter(expression)).startswith('$'):
+        operator, arguments = next(iter(expression.items()))
+
+        if operator == '$literal':
+            return arguments
+
+        values = [_evaluate(document, argument) for argument in arguments]
+
+        if operator == '$add':
+            return sum(values)
+
+        if operator == '$ifNull':
+            return next((value for value in values if value is not None), None)
+
+        if operator == '$max':
+            return max((value for value in values if value is not None), default=None)
+
+        raise NotImplementedError(operator)
+
+    if isinstance(expression, dict):
+        return {key: _evaluate(document, value) for key, value in expression.items()}
+
+    return expression
+
+class FakeCollection:
+    '''
+    In-memory stand-in for the parts of a pymongo collection used by the MongoDB adapters and services.
+    Documents are matched by equality of their (dotted) fields, update pipelines support $set with the expressions used by them.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def __init__(self, database: 'FakeDatabase' = None, name: str = 'storage'):
+        self.database = database
+        self.name = name
+        self.documents: list[dict] = []
+        self.indexes: list = []
+        self.bulk_writes: list[list] = []
+        self.fail_bulk_write: Exception = None
+
+    def _match(self, document: dict, document_filter: dict) -> bool:
+        return all(_get_field(document, field) == value for field, value in document_filter.items())
+
+    def _upsert_document(self, document_filter: dict) -> dict:
+        document = {}
+
+        for field, value in document_filter.items():
+            *parents, key = field.split('.')
+            parent = document
+
+            for parent_key in parents:
+                parent = parent.setdefault(parent_key, {})
+
+            parent[key] = value
+
+        document.setdefault('_id', ObjectId())
+        self.documents.append(document)
+
+        return document
+
+    def find_one(self, document_filter: dict = None) -> dict:
+        return next((copy.deepcopy(document) for document in self.documents if self._match(document, document_filter or {})), None)
+
+    def find(self, document_filter: dict = None) -> 'FakeCursor':
+        return FakeCursor([
+            copy.deepcopy(document)
+                for document in self.documents
+                    if self._match(document, document_filter or {})
+        ])
+
+    def count_documents(self, document_filter: dict) -> int:
+        return len(self.find(document_filter).documents)
+
+    def insert_many(self, documents: list[dict]):
+        for document in documents:
+            self.documents.append({'_id': ObjectId()} | copy.deepcopy(document))
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        if self.fail_bulk_write is not None:
+            raise self.fail_bulk_write
+
+        self.bulk_writes.append(operations)
+
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                self.insert_many([operation._doc])
+                continue
+
+            document = next((document for document in self.documents if self._match(document, operation._filter)), None)
+
+            if isinstance(operation, DeleteOne):
+                if document is not None:
+                    self.documents.remove(document)
+                continue
+
+            if document is None:
+                if not operation._upsert:
+                    continue
+
+                document = self._upsert_document(operation._filter)
+
+            if isinstance(operation, ReplaceOne):
+                document_id = document['_id']
+                document.clear()
+                document.update(copy.deepcopy(operation._doc))
+                document.setdefault('_id', document_id)
+            elif isinstance(operation, UpdateOne):
+                for stage in operation._doc if isinstance(operation._doc, list) else [operation._doc]:
+                    new_values = {field: _evaluate(document, value) for field, value in stage['$set'].items()}
+                    document.update(new_values)
+
+    def index_information(self) -> dict:
+        return {
+            f'index_{number}': {'key': list(index.document['key'].items()), 'unique': index.document.get('unique', False)}
+                for number, index in enumerate(self.indexes)
+        }
+
+    def create_indexes(self, indexes: list) -> list[str]:
+        self.indexes.extend(indexes)
+
+        return [index.document['name'] for index in indexes]
+
+    def drop_index(self, name: str):
+        del self.indexes[int(name.split('_')[1])]
+
+    def drop(self):
+        self.documents = []
+        self.indexes = []
+
+    def rename(self, name: str, dropTarget: bool = False):
+        renamed_collection = getattr(self.database, name)
+        renamed_collection.documents, renamed_collection.indexes = self.documents, self.indexes
+        self.drop()
+
+class FakeCursor:
+    '''
+    In-memory stand-in for a pymongo cursor over the found documents.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    def sort(self, field: str, direction: int = 1) -> 'FakeCursor':
+        self.documents.sort(key=lambda document: _get_field(document, field), reverse=direction < 0)
+
+        return self
+
+    def allow_disk_use(self, allow_disk_use: bool) -> 'FakeCursor':
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+class FakeDatabase:
+    '''
+    In-memory stand-in for a pymongo database, collections are created on first access.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        collection = FakeCollection(self, name)
+        setattr(self, name, collection)
+
+        return collection
+
+class FakeClient(dict):
+    '''
+    In-memory stand-in for a pymongo client, databases are created on first access.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def __missing__(self, name: str) -> FakeDatabase:
+        self[name] = FakeDatabase()
+
+        return self[name]
+
+    def __getattr__(self, name: str) -> FakeDatabase:
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return self[name]
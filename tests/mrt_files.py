@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_record import MrtRecordReader, MrtRecord, MRT_HEADER
+from typing import Iterable
+
+# BGP4MP update file shared by the MRT tests
+MRT_UPDATE_FILE = 'tests/mrt/20241005_1800_1728151200_bgp_lw_ixp_decix_update'
+
+def read_mrt_records(mrt_file: str = MRT_UPDATE_FILE) -> list[MrtRecord]:
+    '''
+    Reads all raw records of an MRT file, the record data is copied so it outlives the reader.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+
+    Returns:
+        list[MrtRecord]: The records in file order.
+    '''
+    return [
+        record._replace(data=memoryview(bytes(record.data)))
+            for record in MrtRecordReader(mrt_file)
+    ]
+
+def pack_mrt_records(records: Iterable[MrtRecord]) -> bytes:
+    '''
+    Serializes raw records to the bytes of an uncompressed MRT file.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        records (Iterable[MrtRecord]): The records.
+
+    Returns:
+        bytes: The MRT file.
+    '''
+    return b''.join([
+        MRT_HEADER.pack(record.timestamp, record.type, record.subtype, len(record.data)) + record.data
+            for record in records
+    ])
+
+def write_mrt_file(mrt_file: str, records: Iterable[MrtRecord]) -> str:
+    '''
+    Writes raw records to an uncompressed MRT file.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+
+    Args:
+        mrt_file (str): Path to the MRT file.
+        records (Iterable[MrtRecord]): The records.
+
+    Returns:
+        str: Path to the MRT file.
+    '''
+    with open(mrt_file, 'wb') as file:
+        file.write(pack_mrt_records(records))
+
+    return mrt_file
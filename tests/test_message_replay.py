@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.services.message_replay import MessageReplayResult, _count_messages
+from src.models.message_replay import MessageReplayPeerCount, MessageReplayIntervalCount
+from src.adapters.mongodb import MongoDBLogLoader
+from datetime import datetime
+from unittest import mock
+import unittest
+
+def _time(minute: int) -> datetime:
+    return datetime(2024, 10, 5, 18, minute)
+
+class MessageReplayCountTests(unittest.TestCase):
+    '''
+    Tests for counting the messages of the log without replaying them.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def setUp(self):
+        self.database_client = mock.MagicMock()
+        self.log_collection = self.database_client.message_log.storage
+
+        patcher = mock.patch('src.adapters.mongodb.get_mongodb_client', return_value=self.database_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _count(self, facets: dict) -> MessageReplayResult:
+        # $facet returns one document with the groups of every facet, also if no message matches
+        self.log_collection.aggregate.return_value = iter([facets])
+
+        return _count_messages(
+            time_start=_time(0),
+            time_end=_time(30),
+            count_interval=15,
+        )
+
+    def test_count_messages(self):
+        '''
+        Test that the groups of the facets are mapped to the counts by change type, by peer and by interval.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        message_replay_result = self._count({
+            'change_type': [
+                {'_id': 1, 'count': 7},
+                {'_id': 2, 'count': 3},
+            ],
+            'peer': [
+                {'_id': {'peer_ip': '80.81.192.157', 'peer_as': 6695, 'change_type': 1}, 'count': 4},
+                {'_id': {'peer_ip': '80.81.192.157', 'peer_as': 6695, 'change_type': 2}, 'count': 1},
+                {'_id': {'peer_ip': '2001:7f8::1a27:5051:c09d', 'peer_as': 6695, 'change_type': 1}, 'count': 3},
+                {'_id': {'peer_ip': '80.81.193.157', 'peer_as': 6695, 'change_type': 2}, 'count': 2},
+            ],
+            'interval': [
+                {'_id': {'timestamp': _time(0), 'change_type': 2}, 'count': 3},
+                {'_id': {'timestamp': _time(0), 'change_type': 1}, 'count': 5},
+                {'_id': {'timestamp': _time(15), 'change_type': 1}, 'count': 2},
+            ],
+        })
+
+        self.assertEqual(
+            first=message_replay_result,
+            second=MessageReplayResult(
+                count_announce=7,
+                count_withdraw=3,
+                count_by_peer=[
+                    MessageReplayPeerCount(peer_ip='80.81.192.157', peer_as=6695, count_announce=4, count_withdraw=1),
+                    MessageReplayPeerCount(peer_ip='2001:7f8::1a27:5051:c09d', peer_as=6695, count_announce=3),
+                    MessageReplayPeerCount(peer_ip='80.81.193.157', peer_as=6695, count_withdraw=2),
+                ],
+                count_by_interval=[
+                    MessageReplayIntervalCount(timestamp=_time(0), count_announce=5, count_withdraw=3),
+                    MessageReplayIntervalCount(timestamp=_time(15), count_announce=2),
+                ],
+            ),
+        )
+
+        # Only the messages of the time range are counted, the intervals are 15 minutes long
+        pipeline = self.log_collection.aggregate.call_args.args[0]
+
+        self.assertEqual(pipeline[0], {'$match': {'timestamp': {'$gte': _time(0), '$lte': _time(30)}}})
+        self.assertEqual(
+            first=pipeline[1]['$facet']['interval'][0]['$group']['_id']['timestamp']['$subtract'][1]['$mod'][1],
+            second=15 * 60000,
+        )
+
+    def test_count_no_messages(self):
+        '''
+        Test that empty facets are mapped to zero counts and no groups.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        self.assertEqual(
+            first=self._count({'change_type': [], 'peer': [], 'interval': []}),
+            second=MessageReplayResult(
+                count_announce=0,
+                count_withdraw=0,
+                count_by_peer=[],
+                count_by_interval=[],
+            ),
+        )
+
+    def test_count_all_messages(self):
+        '''
+        Test that all messages are counted without a time range.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        self.log_collection.aggregate.return_value = iter([{'change_type': [], 'peer': [], 'interval': []}])
+
+        MongoDBLogLoader.count_messages(None, None, 15)
+
+        self.assertEqual(self.log_collection.aggregate.call_args.args[0][0], {'$match': {}})
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.adapters.mongodb import MongoDBStateCache, MongoDBAdapter, MongoDBLogLoader, MONGODB_INDEXES
+from src.parsers.route_update import RouteUpdateParser
+from src.parsers.mrt_decoder import decode_mrt_file
+from src.models.route_update import ChangeType
+from tests.mongodb_collections import FakeClient, FakeCollection
+from tests.mrt_files import MRT_UPDATE_FILE
+from pymongo.errors import PyMongoError
+from pymongo import ASCENDING
+from datetime import datetime
+from unittest import mock
+import unittest
+
+def _time(minute: int) -> datetime:
+    return datetime(2024, 10, 5, 18, minute)
+
+class MongoDBStateCacheTests(unittest.TestCase):
+    '''
+    Tests for keeping the state and statistics of failed writes in the write-behind cache.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def setUp(self):
+        self.state_collection = FakeCollection()
+        self.statistics_collection = FakeCollection()
+        self.state_cache = MongoDBStateCache(
+            state_collection=self.state_collection,
+            statistics_collection=self.statistics_collection,
+            id_schema='object',
+            max_size=4,
+        )
+
+    def _statistics(self) -> dict[tuple[str, int], tuple]:
+        return {
+            (document['nlri']['prefix'], document['nlri']['length']): (document['change_count'], document['current_timestamp'], document['last_timestamp'])
+                for document in self.statistics_collection.find()
+        }
+
+    def test_restore_merges_statistics(self):
+        '''
+        Test that the statistics of a failed write are merged with the changes cached in the meantime.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        prefix = ('10.0.0.0', 8)
+
+        self.state_cache.update_statistics(prefix, _time(1))
+        self.state_cache.update_statistics(prefix, _time(2))
+
+        def fail_bulk_write(operations: list, ordered: bool = True):
+            # A change of the prefix is cached while the statistics are written
+            self.state_cache.update_statistics(prefix, _time(3))
+            raise PyMongoError('connection lost')
+
+        with mock.patch.object(self.statistics_collection, 'bulk_write', side_effect=fail_bulk_write):
+            with self.assertRaises(PyMongoError):
+                self.state_cache.flush()
+
+        self.assertEqual(self.state_cache._statistics[prefix], [3, _time(3), _time(2)])
+
+        self.state_cache.flush()
+        self.state_cache.update_statistics(prefix, _time(4))
+        self.state_cache.flush()
+
+        self.assertEqual(len(self.state_cache), 0)
+        self.assertEqual(self._statistics(), {prefix: (4, _time(4), _time(3))})
+
+    def test_evict_failure(self):
+        '''
+        Test that the prefixes of a failed eviction stay in the cache and are written by the next flush.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        prefixes = [(f'10.{index}.0.0', 16) for index in range(6)]
+
+        for minute, prefix in enumerate(prefixes):
+            self.state_cache.update_statistics(prefix, _time(minute))
+
+        self.statistics_collection.fail_bulk_write = PyMongoError('connection lost')
+
+        with self.assertRaises(PyMongoError):
+            self.state_cache.evict()
+
+        self.assertEqual(list(self.state_cache._statistics), prefixes)
+
+        self.statistics_collection.fail_bulk_write = None
+        self.state_cache.evict()
+
+        # The least recently updated prefixes are written, until three quarters of the maximum size are left
+        self.assertEqual(list(self._statistics()), prefixes[:3])
+        self.assertEqual(list(self.state_cache._statistics), prefixes[3:])
+
+class MongoDBAdapterTests(unittest.TestCase):
+    '''
+    Tests for writing the log, state and statistics of the route update batches.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    @classmethod
+    def setUpClass(cls):
+        route_updates = {}
+
+        # Announcements of distinct prefixes, so every route update is a cached state
+        for record in decode_mrt_file(MRT_UPDATE_FILE, native_decoder=True):
+            for route_update in record.route_updates or []:
+                if route_update.change_type == ChangeType.ANNOUNCE:
+                    route_updates.setdefault((route_update.nlri.prefix, route_update.nlri.length), route_update)
+
+        cls.route_updates = list(route_updates.values())[:10]
+
+    def setUp(self):
+        self.database_client = FakeClient()
+        self.parser = RouteUpdateParser()
+
+        environment = {
+            'MONGO_DB_CACHE_SIZE': '4',
+            'MONGO_DB_CACHE_INTERVAL': '60000',
+            'MONGO_DB_BATCH_INTERVAL': '60000',
+        }
+
+        with mock.patch('src.adapters.mongodb.get_mongodb_client', return_value=self.database_client), mock.patch.dict('os.environ', environment):
+            MongoDBAdapter(
+                parser=self.parser,
+                no_mongodb_log=False,
+                no_mongodb_state=False,
+                no_mongodb_statistics=False,
+                clear_mongodb=False,
+            )
+
+    def tearDown(self):
+        self.database_client['message_state'].storage.fail_bulk_write = None
+        self.database_client['message_statistics'].storage.fail_bulk_write = None
+        self.parser.flush()
+
+    def test_log_written_on_cache_failure(self):
+        '''
+        Test that the log of a batch is written, when writing the full cache fails, and the cache is kept.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        log_collection = self.database_client['message_log'].storage
+        state_collection = self.database_client['message_state'].storage
+        statistics_collection = self.database_client['message_statistics'].storage
+
+        statistics_collection.fail_bulk_write = PyMongoError('connection lost')
+        self.parser.send_messages(self.route_updates)
+
+        with self.assertRaises(PyMongoError):
+            self.parser.flush()
+
+        self.assertEqual(log_collection.count_documents({}), len(self.route_updates))
+        self.assertEqual(statistics_collection.count_documents({}), 0)
+
+        statistics_collection.fail_bulk_write = None
+        self.parser.flush()
+
+        self.assertEqual(log_collection.count_documents({}), len(self.route_updates))
+        self.assertEqual(state_collection.count_documents({}), len(self.route_updates))
+        self.assertEqual(
+            first=sorted(document['change_count'] for document in statistics_collection.find()),
+            second=[1] * len(self.route_updates),
+        )
+
+class MongoDBLogLoaderTests(unittest.TestCase):
+    '''
+    Tests for the queries of the log loader.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def setUp(self):
+        self.database_client = mock.MagicMock()
+        self.log_collection = self.database_client.message_log.storage
+
+        patcher = mock.patch('src.adapters.mongodb.get_mongodb_client', return_value=self.database_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stable_order(self):
+        '''
+        Test that the messages are loaded ordered by timestamp and _id, with and without a snapshot, as indexed.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        replay_sort = [('timestamp', ASCENDING), ('_id', ASCENDING)]
+
+        self.assertIn(replay_sort, MONGODB_INDEXES['message_log'])
+
+        MongoDBLogLoader.load_messages(_time(0), _time(10))
+
+        self.log_collection.find.return_value.sort.assert_called_once_with(replay_sort)
+
+        snapshot_collection = self.database_client.message_log.__getitem__.return_value
+
+        with mock.patch('src.adapters.mongodb.drop_stale_mongodb_snapshots'):
+            MongoDBLogLoader.load_messages(_time(0), _time(10), snapshot=True).close()
+
+        pipeline = self.log_collection.aggregate.call_args.args[0]
+
+        self.assertEqual(pipeline[1], {'$sort': {'timestamp': ASCENDING, '_id': ASCENDING}})
+        self.assertEqual(pipeline[2], {'$out': snapshot_collection.name})
+        snapshot_collection.create_index.assert_called_once_with(replay_sort)
+        snapshot_collection.find.return_value.sort.assert_called_once_with(replay_sort)
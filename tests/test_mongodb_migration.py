@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.services.mongodb_migration import mongodb_migrate_ids
+from src.adapters.mongodb import prefix_id
+from tests.mongodb_collections import FakeClient
+from datetime import datetime
+from unittest import mock
+import unittest
+
+def _time(minute: int) -> datetime:
+    return datetime(2024, 10, 5, 18, minute)
+
+class MongoDBMigrationTests(unittest.TestCase):
+    '''
+    Tests for merging the state and statistics documents when their _id is converted.
+
+    Author:
+        Sebastian Forstner <sef9869@thi.de>
+    '''
+    def setUp(self):
+        self.database_client = FakeClient()
+
+        # Duplicates of the same prefix, e.g. written by concurrent writers before the unique index existed
+        self.database_client['message_statistics'].storage.insert_many([
+            {'nlri': {'prefix': '10.0.0.0', 'length': 8}, 'change_count': 3, 'current_timestamp': _time(2), 'last_timestamp': _time(1)},
+            {'nlri': {'prefix': '10.0.0.0', 'length': 8}, 'change_count': 2, 'current_timestamp': _time(4), 'last_timestamp': _time(3)},
+            {'nlri': {'prefix': '10.1.0.0', 'length': 16}, 'change_count': 4, 'current_timestamp': _time(5), 'last_timestamp': _time(1)},
+            {'nlri': {'prefix': '10.1.0.0', 'length': 16}, 'change_count': 1, 'current_timestamp': _time(3), 'last_timestamp': None},
+            {'nlri': {'prefix': '2001:db8::', 'length': 32}, 'change_count': 7, 'current_timestamp': _time(6), 'last_timestamp': _time(2)},
+        ])
+        self.database_client['message_state'].storage.insert_many([
+            {'nlri': {'prefix': '10.0.0.0', 'length': 8}, 'peer_ip': '192.0.2.1', 'timestamp': _time(2), 'change_type': 'announce'},
+            {'nlri': {'prefix': '10.0.0.0', 'length': 8}, 'peer_ip': '192.0.2.1', 'timestamp': _time(4), 'change_type': 'withdraw'},
+        ])
+
+    def _migrate(self, id_schema: str) -> dict[str, list[dict]]:
+        with mock.patch('src.services.mongodb_migration.get_mongodb_client', return_value=self.database_client):
+            migration_results = mongodb_migrate_ids(id_schema)
+
+        self.assertEqual(
+            first=[(result.database, result.count_documents) for result in migration_results],
+            second=[('message_state', 2), ('message_statistics', 5)],
+        )
+
+        return {
+            database: sorted(self.database_client[database].storage.find(), key=lambda document: document['nlri']['prefix'])
+                for database in ('message_state', 'message_statistics')
+        }
+
+    def _assert_statistics(self, statistics: list[dict]):
+        self.assertEqual(
+            first=[
+                (document['nlri'], document['change_count'], document['current_timestamp'], document['last_timestamp'])
+                    for document in statistics
+            ],
+            second=[
+                ({'prefix': '10.0.0.0', 'length': 8}, 5, _time(4), _time(3)),
+                ({'prefix': '10.1.0.0', 'length': 16}, 5, _time(5), _time(3)),
+                ({'prefix': '2001:db8::', 'length': 32}, 7, _time(6), _time(2)),
+            ],
+        )
+
+    def test_merge_prefix_schema(self):
+        '''
+        Test that duplicate statistics add up their change counts and the latest state is kept with the prefix schema.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        migrated = self._migrate('prefix')
+
+        self._assert_statistics(migrated['message_statistics'])
+        self.assertEqual(
+            first=[document['_id'] for document in migrated['message_statistics']],
+            second=[prefix_id('10.0.0.0', 8), prefix_id('10.1.0.0', 16), prefix_id('2001:db8::', 32)],
+        )
+        self.assertEqual(
+            first=[(document['_id'], document['change_type']) for document in migrated['message_state']],
+            second=[(prefix_id('10.0.0.0', 8), 'withdraw')],
+        )
+
+    def test_merge_object_schema(self):
+        '''
+        Test that duplicate statistics of a prefix add up their change counts with the object schema.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        migrated = self._migrate('object')
+
+        self._assert_statistics(migrated['message_statistics'])
+        self.assertEqual(
+            first=[document['change_type'] for document in migrated['message_state']],
+            second=['withdraw'],
+        )
+
+    def test_repeated_migration(self):
+        '''
+        Test that migrating merged documents again does not change them.
+
+        Author:
+            Sebastian Forstner <sef9869@thi.de>
+        '''
+        self._migrate('prefix')
+
+        with mock.patch('src.services.mongodb_migration.get_mongodb_client', return_value=self.database_client):
+            mongodb_migrate_ids('object')
+
+        self._assert_statistics(
+            sorted(self.database_client['message_statistics'].storage.find(), key=lambda document: document['nlri']['prefix']),
+        )
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_bgp4mp_native import MrtBgp4MpNativeParser
+from src.parsers.mrt_bgp4mp import MrtBgp4MpParser
+from src.parsers.mrt_record import MrtRecordReader
+from mrtparse import Reader
+import unittest
+
+class MrtBgp4MpNativeParserTests(unittest.TestCase):
+    '''
+    Tests for the native MRT BGP4MP parser.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    mrt_file = 'tests/mrt/20241005_1800_1728151200_bgp_lw_ixp_decix_update'
+
+    def test_same_as_mrtparse(self):
+        '''
+        Test that the native parser returns the same route updates as the mrtparse based parser for the whole file.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        mrt_bgp4mp_parser = MrtBgp4MpParser()
+        mrt_bgp4mp_native_parser = MrtBgp4MpNativeParser()
+
+        route_updates = [
+            route_update.to_json()
+                for message in Reader(self.mrt_file)
+                    for route_update in mrt_bgp4mp_parser.parse(
+                        bgp4mp_message=message,
+                    ) or []
+        ]
+        native_route_updates = [
+            route_update.to_json()
+                for record in MrtRecordReader(self.mrt_file)
+                    for route_update in mrt_bgp4mp_native_parser.parse(
+                        bgp4mp_message=record,
+                    ) or []
+        ]
+
+        self.assertEqual(
+            first=len(native_route_updates),
+            second=7811,
+        )
+        self.assertEqual(
+            first=native_route_updates,
+            second=route_updates,
+        )
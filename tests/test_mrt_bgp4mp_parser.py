@@ -38,9 +38,12 @@ class MrtBgp4MpParserTests(unittest.TestCase):
             Benedikt Schwering <bes9584@thi.de>
         '''
         self.assertEqual(
-            first=self.mrt_bgp4mp_parser.parse(
-                bgp4mp_message=self.messages[-1],
-            ),
+            first=[
+                route_update.to_model()
+                    for route_update in self.mrt_bgp4mp_parser.parse(
+                        bgp4mp_message=self.messages[-1],
+                    )
+            ],
             second=[
                 RouteUpdate(
                     timestamp=datetime.fromtimestamp(
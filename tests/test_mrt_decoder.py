@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_decoder import MrtDecodedRecord, decode_mrt_file, decode_mrt_files
+from tests.mrt_files import read_mrt_records, write_mrt_file
+from unittest import mock
+import unittest, tempfile, heapq, os
+
+def _comparable(records: list[MrtDecodedRecord]) -> list[tuple]:
+    return [
+        (record.timestamp, record.type, [route_update.to_json() for route_update in record.route_updates or []])
+            for record in records
+    ]
+
+class MrtDecoderTests(unittest.TestCase):
+    '''
+    Tests for decoding multiple MRT files.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        records = read_mrt_records()
+
+        # Every file covers the whole time range, so the files overlap and share many timestamps
+        self.mrt_files = tuple([
+            write_mrt_file(os.path.join(self.directory.name, f'updates_{index}'), records[index::3])
+                for index in range(3)
+        ])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _sequential_merge(self) -> list[MrtDecodedRecord]:
+        # heapq.merge is stable, records with equal timestamps keep the order of the files
+        return list(
+            heapq.merge(
+                *[decode_mrt_file(mrt_file, native_decoder=True) for mrt_file in self.mrt_files],
+                key=lambda record: record.timestamp,
+            )
+        )
+
+    def test_sequential_same_as_merge(self):
+        '''
+        Test that decoding without workers is the stable merge of the decoded files.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self.assertEqual(
+            first=_comparable(list(decode_mrt_files(self.mrt_files, native_decoder=True))),
+            second=_comparable(self._sequential_merge()),
+        )
+
+    def test_workers_same_as_merge(self):
+        '''
+        Test that decoding with workers gives the same records in the same order, also with chunked files.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        expected = _comparable(self._sequential_merge())
+
+        self.assertEqual(
+            first=_comparable(list(decode_mrt_files(self.mrt_files, native_decoder=True, workers=2))),
+            second=expected,
+        )
+
+        # Small chunks split every file into several chunks, which are decoded ahead and reassembled
+        with mock.patch('src.parsers.mrt_decoder.MRT_CHUNK_SIZE', 50000):
+            self.assertEqual(
+                first=_comparable(list(decode_mrt_files(self.mrt_files, native_decoder=True, workers=2))),
+                second=expected,
+            )
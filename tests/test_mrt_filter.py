@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_filter import MrtRecordFilter, MRT_TYPE_TABLE_DUMP_V2, TD_V2_PEER_INDEX_TABLE
+from src.parsers.mrt_decoder import MrtDecodedRecord, decode_mrt_file, decode_rib_file
+from src.parsers.mrt_record import MrtRecord, MRT_HEADER
+from src.models.route_update import RouteUpdateRecord
+from tests.mrt_files import MRT_UPDATE_FILE
+from typing import Callable, Iterable
+import unittest, tempfile, ipaddress, struct, os
+
+# Peers of the TABLE_DUMP_V2 file, every route of a peer has an AS path starting with its AS
+RIB_PEERS = (('192.0.2.1', 64500), ('192.0.2.2', 64501), ('2001:db8::1', 64502), ('192.0.2.3', 4200000000))
+
+# Prefixes of the TABLE_DUMP_V2 file with the indexes of the peers having a route to them
+RIB_ROUTES = (
+    ('10.0.0.0/8', (0, 1, 2, 3)),
+    ('10.1.0.0/16', (1, 3)),
+    ('10.1.2.0/24', (0, 2)),
+    ('192.168.0.0/16', (0, 1)),
+    ('2001:db8::/32', (2, 3)),
+    ('2001:db8:1::/48', (0, 1, 2)),
+    ('2001:db8:1:2::/64', (3,)),
+)
+
+RIB_TIMESTAMP = 1728151200
+
+def _pack_mrt_record(subtype: int, data: bytes) -> bytes:
+    return MRT_HEADER.pack(RIB_TIMESTAMP, MRT_TYPE_TABLE_DUMP_V2, subtype, len(data)) + data
+
+def _pack_peer_index_table() -> bytes:
+    view_name = b'test'
+    data = ipaddress.ip_address('192.0.2.254').packed + struct.pack('>H', len(view_name)) + view_name
+    data += struct.pack('>H', len(RIB_PEERS))
+
+    for peer_ip, peer_as in RIB_PEERS:
+        address = ipaddress.ip_address(peer_ip)
+
+        # Peer type with the address family and 4 byte AS numbers
+        data += bytes([0x02 | (address.version == 6)]) + ipaddress.ip_address('192.0.2.254').packed
+        data += address.packed + struct.pack('>I', peer_as)
+
+    return _pack_mrt_record(TD_V2_PEER_INDEX_TABLE, data)
+
+def _pack_rib_entry(peer_index: int, origin_as: int) -> bytes:
+    peer_as = RIB_PEERS[peer_index][1]
+    as_path = struct.pack('>BB3I', 2, 3, peer_as, 64496 + peer_index, origin_as)
+
+    # ORIGIN and AS_PATH attributes
+    path_attributes = bytes([0x40, 1, 1, 0]) + bytes([0x40, 2, len(as_path)]) + as_path
+
+    return struct.pack('>HIH', peer_index, RIB_TIMESTAMP, len(path_attributes)) + path_attributes
+
+def _pack_rib_record(sequence: int, prefix: str, peer_indexes: tuple[int, ...]) -> bytes:
+    network = ipaddress.ip_network(prefix)
+    data = struct.pack('>IB', sequence, network.prefixlen) + network.network_address.packed[:(network.prefixlen + 7) // 8]
+    data += struct.pack('>H', len(peer_indexes))
+    data += b''.join([_pack_rib_entry(peer_index, 65000 + sequence) for peer_index in peer_indexes])
+
+    # RIB_IPV4_UNICAST or RIB_IPV6_UNICAST
+    return _pack_mrt_record(2 if network.version == 4 else 4, data)
+
+def _route_updates(records: Iterable[MrtDecodedRecord]) -> list[str]:
+    return [
+        route_update.to_json()
+            for record in records
+                for route_update in record.route_updates or []
+    ]
+
+def _within(route_update: RouteUpdateRecord, prefixes: tuple[str, ...]) -> bool:
+    network = ipaddress.ip_network(f'{route_update.nlri.prefix}/{route_update.nlri.length}')
+
+    return any(
+        network.version == within.version and network.subnet_of(within)
+            for within in map(ipaddress.ip_network, prefixes)
+    )
+
+class MrtFilterTests(unittest.TestCase):
+    '''
+    Tests for filtering raw MRT records before decoding, compared to filtering the decoded route updates.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.rib_file = os.path.join(self.directory.name, 'rib')
+
+        with open(self.rib_file, 'wb') as file:
+            file.write(_pack_peer_index_table())
+
+            for sequence, (prefix, peer_indexes) in enumerate(RIB_ROUTES):
+                file.write(_pack_rib_record(sequence, prefix, peer_indexes))
+
+        self.updates = list(decode_mrt_file(MRT_UPDATE_FILE, native_decoder=True))
+        self.rib = list(decode_rib_file(self.rib_file))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _assert_updates(self, record_filter: MrtRecordFilter, match: Callable[[RouteUpdateRecord], bool]):
+        self.assertEqual(
+            first=_route_updates(decode_mrt_file(MRT_UPDATE_FILE, native_decoder=True, record_filter=record_filter)),
+            second=[
+                route_update.to_json()
+                    for record in self.updates
+                        for route_update in record.route_updates or []
+                            if match(route_update)
+            ],
+        )
+
+    def _assert_rib(self, record_filter: MrtRecordFilter, match: Callable[[RouteUpdateRecord], bool], offset: int = 0):
+        self.assertEqual(
+            first=_route_updates(decode_rib_file(self.rib_file, offset=offset, record_filter=record_filter)),
+            second=[
+                route_update.to_json()
+                    for record in self.rib
+                        for route_update in record.route_updates or []
+                            if match(route_update)
+            ],
+        )
+
+    def test_bgp4mp(self):
+        '''
+        Test the peer, peer AS, prefix and message type filters on BGP4MP records.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        peers = ('80.81.193.157', '2001:7f8::1a27:5051:c09d')
+        prefixes = ('102.0.0.0/8', '2607:f6f0::/32')
+
+        self.assertGreater(len(_route_updates(self.updates)), 0)
+        self._assert_updates(
+            record_filter=MrtRecordFilter(peers=peers),
+            match=lambda route_update: route_update.peer_ip in peers,
+        )
+        self._assert_updates(
+            record_filter=MrtRecordFilter(peer_as=(6695,)),
+            match=lambda route_update: route_update.peer_as == 6695,
+        )
+        self._assert_updates(
+            record_filter=MrtRecordFilter(peer_as=(64500,)),
+            match=lambda route_update: False,
+        )
+        self._assert_updates(
+            record_filter=MrtRecordFilter(prefixes=prefixes),
+            match=lambda route_update: _within(route_update, prefixes),
+        )
+        self._assert_updates(
+            record_filter=MrtRecordFilter(peers=peers, prefixes=prefixes),
+            match=lambda route_update: route_update.peer_ip in peers and _within(route_update, prefixes),
+        )
+        self._assert_updates(
+            record_filter=MrtRecordFilter(message_types=('BGP4MP_MESSAGE_AS4',)),
+            match=lambda route_update: True,
+        )
+        self._assert_updates(
+            record_filter=MrtRecordFilter(message_types=('BGP4MP_MESSAGE', 'RIB_IPV4_UNICAST')),
+            match=lambda route_update: False,
+        )
+
+    def test_table_dump_v2(self):
+        '''
+        Test the peer, peer AS, prefix and message type filters on TABLE_DUMP_V2 records.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        prefixes = ('10.1.0.0/16', '2001:db8:1::/48')
+
+        def peer_as(route_update: RouteUpdateRecord) -> int:
+            return route_update.path_attributes.as_path[0].value[0]
+
+        self.assertEqual(
+            first=len(_route_updates(self.rib)),
+            second=sum(len(peer_indexes) for _, peer_indexes in RIB_ROUTES),
+        )
+        self._assert_rib(
+            record_filter=MrtRecordFilter(peers=('192.0.2.1', '2001:db8::1')),
+            match=lambda route_update: peer_as(route_update) in (64500, 64502),
+        )
+        self._assert_rib(
+            record_filter=MrtRecordFilter(peer_as=(64501, 4200000000)),
+            match=lambda route_update: peer_as(route_update) in (64501, 4200000000),
+        )
+        self._assert_rib(
+            record_filter=MrtRecordFilter(peers=('192.0.2.1', '192.0.2.2'), peer_as=(64501, 64502)),
+            match=lambda route_update: peer_as(route_update) == 64501,
+        )
+        self._assert_rib(
+            record_filter=MrtRecordFilter(prefixes=prefixes),
+            match=lambda route_update: _within(route_update, prefixes),
+        )
+        self._assert_rib(
+            record_filter=MrtRecordFilter(message_types=('RIB_IPV6_UNICAST',)),
+            match=lambda route_update: ':' in route_update.nlri.prefix,
+        )
+        self._assert_rib(
+            record_filter=MrtRecordFilter(message_types=('BGP4MP_MESSAGE_AS4',)),
+            match=lambda route_update: False,
+        )
+
+    def test_table_dump_v2_chunk(self):
+        '''
+        Test that a chunk of a RIB file without the peer index table is filtered by the peers of the table.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self._assert_rib(
+            record_filter=MrtRecordFilter(peer_as=(64502,)),
+            match=lambda route_update: route_update.path_attributes.as_path[0].value[0] == 64502,
+            offset=len(_pack_peer_index_table()),
+        )
+
+    def test_rib_entries(self):
+        '''
+        Test that the RIB entries of other peers are removed from the raw records through the peer index table.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        def record(data: bytes) -> MrtRecord:
+            timestamp, type, subtype, length = MRT_HEADER.unpack_from(data)
+
+            return MrtRecord(0, timestamp, type, subtype, memoryview(data[MRT_HEADER.size:]))
+
+        record_filter = MrtRecordFilter(peers=('192.0.2.2', '192.0.2.3'))
+        peer_index_table = record(_pack_peer_index_table())
+
+        self.assertIs(record_filter.filter_record(peer_index_table), peer_index_table)
+        self.assertEqual(record_filter.peer_indexes, {1, 3})
+
+        for sequence, (prefix, peer_indexes) in enumerate(RIB_ROUTES):
+            filtered_record = record_filter.filter_record(record(_pack_rib_record(sequence, prefix, peer_indexes)))
+            matching_indexes = tuple(peer_index for peer_index in peer_indexes if peer_index in (1, 3))
+
+            if not matching_indexes:
+                self.assertIsNone(filtered_record)
+                continue
+
+            self.assertEqual(
+                first=bytes(filtered_record.data),
+                second=bytes(record(_pack_rib_record(sequence, prefix, matching_indexes)).data),
+            )
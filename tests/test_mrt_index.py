@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_record import MrtRecordReader, MrtDecompressor, MrtChunk, _bz2_block_ranges, _decompress_bz2_block
+from src.parsers.mrt_index import MrtIndex, MRT_INDEX_SUFFIX, MRT_INDEX_HEADER, get_mrt_index, find_mrt_chunk
+from tests.mrt_files import read_mrt_records, pack_mrt_records
+from unittest import mock
+import unittest, tempfile, gzip, bz2, os
+
+def _comparable(records) -> list[tuple]:
+    return [
+        (record.offset, record.timestamp, record.type, record.subtype, bytes(record.data))
+            for record in records
+    ]
+
+class MrtIndexTests(unittest.TestCase):
+    '''
+    Tests for the MRT index, the bz2 block checkpoints and the seeking in compressed MRT files.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = read_mrt_records()
+        self.data = pack_mrt_records(self.records)
+
+        self.plain_file = self._write('updates', self.data)
+        # Blocks of 100 kB, so the fixture is split into several blocks of a single stream
+        self.bz2_file = self._write('updates.bz2', bz2.compress(self.data, 1))
+        # One gzip member per 1000 records
+        self.gzip_file = self._write('updates.gz', b''.join([
+            gzip.compress(pack_mrt_records(self.records[index:index + 1000]))
+                for index in range(0, len(self.records), 1000)
+        ]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        return path
+
+    def test_bz2_blocks(self):
+        '''
+        Test that the bz2 blocks found at bit level decompress on their own to the whole file.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        with open(self.bz2_file, 'rb') as file:
+            data = file.read()
+
+        block_ranges = list(_bz2_block_ranges(data, 32))
+        blocks = [_decompress_bz2_block(data, start, end) for start, end in block_ranges]
+
+        self.assertGreater(len(block_ranges), 1)
+        # The blocks after the first one are not byte aligned
+        self.assertTrue(any(start % 8 for start, _ in block_ranges))
+        self.assertTrue(all(complete for _, complete in blocks))
+        self.assertEqual(
+            first=b''.join([block for block, _ in blocks]),
+            second=self.data,
+        )
+
+    def test_bz2_false_magic(self):
+        '''
+        Test that a block split at a false block magic is joined with the following block.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        def split_first_block(data: bytes, start_bit: int):
+            block_ranges = list(_bz2_block_ranges(data, start_bit))
+            start, end = block_ranges[0]
+
+            # Same as a block magic within the compressed data of the first block
+            return [(start, start + 4099), (start + 4099, end)] + block_ranges[1:]
+
+        for threads in (None, 3):
+            with mock.patch('src.parsers.mrt_record._bz2_block_ranges', split_first_block):
+                with MrtDecompressor(self.bz2_file, threads=threads) as file:
+                    self.assertEqual(
+                        first=file.read(),
+                        second=self.data,
+                    )
+
+    def test_checkpoints(self):
+        '''
+        Test that the index holds a checkpoint per bz2 block and per gzip member.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        with open(self.bz2_file, 'rb') as file:
+            bz2_blocks = len(list(_bz2_block_ranges(file.read(), 32)))
+
+        self.assertEqual(
+            first=len(MrtIndex.build(self.bz2_file).checkpoints),
+            second=bz2_blocks,
+        )
+        self.assertEqual(
+            first=len(MrtIndex.build(self.gzip_file).checkpoints),
+            second=-(-len(self.records) // 1000),
+        )
+        self.assertEqual(
+            first=MrtIndex.build(self.plain_file).checkpoints,
+            second=[],
+        )
+
+    def test_index_file(self):
+        '''
+        Test that the cached index is read back unchanged and rejected when it does not match.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        mrt_index = get_mrt_index(self.bz2_file)
+        index_file = self.bz2_file + MRT_INDEX_SUFFIX
+        cached_index = MrtIndex.read(self.bz2_file, index_file)
+
+        self.assertTrue(os.path.exists(index_file))
+        self.assertEqual(len(cached_index), len(self.records))
+        self.assertEqual(cached_index.size, len(self.data))
+        self.assertEqual(cached_index.peers, mrt_index.peers)
+        self.assertEqual(cached_index.checkpoints, mrt_index.checkpoints)
+
+        for name, _ in MrtIndex.COLUMNS:
+            self.assertEqual(getattr(cached_index, name), getattr(mrt_index, name))
+
+        with open(index_file, 'rb') as file:
+            data = bytearray(file.read())
+
+        # Index of another version
+        data[4] += 1
+        self._write('other' + MRT_INDEX_SUFFIX, data)
+        self.assertIsNone(MrtIndex.read(self.bz2_file, os.path.join(self.directory.name, 'other' + MRT_INDEX_SUFFIX)))
+
+        # Truncated index
+        self._write('other' + MRT_INDEX_SUFFIX, data[:MRT_INDEX_HEADER.size - 1])
+        self.assertIsNone(MrtIndex.read(self.bz2_file, os.path.join(self.directory.name, 'other' + MRT_INDEX_SUFFIX)))
+
+        # Changed MRT file
+        os.utime(self.bz2_file, ns=(0, 0))
+        self.assertIsNone(MrtIndex.read(self.bz2_file, index_file))
+
+    def test_time_window(self):
+        '''
+        Test that the records of a time window are read from the closest checkpoint, same as the filtered records.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        start_timestamp = self.records[len(self.records) // 2].timestamp
+        end_timestamp = self.records[len(self.records) * 3 // 4].timestamp
+        expected = _comparable(
+            record
+                for record in self.records
+                    if start_timestamp <= record.timestamp <= end_timestamp
+        )
+
+        for mrt_file in (self.plain_file, self.bz2_file, self.gzip_file):
+            chunk = find_mrt_chunk(mrt_file, start_timestamp, end_timestamp)
+
+            for threads in (None, 3):
+                self.assertEqual(
+                    first=_comparable(MrtRecordReader(chunk.mrt_file, chunk.offset, chunk.length, chunk.checkpoints, threads)),
+                    second=expected,
+                )
+
+            # The decompression starts at a checkpoint within the file
+            if mrt_file != self.plain_file:
+                with MrtDecompressor(mrt_file, chunk.offset, chunk.length, chunk.checkpoints) as file:
+                    file.read(1)
+
+                    self.assertGreater(file.checkpoints[0].offset, 0)
+
+    def test_split_chunk(self):
+        '''
+        Test that the chunks split on the index read the same records as the whole file.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        for mrt_file in (self.plain_file, self.bz2_file, self.gzip_file):
+            mrt_index = get_mrt_index(mrt_file)
+            chunks = mrt_index.split_chunk(MrtChunk(mrt_file), 4)
+
+            self.assertEqual(len(chunks), 4)
+            self.assertEqual(
+                first=_comparable(
+                    record
+                        for chunk in chunks
+                            for record in MrtRecordReader(chunk.mrt_file, chunk.offset, chunk.length, chunk.checkpoints)
+                ),
+                second=_comparable(self.records),
+            )
+
+    def test_split_single_member_gzip(self):
+        '''
+        Test that a gzip file with a single member is not split on the index, it has no checkpoints to seek to.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        gzip_file = self._write('single.gz', gzip.compress(self.data))
+
+        self.assertIsNone(get_mrt_index(gzip_file).split_chunk(MrtChunk(gzip_file), 4))
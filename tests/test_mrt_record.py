@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_record import MrtDecompressor, MrtPipeline, MrtCheckpoint, open_mrt_file
+from tests.mrt_files import read_mrt_records, pack_mrt_records
+import unittest, tempfile, gzip, bz2, io, os
+
+class _FailingSource(io.RawIOBase):
+    # Stream that fails after its first block, like a corrupt compressed file
+    def __init__(self):
+        super().__init__()
+
+        self.checkpoints = []
+        self.reads = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return 0
+
+    def readinto(self, buffer) -> int:
+        self.reads += 1
+
+        if self.reads > 1:
+            raise OSError('Invalid data stream')
+
+        buffer[:4] = b'data'
+
+        return 4
+
+class MrtRecordTests(unittest.TestCase):
+    '''
+    Tests for the parallel decompression and the read ahead pipeline of compressed MRT files.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        records = read_mrt_records()
+        groups = [pack_mrt_records(records[index:index + 1000]) for index in range(0, len(records), 1000)]
+        self.data = b''.join(groups)
+        self.streams = len(groups)
+
+        # A single stream of several blocks and several streams of several blocks
+        self.bz2_files = (
+            self._write('updates.bz2', bz2.compress(self.data, 1)),
+            self._write('updates_streams.bz2', b''.join([bz2.compress(group, 1) for group in groups])),
+        )
+        self.gzip_file = self._write('updates.gz', b''.join([gzip.compress(group) for group in groups]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        return path
+
+    def _decompress(self, mrt_file: str, checkpoints: tuple[MrtCheckpoint, ...] = (), threads: int = None) -> tuple[bytes, list[MrtCheckpoint]]:
+        with MrtDecompressor(mrt_file, checkpoints=checkpoints, threads=threads) as file:
+            return file.read(), file.checkpoints
+
+    def test_parallel_bz2(self):
+        '''
+        Test that bz2 blocks decompressed by several threads give the same stream and checkpoints as a single thread.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        for bz2_file in self.bz2_files:
+            data, checkpoints = self._decompress(bz2_file)
+
+            self.assertEqual(data, self.data)
+            self.assertGreater(len(checkpoints), 1)
+            self.assertEqual(
+                first=self._decompress(bz2_file, threads=3),
+                second=(data, checkpoints),
+            )
+
+    def test_parallel_gzip(self):
+        '''
+        Test that gzip members decompressed by several threads give the same stream and checkpoints as a single thread.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        data, checkpoints = self._decompress(self.gzip_file)
+
+        self.assertEqual(data, self.data)
+        self.assertEqual(len(checkpoints), self.streams)
+
+        # The members are only known from the checkpoints of a previous read
+        self.assertEqual(
+            first=self._decompress(self.gzip_file, checkpoints=tuple(checkpoints), threads=3),
+            second=(data, checkpoints),
+        )
+
+        # A checkpoint within a member is no member, the rest of the file is decompressed by the reader
+        false_checkpoints = tuple(checkpoints) + (MrtCheckpoint(checkpoints[2].compressed_offset + 100, 0),)
+
+        self.assertEqual(
+            first=self._decompress(self.gzip_file, checkpoints=false_checkpoints, threads=3),
+            second=(data, checkpoints),
+        )
+
+    def test_pipeline(self):
+        '''
+        Test that the pipelined file reads the same bytes as the decompressed file, also with small reads.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        for mrt_file in self.bz2_files + (self.gzip_file,):
+            for threads in (None, 3):
+                with MrtPipeline(MrtDecompressor(mrt_file, threads=threads)) as file:
+                    self.assertEqual(file.read(), self.data)
+
+                with open_mrt_file(mrt_file, decompression_threads=threads) as file:
+                    blocks = iter(lambda: file.read(4099), b'')
+
+                    self.assertEqual(b''.join(blocks), self.data)
+
+    def test_pipeline_error(self):
+        '''
+        Test that an error of the background thread is raised in the reader after the blocks read before it.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        source = _FailingSource()
+
+        with MrtPipeline(source) as file:
+            self.assertEqual(file.read(4), b'data')
+
+            with self.assertRaises(OSError):
+                file.read(4)
+
+        self.assertTrue(source.closed)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.services.playback import PlaybackScheduler
+from datetime import datetime, timedelta
+from unittest import mock
+import unittest
+
+def _time(seconds: float) -> datetime:
+    return datetime(2024, 10, 5, 18, 0) + timedelta(seconds=seconds)
+
+class _Clock:
+    # Monotonic clock that only advances by sleeping or by the work of the test
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class PlaybackSchedulerTests(unittest.TestCase):
+    '''
+    Tests for pacing the playback on the virtual clock.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def setUp(self):
+        self.clock = _Clock()
+
+        for name in ('monotonic', 'sleep'):
+            patcher = mock.patch(f'src.services.playback.time.{name}', getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _play(self, playback_scheduler: PlaybackScheduler, records: list[tuple[float, str]], work: dict[str, float] = None) -> list[tuple[float, list[str]]]:
+        # Records are (seconds, name), the work is the time taken to process the batch of a record
+        dispatched = []
+
+        for batch in playback_scheduler.play(records, timestamp=lambda record: _time(record[0])):
+            dispatched.append((self.clock.now - 1000.0, [name for _, name in batch]))
+            self.clock.now += max((work or {}).get(name, 0.0) for _, name in batch)
+
+        return dispatched
+
+    def test_virtual_clock(self):
+        '''
+        Test that the records are dispatched at their offset to the first record divided by the playback speed.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        playback_scheduler = PlaybackScheduler(
+            playback_speed=2,
+        )
+
+        self.assertEqual(
+            first=self._play(playback_scheduler, [(0, 'a'), (10, 'b'), (30, 'c'), (31, 'd')], work={'b': 1.5}),
+            second=[(0, ['a']), (5, ['b']), (15, ['c']), (15.5, ['d'])],
+        )
+        # The work on a record is not added to the following waits, so the playback does not drift
+        self.assertEqual(self.clock.sleeps, [5, 8.5, 0.5])
+        self.assertEqual(playback_scheduler.lag_max, 0)
+
+    def test_catch_up(self):
+        '''
+        Test that late records are dispatched at once until the playback has caught up, and that their lag is measured.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        playback_scheduler = PlaybackScheduler(
+            playback_speed=1,
+        )
+
+        self.assertEqual(
+            first=self._play(playback_scheduler, [(0, 'a'), (2, 'b'), (4, 'c'), (6, 'd'), (20, 'e')], work={'a': 5}),
+            second=[(0, ['a']), (5, ['b']), (5, ['c']), (6, ['d']), (20, ['e'])],
+        )
+        self.assertEqual(self.clock.sleeps, [1, 14])
+        self.assertEqual(playback_scheduler.lag_max, 3)
+        self.assertEqual(playback_scheduler.lag_mean, (3 + 1) / 5)
+        self.assertEqual(playback_scheduler.count_dispatched, 5)
+
+    def test_same_timestamp(self):
+        '''
+        Test that consecutive records with the same timestamp are dispatched as one batch.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        playback_scheduler = PlaybackScheduler(
+            playback_speed=1,
+        )
+
+        self.assertEqual(
+            first=self._play(playback_scheduler, [(0, 'a'), (0, 'b'), (3, 'c'), (3, 'd'), (3, 'e'), (4, 'f')]),
+            second=[(0, ['a', 'b']), (3, ['c', 'd', 'e']), (4, ['f'])],
+        )
+        self.assertEqual(playback_scheduler.count_dispatched, 3)
+
+    def test_without_speed(self):
+        '''
+        Test that without a playback speed the batches are dispatched without waiting.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        playback_scheduler = PlaybackScheduler()
+
+        self.assertEqual(
+            first=self._play(playback_scheduler, [(0, 'a'), (60, 'b'), (60, 'c')]),
+            second=[(0, ['a']), (0, ['b', 'c'])],
+        )
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(playback_scheduler.lag_mean, 0)
+
+    def test_pause(self):
+        '''
+        Test that the playback pauses after each interval and that the pause is not part of the virtual time.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        calls = []
+
+        def pause(prompt: str):
+            calls.append('input')
+            # The user continues after 100 seconds
+            self.clock.now += 100
+
+        playback_scheduler = PlaybackScheduler(
+            playback_speed=1,
+            playback_interval=1,
+            on_pause=lambda: calls.append('on_pause'),
+        )
+
+        with mock.patch('builtins.input', pause):
+            dispatched = self._play(playback_scheduler, [(0, 'a'), (30, 'b'), (60, 'c'), (90, 'd'), (150, 'e')])
+
+        self.assertEqual(
+            first=dispatched,
+            second=[(0, ['a']), (30, ['b']), (60, ['c']), (190, ['d']), (350, ['e'])],
+        )
+        # The buffered route updates are delivered before each pause
+        self.assertEqual(calls, ['on_pause', 'input', 'on_pause', 'input'])
+        self.assertEqual(playback_scheduler.lag_max, 0)
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.adapters.rabbitmq import RABBITMQ_CONTENT_TYPES, _GroupedWindow, _EncodingCache, _msgpack_array_header, encode_route_update, encode_route_updates, decode_route_updates, get_topic_routing_key
+from src.models.route_update import RouteUpdateRecord, PathAttributesRecord, AsPathRecord, AsPathType, NLRIRecord, ChangeType
+from src.parsers.mrt_decoder import decode_mrt_file
+from tests.mrt_files import MRT_UPDATE_FILE
+from datetime import datetime, timedelta
+from unittest import mock
+import unittest, itertools, zlib, json, pika
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Sizes of the batches, with msgpack the headers of a fixarray, an array16 and an array32 are used
+BATCH_SIZES = (3, 20, 70000)
+
+class RabbitMQEncodingTests(unittest.TestCase):
+    '''
+    Tests for encoding the published route updates and decoding them as consumer.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    @classmethod
+    def setUpClass(cls):
+        route_updates = [
+            route_update
+                for record in decode_mrt_file(MRT_UPDATE_FILE, native_decoder=True)
+                    for route_update in record.route_updates or []
+        ]
+
+        # The route updates of the fixture are repeated for the largest batch
+        cls.route_updates = list(itertools.islice(itertools.cycle(route_updates), max(BATCH_SIZES)))
+        cls.route_update_dicts = [route_update.to_dict(mode='json') for route_update in route_updates]
+
+    def _expected(self, size: int) -> list[dict]:
+        return list(itertools.islice(itertools.cycle(self.route_update_dicts), size))
+
+    def _assert_round_trip(self, encoding: str):
+        encoding_cache = _EncodingCache(encoding)
+
+        for size, compression in itertools.product(BATCH_SIZES, (0, 6)):
+            with self.subTest(size=size, compression=compression):
+                messages = self.route_updates[:size]
+                body = encode_route_updates(messages, encoding)
+
+                # Encodings of the cache are the same as the encodings of the route updates
+                self.assertEqual(encode_route_updates(messages, encoding, encoding_cache.encode), body)
+
+                if compression:
+                    body = zlib.compress(body, compression)
+
+                properties = pika.BasicProperties(
+                    content_type=RABBITMQ_CONTENT_TYPES[encoding],
+                    content_encoding='deflate' if compression else None,
+                )
+
+                self.assertEqual(decode_route_updates(body, properties), self._expected(size))
+
+        # Messages of the direct queue without batching hold a single route update
+        properties = pika.BasicProperties(
+            content_type=RABBITMQ_CONTENT_TYPES[encoding],
+        )
+
+        self.assertEqual(
+            first=decode_route_updates(encode_route_update(self.route_updates[0], encoding), properties),
+            second=self._expected(1),
+        )
+
+    def test_json(self):
+        '''
+        Test that JSON lists of route updates are decoded to the dumped RouteUpdate models, with and without compression.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self._assert_round_trip('json')
+
+        # Messages without content type are JSON
+        self.assertEqual(
+            first=decode_route_updates(encode_route_updates(self.route_updates[:3])),
+            second=self._expected(3),
+        )
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        '''
+        Test that msgpack arrays of route updates are decoded to the dumped RouteUpdate models, with and without compression.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self._assert_round_trip('msgpack')
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_array_header(self):
+        '''
+        Test that the array headers are the same as the headers packed by msgpack at the limits of their sizes.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        for length in (0, 1, 15, 16, (1 << 16) - 1, 1 << 16, 1 << 20):
+            with self.subTest(length=length):
+                packed = msgpack.packb([None] * length)
+                header = _msgpack_array_header(length)
+
+                self.assertEqual(header, packed[:len(header)])
+                self.assertEqual(len(packed), len(header) + length)
+
+class _Publisher:
+    # Publisher that keeps the published messages instead of sending them to the broker
+    def __init__(self):
+        self.messages: list[tuple[dict, list[dict]]] = []
+
+    def publish(self, routing_key: str, body: bytes, properties: dict):
+        self.messages.append((properties['headers'], json.loads(body)))
+
+class RabbitMQGroupedTests(unittest.TestCase):
+    '''
+    Tests for closing the intervals of the grouped queue.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cls.route_update = next(
+            route_update
+                for record in decode_mrt_file(MRT_UPDATE_FILE, native_decoder=True)
+                    for route_update in record.route_updates or []
+        )
+
+    def setUp(self):
+        self.publisher = _Publisher()
+        self.now = 1000.0
+
+        # The timers are started by the tests, the monotonic clock only advances by the tests
+        self.timer = mock.patch('src.adapters.rabbitmq.threading.Timer').start()
+        mock.patch('src.adapters.rabbitmq.time.monotonic', lambda: self.now).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _add(self, grouped_window: _GroupedWindow, seconds: list[int]):
+        grouped_window.add([
+            self.route_update._replace(timestamp=datetime(2024, 10, 5, 18, 0) + timedelta(seconds=second))
+                for second in seconds
+        ])
+
+    def _published(self) -> list[tuple[str, int, bool, int]]:
+        return [
+            (headers['interval_stop'], headers['part'], headers['last'], len(route_updates))
+                for headers, route_updates in self.publisher.messages
+        ]
+
+    def test_playback_stall(self):
+        '''
+        Test that a stalled or paused playback does not close an interval before a route update of a later interval.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        grouped_window = _GroupedWindow(
+            publisher=self.publisher,
+            queue_interval=1,
+        )
+
+        self._add(grouped_window, [0, 30])
+        self._add(grouped_window, [57])
+
+        # The playback stalls before the last route update of the interval, no timer may close it meanwhile
+        self.now += 1.5
+        self.timer.assert_not_called()
+
+        self._add(grouped_window, [58])
+        self._add(grouped_window, [59, 75])
+        grouped_window.close()
+
+        self.assertEqual(
+            first=self._published(),
+            second=[
+                ('2024-10-05T18:00:59', 0, True, 4),
+                ('2024-10-05T18:01:59', 0, True, 2),
+            ],
+        )
+
+    def test_live_feed_timer(self):
+        '''
+        Test that a quiet live feed is closed by the timer once the wall-clock time has passed the end of the interval.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        grouped_window = _GroupedWindow(
+            publisher=self.publisher,
+            queue_interval=1,
+            live_feed=True,
+        )
+
+        self._add(grouped_window, [0, 50])
+
+        self.assertEqual(self.timer.call_args.kwargs['interval'], 9)
+
+        # A timer firing early is scheduled again for the rest of the interval
+        self.now += 5
+        grouped_window.expire()
+
+        self.assertEqual(self.publisher.messages, [])
+        self.assertEqual(self.timer.call_args.kwargs['interval'], 4)
+
+        self.now += 4
+        grouped_window.expire()
+
+        self.assertEqual(self._published(), [('2024-10-05T18:00:59', 0, True, 2)])
+
+        # The next route update starts the next interval, without publishing the closed one again
+        self._add(grouped_window, [70])
+        grouped_window.close()
+
+        self.assertEqual(
+            first=self._published(),
+            second=[
+                ('2024-10-05T18:00:59', 0, True, 2),
+                ('2024-10-05T18:01:59', 0, True, 1),
+            ],
+        )
+
+class RabbitMQTopicTests(unittest.TestCase):
+    '''
+    Tests for the routing keys of the route updates on the topic exchange.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def _routing_key(self, prefix: str, as_path: list[AsPathRecord], change_type: ChangeType = ChangeType.ANNOUNCE) -> str:
+        return get_topic_routing_key(
+            RouteUpdateRecord(
+                timestamp=datetime(2024, 10, 5, 18, 0),
+                peer_ip='80.81.192.157',
+                local_ip='80.81.192.1',
+                peer_as=6695,
+                local_as=64496,
+                path_attributes=PathAttributesRecord(
+                    as_path=as_path,
+                ),
+                change_type=change_type,
+                nlri=NLRIRecord(
+                    prefix=prefix,
+                    length=24 if ':' not in prefix else 48,
+                ),
+            ),
+        )
+
+    def test_address_family(self):
+        '''
+        Test that the routing keys hold the address family of the prefix, the peer AS, the origin AS and the change type.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        as_path = [AsPathRecord(type=AsPathType.AS_SEQUENCE, value=[6695, 3356, 13335])]
+
+        self.assertEqual(self._routing_key('192.0.2.0', as_path), 'update.ipv4.6695.13335.announce')
+        self.assertEqual(self._routing_key('2001:db8::', as_path), 'update.ipv6.6695.13335.announce')
+        self.assertEqual(self._routing_key('192.0.2.0', as_path, ChangeType.WITHDRAW), 'update.ipv4.6695.13335.withdraw')
+
+    def test_unknown_origin(self):
+        '''
+        Test that the origin AS is unknown without AS path and when the AS path ends in an AS set.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        as_path = [
+            AsPathRecord(type=AsPathType.AS_SEQUENCE, value=[6695, 3356]),
+            AsPathRecord(type=AsPathType.AS_SET, value=[64500, 64501]),
+        ]
+
+        self.assertEqual(self._routing_key('192.0.2.0', as_path), 'update.ipv4.6695.unknown.announce')
+        self.assertEqual(self._routing_key('2001:db8::', None, ChangeType.WITHDRAW), 'update.ipv6.6695.unknown.withdraw')
+        self.assertEqual(self._routing_key('192.0.2.0', []), 'update.ipv4.6695.unknown.announce')
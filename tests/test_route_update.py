@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.mrt_decoder import decode_mrt_file
+from tests.mrt_files import MRT_UPDATE_FILE
+import unittest
+
+class RouteUpdateRecordTests(unittest.TestCase):
+    '''
+    Tests for serializing the lightweight route update records the same as the RouteUpdate models.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    def _assert_same_as_model(self, native_decoder: bool):
+        route_updates = [
+            route_update
+                for record in decode_mrt_file(MRT_UPDATE_FILE, native_decoder=native_decoder)
+                    for route_update in record.route_updates or []
+        ]
+
+        self.assertGreater(len(route_updates), 0)
+
+        for route_update in route_updates:
+            route_update_model = route_update.to_model()
+
+            self.assertEqual(route_update.to_json(), route_update_model.model_dump_json().encode())
+            self.assertEqual(route_update.to_dict(), route_update_model.model_dump())
+            self.assertEqual(route_update.to_dict(mode='json'), route_update_model.model_dump(mode='json'))
+
+    def test_native_parser_same_as_model(self):
+        '''
+        Test that the records of the native parser serialize the same as their models.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self._assert_same_as_model(
+            native_decoder=True,
+        )
+
+    def test_mrtparse_parser_same_as_model(self):
+        '''
+        Test that the records of the mrtparse based parser serialize the same as their models.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self._assert_same_as_model(
+            native_decoder=False,
+        )
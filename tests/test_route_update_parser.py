@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+'''
+ZettaBGP - Advanced Anomaly Detection in Internet Routing
+Copyright (c) 2024 Benedikt Schwering and Sebastian Forstner
+
+This work is licensed under the terms of the MIT license.
+For a copy, see LICENSE in the project root.
+
+Author:
+    Benedikt Schwering <bes9584@thi.de>
+    Sebastian Forstner <sef9869@thi.de>
+'''
+from src.parsers.route_update import RouteUpdateParser
+from src.parsers.mrt_decoder import decode_mrt_file
+from tests.mrt_files import MRT_UPDATE_FILE
+import unittest, threading, itertools
+
+class RouteUpdateParserTests(unittest.TestCase):
+    '''
+    Tests for delivering the parsed route updates to the registered functions.
+
+    Author:
+        Benedikt Schwering <bes9584@thi.de>
+    '''
+    @classmethod
+    def setUpClass(cls):
+        route_updates = (
+            route_update
+                for record in decode_mrt_file(MRT_UPDATE_FILE, native_decoder=True)
+                    for route_update in record.route_updates or []
+        )
+        cls.route_updates = list(itertools.islice(route_updates, 100))
+
+    def setUp(self):
+        self.parser = RouteUpdateParser()
+        self.updates = []
+        self.batches = []
+
+        self.parser.on_update(self.updates.append)
+
+    def _send(self, start: int, stop: int):
+        self.parser.send_messages(self.route_updates[start:stop])
+
+    def test_batch_per_message(self):
+        '''
+        Test that without a size or interval the route updates of every message are delivered as one batch.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self.parser.on_update_batch(self.batches.append)
+
+        self._send(0, 3)
+        self.parser.send_messages([])
+        self._send(3, 10)
+
+        self.assertEqual(self.batches, [self.route_updates[0:3], self.route_updates[3:10]])
+        self.assertEqual(self.updates, self.route_updates[0:10])
+
+    def test_batch_size(self):
+        '''
+        Test that the buffered route updates are delivered when the batch size is reached.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        self.parser.on_update_batch(self.batches.append, batch_size=10)
+
+        self._send(0, 4)
+        self._send(4, 8)
+
+        self.assertEqual(self.batches, [])
+        self.assertEqual(self.updates, self.route_updates[0:8])
+
+        # A message may exceed the batch size, it is not split
+        self._send(8, 13)
+        self._send(13, 20)
+
+        self.assertEqual(self.batches, [self.route_updates[0:13]])
+        self.assertEqual(self.updates, self.route_updates[0:20])
+
+    def test_batch_interval(self):
+        '''
+        Test that the buffered route updates are delivered by the timer when the interval has passed.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        delivered = threading.Event()
+
+        def on_batch(route_updates: list):
+            self.batches.append(route_updates)
+            delivered.set()
+
+        self.parser.on_update_batch(on_batch, batch_size=1000, batch_interval=50)
+
+        self._send(0, 5)
+        self._send(5, 7)
+
+        self.assertTrue(delivered.wait(timeout=5))
+        self.assertEqual(self.batches, [self.route_updates[0:7]])
+        self.assertEqual(self.updates, self.route_updates[0:7])
+
+        # The next interval starts with the next route update
+        delivered.clear()
+        self._send(7, 9)
+
+        self.assertTrue(delivered.wait(timeout=5))
+        self.assertEqual(self.batches, [self.route_updates[0:7], self.route_updates[7:9]])
+
+    def test_flush(self):
+        '''
+        Test that flush delivers the buffered route updates and calls the flush functions afterwards.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        calls = []
+
+        self.parser.on_update_batch(lambda route_updates: calls.append(('batch', route_updates)), batch_size=1000, batch_interval=60000)
+        self.parser.on_flush(lambda: calls.append(('flush', None)))
+
+        self._send(0, 5)
+        self.parser.flush()
+        self.parser.flush()
+
+        self.assertEqual(calls, [('batch', self.route_updates[0:5]), ('flush', None), ('flush', None)])
+        self.assertEqual(self.updates, self.route_updates[0:5])
+
+    def test_close(self):
+        '''
+        Test that close flushes the buffered route updates before calling the close functions.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        calls = []
+
+        self.parser.on_update_batch(lambda route_updates: calls.append(('batch', route_updates)), batch_size=1000)
+        self.parser.on_flush(lambda: calls.append(('flush', None)))
+        self.parser.on_close(lambda: calls.append(('close', None)))
+
+        self._send(0, 5)
+        self.parser.close()
+
+        self.assertEqual(calls, [('batch', self.route_updates[0:5]), ('flush', None), ('close', None)])
+
+    def test_registries_per_instance(self):
+        '''
+        Test that functions registered on one parser are not called by another parser.
+
+        Author:
+            Benedikt Schwering <bes9584@thi.de>
+        '''
+        other_parser = RouteUpdateParser()
+        calls = []
+
+        self.parser.on_update_batch(self.batches.append)
+        self.parser.on_flush(lambda: calls.append('flush'))
+        self.parser.on_close(lambda: calls.append('close'))
+
+        other_parser.send_messages(self.route_updates[0:5])
+        other_parser.close()
+
+        self.assertEqual(self.updates, [])
+        self.assertEqual(self.batches, [])
+        self.assertEqual(calls, [])